@@ -54,7 +54,10 @@ REQUIRED = [
 
 # What packages are optional?
 EXTRAS = {
-    # 'fancy feature': ['django'],
+    # Faster JSON encoding / decoding of API payloads
+    "orjson": ["orjson >= 3.0.0"],
+    # Querying tables with DuckDB, via table.to_duckdb() or redivis.duckdb()
+    "duckdb": ["duckdb >= 1.0.0"],
 }
 
 # The rest you shouldn't have to touch too much :)
@@ -153,6 +156,10 @@ setuptools.setup(
         "Programming Language :: Python :: 3.14",
     ],
     # $ setup.py publish support.
+    # fsspec discovers the redivis:// filesystem through this entry point, without redivis needing to be imported
+    entry_points={
+        "fsspec.specs": ["redivis = redivis.common.fsspec:RedivisFileSystem"],
+    },
     cmdclass={
         "upload": UploadCommand,
     },
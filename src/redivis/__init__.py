@@ -1,22 +1,50 @@
-from .classes.Workflow import Workflow as workflow
-from .classes.Dataset import Dataset as dataset
-from .classes.Datasource import Datasource as datasource
-from .classes.User import User as user
-from .classes.Organization import Organization as organization
-from .classes.Parameter import Parameter as parameter
-from .classes.Query import Query as query
-from .classes.Table import Table as table
-from .classes.Notebook import Notebook as notebook
-from .classes.Transform import Transform as transform
 from .common import exceptions
-from .common.api_request import make_request as make_api_request
 
 # Note: these should be deleted at the end to clean up the namespace
 import warnings
 import os
+import sys
+import importlib.util
 
 from ._version import __version__
 
+# Resource classes and submodules are loaded on first access (see __getattr__), so that `import redivis`
+# stays fast for short-lived scripts and doesn't pull in niquests, tqdm, etc. until they're needed.
+# Check the cost with `python -X importtime -c "import redivis"`; tests/test_benchmarks.py enforces a budget.
+_lazy_attributes = {
+    "workflow": (".classes.Workflow", "Workflow"),
+    "dataset": (".classes.Dataset", "Dataset"),
+    "datasource": (".classes.Datasource", "Datasource"),
+    "user": (".classes.User", "User"),
+    "organization": (".classes.Organization", "Organization"),
+    "parameter": (".classes.Parameter", "Parameter"),
+    "query": (".classes.Query", "Query"),
+    "table": (".classes.Table", "Table"),
+    "notebook": (".classes.Notebook", "Notebook"),
+    "transform": (".classes.Transform", "Transform"),
+    "make_api_request": (".common.api_request", "make_request"),
+    "aio": (".aio", None),
+    "duckdb": (".common.arrow_scan", "connect"),
+}
+
+
+def __getattr__(name):
+    if name not in _lazy_attributes:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+
+    module_name, attribute = _lazy_attributes[name]
+    module = importlib.import_module(module_name, __name__)
+    value = module if attribute is None else getattr(module, attribute)
+    # Cache on the module, so that __getattr__ is only called once per name
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes))
+
 
 def file(*args, **kwargs):
 
@@ -46,23 +74,28 @@ def authenticate(scope=None, force_reauthentication=False):
 
 def current_notebook():
     import os
+    from .classes.Notebook import Notebook
 
     if os.getenv("REDIVIS_DEFAULT_NOTEBOOK") is not None:
-        return notebook(os.getenv("REDIVIS_DEFAULT_NOTEBOOK"))
+        return Notebook(os.getenv("REDIVIS_DEFAULT_NOTEBOOK"))
 
     return None
 
 
 def current_user():
-    res = make_api_request(method="GET", path="/users/me")
-    return user(res["name"], properties=res)
+    from .classes.User import User
+    from .common.api_request import make_request
+
+    res = make_request(method="GET", path="/users/me")
+    return User(res["name"], properties=res)
 
 
 def current_workflow():
     import os
+    from .classes.Workflow import Workflow
 
     if os.getenv("REDIVIS_DEFAULT_WORKFLOW") is not None:
-        return workflow(os.getenv("REDIVIS_DEFAULT_WORKFLOW"))
+        return Workflow(os.getenv("REDIVIS_DEFAULT_WORKFLOW"))
 
     return None
 
@@ -80,6 +113,8 @@ __all__ = [
     "transform",
     "exceptions",
     "make_api_request",
+    "aio",
+    "duckdb",
     "__version__",
     "authenticate",
     "current_notebook",
@@ -143,10 +178,10 @@ def _install_excepthook():
 
     sys.excepthook = _custom_excepthook
 
-    try:
-        from IPython import get_ipython
-
-        ipython = get_ipython()
+    # Only look for a running IPython shell if IPython has already been loaded; importing it here would
+    # add a noticeable delay to every `import redivis`, and a running shell always has it loaded.
+    if "IPython" in sys.modules:
+        ipython = sys.modules["IPython"].get_ipython()
         if ipython is not None:
 
             def _ipython_custom_exc(shell, exc_type, exc_value, exc_tb, tb_offset=None):
@@ -168,18 +203,18 @@ def _install_excepthook():
                     )
 
             ipython.set_custom_exc((exceptions.RedivisError,), _ipython_custom_exc)
-    except ImportError:
-        pass
 
 
 if os.getenv("REDIVIS_INSTALL_EXCEPTHOOK", "1").lower() not in ("0", "false", "no"):
     _install_excepthook()
 
-# Register fsspec filesystem if available
+# Register the fsspec filesystem. fsspec normally discovers it through the "fsspec.specs" entry point when it's first
+# imported, so we only need to do this here if fsspec has already been imported, or to patch pystac's StacIO.
 try:
-    from .common.fsspec import register
+    if "fsspec" in sys.modules or importlib.util.find_spec("pystac") is not None:
+        from .common.fsspec import register
 
-    register()
+        register()
 except (ImportError, ModuleNotFoundError):
     # fsspec or its integration is not installed; registration is optional
     pass
@@ -191,4 +226,4 @@ except Exception as exc:
     )
 
 # clean up namespace
-del os, warnings
+del os, sys, warnings, importlib
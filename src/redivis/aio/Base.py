@@ -0,0 +1,35 @@
+from ..classes.Base import Base
+
+
+class AsyncBase(Base):
+    """Base class for the async resources in redivis.aio.
+
+    Each async resource wraps its synchronous counterpart, which owns all
+    reference parsing and properties. Attribute reads (e.g. name, uri, properties)
+    are forwarded to the wrapped resource, while network operations are
+    re-implemented as coroutines on the subclass.
+    """
+
+    def __init__(self, resource):
+        self._resource = resource
+
+    def __getattr__(self, name):
+        if name == "_resource":
+            raise AttributeError(name)
+
+        value = getattr(self._resource, name)
+        if callable(value):
+            raise AttributeError(
+                f"'{self.__class__.__name__}' object has no async method '{name}'. Use to_sync() to access the synchronous resource."
+            )
+        return value
+
+    def __repr__(self):
+        return repr(self._resource).replace("<", "<Async", 1)
+
+    def to_sync(self):
+        return self._resource
+
+
+def unwrap(resource):
+    return resource._resource if isinstance(resource, AsyncBase) else resource
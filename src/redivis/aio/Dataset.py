@@ -0,0 +1,189 @@
+from ..common import exceptions
+from ..classes.Dataset import Dataset as SyncDataset, update_properties
+from ..common.api_request import make_request_async, make_paginated_request_async
+from .Base import AsyncBase
+from .Query import Query
+from .Table import Table
+
+
+class Dataset(AsyncBase):
+    def __init__(
+        self,
+        name,
+        *,
+        version=None,
+        user=None,
+        organization=None,
+        properties=None,
+    ):
+        super().__init__(
+            SyncDataset(
+                name,
+                version=version,
+                user=user,
+                organization=organization,
+                properties=properties,
+            )
+        )
+
+    async def _rectify_ambiguous_owner(self):
+        dataset = self._resource
+        if (
+            dataset.user
+            and dataset.organization
+            and not (dataset.properties or {}).get("owner")
+        ):
+            try:
+                # Mirrors Organization.exists(), which doesn't have a get endpoint
+                await make_paginated_request_async(
+                    path=f"{dataset.organization.uri}/datasets",
+                    page_size=100,
+                    max_results=1,
+                )
+                dataset.user = None
+            except exceptions.NotFoundError:
+                dataset.organization = None
+
+        dataset._rectify_ambiguous_owner()
+
+    async def create(self, *, public_access_level="none", description=None):
+        await self._rectify_ambiguous_owner()
+        if self.organization:
+            path = f"/organizations/{self.organization.name}/datasets"
+        else:
+            path = f"/users/{self.user.name}/datasets"
+
+        properties = await make_request_async(
+            method="POST",
+            path=path,
+            payload={
+                "name": self.name,
+                "publicAccessLevel": public_access_level,
+                "description": description,
+            },
+        )
+        update_properties(self._resource, properties)
+        return self
+
+    async def create_next_version(self, *, if_not_exists=False):
+        if not self.properties or "nextVersion" not in self.properties:
+            await self.get()
+
+        if not self.properties["nextVersion"]:
+            await make_request_async(method="POST", path=f"{self.uri}/versions")
+        elif not if_not_exists:
+            raise exceptions.ValueError(
+                f"Next version already exists at {self.properties['nextVersion']['datasetUri']}. To avoid this error, set argument if_not_exists to True"
+            )
+
+        await self._rectify_ambiguous_owner()
+        next_version_dataset = Dataset(
+            name=self.scoped_reference,
+            user=self.user,
+            organization=self.organization,
+            version="next",
+        )
+
+        return await next_version_dataset.get()
+
+    async def delete(self):
+        await make_request_async(
+            method="DELETE",
+            path=self.uri,
+        )
+        return
+
+    async def exists(self):
+        try:
+            await make_request_async(method="HEAD", path=self.uri)
+            return True
+        except exceptions.NotFoundError:
+            return False
+
+    async def get(self):
+        properties = await make_request_async(
+            method="GET", path=self.uri, cache=True
+        )
+        update_properties(self._resource, properties)
+        return self
+
+    async def list_tables(self, max_results=None):
+        tables = await make_paginated_request_async(
+            path=f"{self.uri}/tables", page_size=100, max_results=max_results
+        )
+        return [
+            Table(table["name"], dataset=self, properties=table) for table in tables
+        ]
+
+    def query(self, query):
+        return Query(query, default_dataset=self.qualified_reference)
+
+    async def release(self, *, release_notes=None):
+        version_res = await make_request_async(
+            method="POST",
+            path=f"{self.uri}/versions/next/release",
+            payload={"releaseNotes": release_notes},
+        )
+        self._resource.uri = version_res["datasetUri"]
+        await self.get()
+        return self
+
+    async def unrelease(self):
+        version_res = await make_request_async(
+            method="POST",
+            path=f"{self.uri}/versions/current/unrelease",
+        )
+        self._resource.uri = version_res["datasetUri"]
+        await self.get()
+        return self
+
+    def table(self, name):
+        return Table(name, dataset=self)
+
+    async def add_labels(self, labels):
+        await self.get()
+        await self.update(
+            labels=list(
+                set(self.properties.get("labels", []))
+                | set(label.lower() for label in labels)
+            )
+        )
+        return self
+
+    async def remove_labels(self, labels):
+        await self.get()
+        await self.update(
+            labels=list(
+                set(self.properties.get("labels", []))
+                - set(label.lower() for label in labels)
+            )
+        )
+        return self
+
+    async def update(
+        self, *, name=None, public_access_level=None, description=None, labels=None
+    ):
+        payload = {}
+        if name:
+            payload["name"] = name
+        if public_access_level:
+            payload["publicAccessLevel"] = public_access_level
+        if description is not None:
+            payload["description"] = description
+        if labels is not None:
+            payload["labels"] = labels
+
+        res = await make_request_async(
+            method="PATCH",
+            path=self.uri,
+            payload=payload,
+        )
+        update_properties(self._resource, res)
+        return self
+
+    async def update_variables(self, variables):
+        await make_request_async(
+            method="PATCH",
+            path=f"{self.uri}/variables",
+            payload={"variables": variables},
+        )
@@ -0,0 +1,115 @@
+import asyncio
+import os
+
+from ..common import exceptions
+from ..classes.Query import Query as SyncQuery
+from ..common.api_request import make_request_async, make_paginated_request_async
+from ..common.fetch_rows_async import AsyncArrowIterator
+from .Base import AsyncBase
+from .Variable import Variable
+
+
+class Query(AsyncBase):
+    def __init__(
+        self,
+        query,
+        *,
+        default_workflow=None,
+        default_dataset=None,
+    ):
+        super().__init__(
+            SyncQuery(
+                query,
+                default_workflow=default_workflow,
+                default_dataset=default_dataset,
+            )
+        )
+        self._initiate_lock = None
+
+    async def get(self):
+        await self._initiate()
+        self._resource.properties = await make_request_async(
+            method="GET", path=self.uri
+        )
+        return self
+
+    async def variable(self, name):
+        await self.wait_for_finish()
+        return Variable(name, query=self)
+
+    async def list_variables(self, *, max_results=None):
+        await self.wait_for_finish()
+        variables = await make_paginated_request_async(
+            path=f"{self.uri}/variables", page_size=1000, max_results=max_results
+        )
+        return [
+            Variable(variable["name"], query=self, properties=variable)
+            for variable in variables
+        ]
+
+    def to_arrow_batch_iterator(
+        self,
+        max_results=None,
+        *,
+        variables=None,
+        filter=None,
+        max_parallelization=os.cpu_count() or 1,
+        ordered=True,
+    ):
+        # The query is initiated and waited for on the event loop before its results are read
+        return AsyncArrowIterator(
+            self._resource,
+            max_results=max_results,
+            variables=variables,
+            filter=filter,
+            max_parallelization=max_parallelization,
+            ordered=ordered,
+            prepare=self.wait_for_finish,
+        )
+
+    async def wait_for_finish(self):
+        await self._initiate()
+        while True:
+            if self.properties["status"] == "completed":
+                break
+            elif self.properties["status"] == "failed":
+                raise exceptions.JobError(
+                    message=self.properties.get("errorMessage"),
+                    status=self.properties.get("status"),
+                    kind=self.properties.get("kind"),
+                )
+            elif self.properties["status"] == "cancelled":
+                raise exceptions.JobError(
+                    message="Query Job was cancelled",
+                    status=self.properties.get("status"),
+                    kind=self.properties.get("kind"),
+                )
+            else:
+                await asyncio.sleep(2)
+                await self.get()
+
+        return self
+
+    def to_sync(self):
+        # Reading results (e.g. via to_arrow_table()) requires the query to have been initiated
+        if not self._resource.did_initiate:
+            raise exceptions.ValueError(
+                "The query hasn't been initiated yet. Please call `await query.wait_for_finish()` first"
+            )
+        return self._resource
+
+    async def _initiate(self):
+        # Several coroutines may wait on the same query; make sure it's only created once
+        if self._initiate_lock is None:
+            self._initiate_lock = asyncio.Lock()
+
+        async with self._initiate_lock:
+            query = self._resource
+            if not query.did_initiate:
+                query.properties = await make_request_async(
+                    method="post",
+                    path="/queries",
+                    payload=query.payload,
+                )
+                query.uri = query.properties["uri"]
+                query.did_initiate = True
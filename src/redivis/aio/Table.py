@@ -0,0 +1,137 @@
+import os
+
+from ..common import exceptions
+from ..classes.Table import Table as SyncTable, update_properties
+from ..common.api_request import make_request_async, make_paginated_request_async
+from ..common.fetch_rows_async import AsyncArrowIterator
+from .Base import AsyncBase, unwrap
+from .Upload import Upload
+from .Variable import Variable
+
+
+class Table(AsyncBase):
+    def __init__(
+        self,
+        name,
+        *,
+        dataset=None,
+        workflow=None,
+        properties=None,
+    ):
+        super().__init__(
+            SyncTable(
+                name,
+                dataset=unwrap(dataset),
+                workflow=unwrap(workflow),
+                properties=properties,
+            )
+        )
+
+    async def create(
+        self, *, description=None, upload_merge_strategy="append", is_file_index=False
+    ):
+        payload = {
+            "name": self.name,
+            "uploadMergeStrategy": upload_merge_strategy,
+            "isFileIndex": is_file_index,
+        }
+        if description is not None:
+            payload["description"] = description
+
+        response = await make_request_async(
+            method="POST",
+            path=f"{self.dataset.uri}/tables",
+            payload=payload,
+        )
+        update_properties(self._resource, response)
+        return self
+
+    async def delete(self):
+        await make_request_async(
+            method="DELETE",
+            path=self.uri,
+        )
+        return
+
+    async def get(self):
+        properties = await make_request_async(
+            method="GET", path=self.uri, cache=True
+        )
+        update_properties(self._resource, properties)
+        return self
+
+    async def exists(self):
+        try:
+            await make_request_async(method="HEAD", path=self.uri)
+            return True
+        except exceptions.NotFoundError:
+            return False
+
+    async def list_uploads(self, *, max_results=None):
+        uploads = await make_paginated_request_async(
+            path=f"{self.uri}/uploads", max_results=max_results
+        )
+        return [
+            Upload(upload["name"], table=self, properties=upload) for upload in uploads
+        ]
+
+    async def list_variables(self, *, max_results=None):
+        variables = await make_paginated_request_async(
+            path=f"{self.uri}/variables",
+            page_size=1000,
+            max_results=max_results,
+            cache=True,
+        )
+        return [
+            Variable(variable["name"], table=self, properties=variable)
+            for variable in variables
+        ]
+
+    async def update(self, *, name=None, description=None, upload_merge_strategy=None):
+        payload = {}
+        if name:
+            payload["name"] = name
+        if upload_merge_strategy:
+            payload["uploadMergeStrategy"] = upload_merge_strategy
+        if description is not None:
+            payload["description"] = description
+
+        response = await make_request_async(
+            method="PATCH",
+            path=f"{self.uri}",
+            payload=payload,
+        )
+        update_properties(self._resource, response)
+        return self
+
+    async def update_variables(self, variables):
+        await make_request_async(
+            method="PATCH",
+            path=f"{self.uri}/variables",
+            payload={"variables": variables},
+        )
+
+    def to_arrow_batch_iterator(
+        self,
+        max_results=None,
+        *,
+        variables=None,
+        filter=None,
+        max_parallelization=os.cpu_count() or 1,
+        ordered=True,
+    ):
+        # An async iterator, i.e. `async for batch in table.to_arrow_batch_iterator()`
+        return AsyncArrowIterator(
+            self._resource,
+            max_results=max_results,
+            variables=variables,
+            filter=filter,
+            max_parallelization=max_parallelization,
+            ordered=ordered,
+        )
+
+    def upload(self, name=""):
+        return Upload(name=name, table=self)
+
+    def variable(self, name):
+        return Variable(name, table=self)
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+
+from ..common import exceptions
+from ..classes.Upload import Upload as SyncUpload
+from ..common.api_request import make_request_async, make_paginated_request_async
+from .Base import AsyncBase, unwrap
+from .Variable import Variable
+
+
+class Upload(AsyncBase):
+    def __init__(
+        self,
+        name,
+        *,
+        table,
+        properties=None,
+    ):
+        super().__init__(SyncUpload(name, table=unwrap(table), properties=properties))
+        self.table = table
+
+    async def delete(self):
+        await make_request_async(
+            method="DELETE",
+            path=self.uri,
+        )
+
+    async def exists(self):
+        try:
+            await make_request_async(method="HEAD", path=self.uri)
+            return True
+        except exceptions.NotFoundError:
+            return False
+
+    async def get(self):
+        self._resource.properties = await make_request_async(
+            method="GET",
+            path=self.uri,
+            cache=True,
+        )
+        self._resource.uri = self.properties["uri"]
+        return self
+
+    async def insert_rows(self, rows):
+        response = await make_request_async(
+            method="POST",
+            path=f"{self.uri}/rows",
+            payload={"rows": rows},
+        )
+        return response
+
+    async def list_variables(self, *, max_results=10000):
+        variables = await make_paginated_request_async(
+            path=f"{self.uri}/variables",
+            page_size=1000,
+            max_results=max_results,
+            cache=True,
+        )
+        return [
+            Variable(variable["name"], properties=variable, upload=self)
+            for variable in variables
+        ]
+
+    def variable(self, name):
+        return Variable(name, upload=self)
+
+    async def create(
+        self,
+        content=None,
+        *,
+        wait_for_finish=True,
+        raise_on_fail=True,
+        remove_on_fail=False,
+        **kwargs,
+    ):
+        # Transferring the content is bulk, blocking I/O, so it happens on a worker thread.
+        # Only the (potentially long) wait for the upload to be processed runs on the event loop.
+        await asyncio.to_thread(
+            self._resource.create,
+            content,
+            wait_for_finish=False,
+            **kwargs,
+        )
+
+        has_content = (
+            content is not None
+            or kwargs.get("data") is not None
+            or kwargs.get("transfer_specification") is not None
+        )
+
+        try:
+            # The sync create() returns early without fetching properties if if_not_exists=True and the upload exists
+            if has_content and wait_for_finish and self.properties:
+                while True:
+                    await asyncio.sleep(2)
+                    await self.get()
+                    if (
+                        self.properties["status"] == "completed"
+                        or self.properties["status"] == "failed"
+                    ):
+                        if self.properties["status"] == "failed" and raise_on_fail:
+                            raise exceptions.JobError(
+                                message=self.properties.get("errorMessage"),
+                                status=self.properties.get("status"),
+                                kind=self.properties.get("kind"),
+                            )
+                        break
+                    else:
+                        logging.debug("Upload is still in progress...")
+        except Exception:
+            if remove_on_fail and self.properties["status"] == "failed":
+                await self.delete()
+            raise
+
+        return self
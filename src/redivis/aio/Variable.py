@@ -0,0 +1,74 @@
+import asyncio
+
+from ..common import exceptions
+from ..classes.Variable import Variable as SyncVariable
+from ..common.api_request import make_request_async
+from .Base import AsyncBase, unwrap
+
+
+class Variable(AsyncBase):
+    def __init__(
+        self,
+        name,
+        *,
+        table=None,
+        upload=None,
+        query=None,
+        properties=None,
+    ):
+        super().__init__(
+            SyncVariable(
+                name,
+                table=unwrap(table),
+                upload=unwrap(upload),
+                query=unwrap(query),
+                properties=properties,
+            )
+        )
+
+    async def get(self):
+        self._resource.properties = await make_request_async(
+            method="GET",
+            path=self.uri,
+            cache=True,
+        )
+        self._resource.uri = self.properties["uri"]
+
+        return self
+
+    async def get_statistics(self):
+        statistics = await make_request_async(
+            method="GET",
+            path=f"{self.uri}/statistics",
+        )
+        while statistics["status"] == "running" or statistics["status"] == "queued":
+            await asyncio.sleep(2)
+            statistics = await make_request_async(
+                method="GET",
+                path=f"{self.uri}/statistics",
+            )
+
+        return statistics
+
+    async def update(self, *, label=None, description=None, value_labels=None):
+        payload = {}
+        if label is not None:
+            payload["label"] = label
+        if description is not None:
+            payload["description"] = description
+        if value_labels is not None:
+            payload["valueLabels"] = value_labels
+
+        self._resource.properties = await make_request_async(
+            method="PATCH",
+            path=f"{self.uri}",
+            payload=payload,
+        )
+        return self
+
+    async def exists(self):
+        try:
+            await make_request_async(method="HEAD", path=self.uri)
+            return True
+        except exceptions.NotFoundError:
+            return False
@@ -0,0 +1,27 @@
+"""Async (asyncio) counterparts of the core redivis resources.
+
+Network operations on these resources are coroutines, e.g.:
+
+    table = redivis.aio.table("demo.iris_species.iris")
+    await table.get()
+    variables = await table.list_variables()
+
+Rows can be read without blocking the event loop:
+
+    async for batch in table.to_arrow_batch_iterator():
+        ...
+
+Use resource.to_sync() to get the equivalent synchronous resource, e.g. for other read methods.
+"""
+
+from .Dataset import Dataset as dataset
+from .Query import Query as query
+from .Table import Table as table
+from ..common.api_request import make_request_async as make_api_request
+
+__all__ = [
+    "dataset",
+    "query",
+    "table",
+    "make_api_request",
+]
@@ -8,7 +8,7 @@ from urllib.parse import quote as quote_uri
 import re
 
 from ..common import exceptions
-from ..common.api_request import make_request, make_paginated_request
+from ..common.api_request import make_request, iter_paginated_request
 
 
 class Dataset(Base):
@@ -148,26 +148,27 @@ class Dataset(Base):
             return False
 
     def get(self):
-        properties = make_request(method="GET", path=self.uri)
+        properties = make_request(method="GET", path=self.uri, cache=True)
         update_properties(self, properties)
         return self
 
     def list_tables(self, max_results=None):
-        tables = make_paginated_request(
+        return list(self.iter_tables(max_results=max_results))
+
+    def iter_tables(self, max_results=None):
+        for table in iter_paginated_request(
             path=f"{self.uri}/tables", page_size=100, max_results=max_results
-        )
-        return [
-            Table(table["name"], dataset=self, properties=table) for table in tables
-        ]
+        ):
+            yield Table(table["name"], dataset=self, properties=table)
 
     def list_versions(self, max_results=None):
-        versions = make_paginated_request(
+        return list(self.iter_versions(max_results=max_results))
+
+    def iter_versions(self, max_results=None):
+        for version in iter_paginated_request(
             path=f"{self.uri}/versions", page_size=100, max_results=max_results
-        )
-        return [
-            Version(version["tag"], dataset=self, properties=version)
-            for version in versions
-        ]
+        ):
+            yield Version(version["tag"], dataset=self, properties=version)
 
     def query(self, query):
         return Query(query, default_dataset=self.qualified_reference)
@@ -5,7 +5,6 @@ import pathlib
 
 from ..common import exceptions
 from ..common.api_request import make_request
-from tqdm.auto import tqdm
 import re
 
 from ..common.retryable_download import perform_parallel_download
@@ -105,6 +104,8 @@ class Export(Base):
     def wait_for_finish(self, *, progress=True):
         iter_count = 0
         if progress:
+            from tqdm.auto import tqdm
+
             pbar = tqdm(
                 total=100, leave=False, unit="%", unit_scale=True, mininterval=0.1
             )
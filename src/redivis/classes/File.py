@@ -3,12 +3,12 @@ import io
 import warnings
 from base64 import b64decode
 from pathlib import Path
-import time
-from requests import RequestException
-from urllib3.exceptions import HTTPError
+from niquests.exceptions import RequestException
+from niquests.packages.urllib3.exceptions import HTTPError
 from ..common import exceptions
 from .Base import Base
 from ..common.api_request import make_request
+from ..common.retry_policy import get_retry_policy
 from urllib.parse import quote as quote_uri
 
 from ..common.retryable_download import perform_retryable_download
@@ -155,7 +155,7 @@ class Stream(io.BufferedIOBase):
     def __init__(self, uri, start_byte=0, end_byte=None, file=None):
         super().__init__()
         self.uri = uri
-        self.retry_count = 0
+        self.retry_state = get_retry_policy().start()
         self.bytes_read = 0
         self.start_byte = start_byte
         self.end_byte = end_byte
@@ -204,17 +204,17 @@ class Stream(io.BufferedIOBase):
             )
 
             self._total_bytes = self._file.size
-            self.retry_count = 0
             self.response = r
             return r
         except (RequestException, HTTPError) as e:
-            if self.retry_count >= 10:
-                print("File download failed after too many retries, giving up.")
-                raise e
-            time.sleep(self.retry_count)
-            self.retry_count += 1
+            self._wait_to_retry(e)
             return self._get_response(True)
 
+    def _wait_to_retry(self, e):
+        if not self.retry_state.sleep():
+            print("File download failed after too many retries, giving up.")
+            raise e
+
     def read(self, size=-1):
         r = self._get_response()
         if not r:
@@ -222,13 +222,10 @@ class Stream(io.BufferedIOBase):
         try:
             chunk = self.response.raw.read(size)
             self.bytes_read += len(chunk)
+            self.retry_state.reset()
             return chunk
         except (RequestException, HTTPError) as e:
-            if self.retry_count >= 10:
-                print("File download failed after too many retries, giving up.")
-                raise e
-            time.sleep(self.retry_count)
-            self.retry_count += 1
+            self._wait_to_retry(e)
             self._get_response(True)
             return self.read(size)
 
@@ -245,13 +242,10 @@ class Stream(io.BufferedIOBase):
         try:
             bytes_read = self.response.raw.readinto(buffer)
             self.bytes_read += bytes_read
+            self.retry_state.reset()
             return bytes_read
         except (RequestException, HTTPError) as e:
-            if self.retry_count >= 10:
-                print("File download failed after too many retries, giving up.")
-                raise e
-            time.sleep(self.retry_count)
-            self.retry_count += 1
+            self._wait_to_retry(e)
             self._get_response(True)
             return self.readinto(buffer)
 
@@ -271,13 +265,10 @@ class Stream(io.BufferedIOBase):
         try:
             line = self.response.raw.readline(size)
             self.bytes_read += len(line)
+            self.retry_state.reset()
             return line
         except (RequestException, HTTPError) as e:
-            if self.retry_count >= 10:
-                print("File download failed after too many retries, giving up.")
-                raise e
-            time.sleep(self.retry_count)
-            self.retry_count += 1
+            self._wait_to_retry(e)
             self.response = self._get_response(True)
             return self.readline(size)
 
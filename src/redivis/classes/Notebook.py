@@ -2,7 +2,6 @@ from .Table import Table
 from .Base import Base
 from ..common import exceptions
 from ..common.api_request import make_request
-from tqdm.auto import tqdm
 import time
 import logging
 
@@ -186,6 +185,8 @@ class Notebook(Base):
             if not isinstance(data, str):
                 temp_file_path = convert_data_to_parquet(data)
 
+            from tqdm.auto import tqdm
+
             size = os.stat(temp_file_path).st_size
             pbar_bytes = tqdm(
                 total=size, unit="B", leave=False, unit_scale=True, mininterval=0.1
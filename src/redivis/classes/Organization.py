@@ -7,7 +7,7 @@ from .Secret import Secret
 from urllib.parse import quote as quote_uri
 
 from ..common import exceptions
-from ..common.api_request import make_paginated_request
+from ..common.api_request import make_paginated_request, iter_paginated_request
 
 
 class Organization(Base):
@@ -44,46 +44,48 @@ class Organization(Base):
             return False
 
     def list_datasets(self, max_results=None, labels=None):
+        return list(self.iter_datasets(max_results=max_results, labels=labels))
+
+    def iter_datasets(self, max_results=None, labels=None):
         query = {}
         if labels:
             query["labels"] = ",".join(labels)
 
-        datasets = make_paginated_request(
+        for dataset in iter_paginated_request(
             path=f"{self.uri}/datasets",
             page_size=100,
             max_results=max_results,
             query=query,
-        )
-        return [
-            Dataset(dataset["name"], organization=self, properties=dataset)
-            for dataset in datasets
-        ]
+        ):
+            yield Dataset(dataset["name"], organization=self, properties=dataset)
 
     def list_members(self, max_results=None, labels=None, statuses=None):
+        return list(
+            self.iter_members(max_results=max_results, labels=labels, statuses=statuses)
+        )
+
+    def iter_members(self, max_results=None, labels=None, statuses=None):
         query = {}
         if labels:
             query["labels"] = ",".join(labels)
         if statuses:
             query["statuses"] = ",".join(statuses)
 
-        members = make_paginated_request(
+        for member in iter_paginated_request(
             path=f"{self.uri}/members",
             page_size=500,
             max_results=max_results,
             query=query,
-        )
-        return [
-            Member(member["user"]["name"], organization=self, properties=member)
-            for member in members
-        ]
+        ):
+            yield Member(member["user"]["name"], organization=self, properties=member)
 
     def list_workflows(self, max_results=None):
-        workflows = make_paginated_request(
+        return list(self.iter_workflows(max_results=max_results))
+
+    def iter_workflows(self, max_results=None):
+        for workflow in iter_paginated_request(
             path=f"{self.uri}/workflows",
             page_size=100,
             max_results=max_results,
-        )
-        return [
-            Workflow(workflow["name"], organization=self, properties=workflow)
-            for workflow in workflows
-        ]
+        ):
+            yield Workflow(workflow["name"], organization=self, properties=workflow)
@@ -4,7 +4,7 @@ from .Variable import Variable
 from ..common import exceptions
 
 from ..common.TabularReader import TabularReader
-from ..common.api_request import make_request, make_paginated_request
+from ..common.api_request import make_request, iter_paginated_request
 
 
 class Query(TabularReader):
@@ -47,15 +47,15 @@ class Query(TabularReader):
         return Variable(name, query=self)
 
     def list_variables(self, *, max_results=None):
+        return list(self.iter_variables(max_results=max_results))
+
+    def iter_variables(self, *, max_results=None):
         # TODO: dry run (?) + cache variables
         self._wait_for_finish()
-        variables = make_paginated_request(
+        for variable in iter_paginated_request(
             path=f"{self.uri}/variables", page_size=1000, max_results=max_results
-        )
-        return [
-            Variable(variable["name"], query=self, properties=variable)
-            for variable in variables
-        ]
+        ):
+            yield Variable(variable["name"], query=self, properties=variable)
 
     def _initiate(self):
         if not self.did_initiate:
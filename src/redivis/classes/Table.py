@@ -3,15 +3,15 @@ import os
 import time
 import glob
 import concurrent.futures
-from tqdm.auto import tqdm
+import contextvars
 
 
 from .Upload import Upload
 from .Export import Export
 from .Variable import Variable
-from ..common import exceptions
+from ..common import exceptions, instrumentation
 from ..common.TabularReader import TabularReader
-from ..common.api_request import make_request, make_paginated_request
+from ..common.api_request import make_request, iter_paginated_request
 from ..common.retryable_upload import perform_resumable_upload, perform_standard_upload
 
 
@@ -96,7 +96,7 @@ class Table(TabularReader):
         return
 
     def get(self):
-        properties = make_request(method="GET", path=self.uri)
+        properties = make_request(method="GET", path=self.uri, cache=True)
         update_properties(self, properties)
         return self
 
@@ -108,21 +108,25 @@ class Table(TabularReader):
             return False
 
     def list_uploads(self, *, max_results=None):
-        uploads = make_paginated_request(
+        return list(self.iter_uploads(max_results=max_results))
+
+    def iter_uploads(self, *, max_results=None):
+        for upload in iter_paginated_request(
             path=f"{self.uri}/uploads", max_results=max_results
-        )
-        return [
-            Upload(upload["name"], table=self, properties=upload) for upload in uploads
-        ]
+        ):
+            yield Upload(upload["name"], table=self, properties=upload)
 
     def list_variables(self, *, max_results=None):
-        variables = make_paginated_request(
-            path=f"{self.uri}/variables", page_size=1000, max_results=max_results
-        )
-        return [
-            Variable(variable["name"], table=self, properties=variable)
-            for variable in variables
-        ]
+        return list(self.iter_variables(max_results=max_results))
+
+    def iter_variables(self, *, max_results=None):
+        for variable in iter_paginated_request(
+            path=f"{self.uri}/variables",
+            page_size=1000,
+            max_results=max_results,
+            cache=True,
+        ):
+            yield Variable(variable["name"], table=self, properties=variable)
 
     def add_files(
         self,
@@ -160,6 +164,8 @@ class Table(TabularReader):
         pbar_bytes = None
         pbar_count = None
         if progress:
+            from tqdm.auto import tqdm
+
             pbar_count = tqdm(
                 total=len(files), leave=False, unit=" files", mininterval=0.1
             )
@@ -207,42 +213,59 @@ class Table(TabularReader):
                     or current_batch_size > target_batch_size
                 ):
 
-                    def upload(batch_file):
+                    def upload(batch_file, submitted_at):
                         nonlocal pbar_bytes
                         file = batch_file["file"]
                         temp_upload = batch_file["temp_upload"]
 
-                        if temp_upload["resumable"]:
-                            data = (
-                                open(file["path"], "rb")
-                                if "path" in file
-                                else file["data"]
-                            )
-                            perform_resumable_upload(
-                                data=data,
-                                progressbar=pbar_bytes,
-                                temp_upload_url=temp_upload["url"],
-                            )
-                        else:
-                            data = (
-                                open(file["path"], "rb")
-                                if "path" in file
-                                else file["data"]
-                            )
-                            perform_standard_upload(
-                                data=data,
-                                temp_upload_url=temp_upload["url"],
-                                progressbar=pbar_bytes,
-                            )
+                        with instrumentation.span(
+                            "redivis.upload_file",
+                            name=file["name"],
+                            bytes=file["size"],
+                            resumable=temp_upload["resumable"],
+                            queue_wait=time.perf_counter() - submitted_at,
+                        ):
+                            if temp_upload["resumable"]:
+                                data = (
+                                    open(file["path"], "rb")
+                                    if "path" in file
+                                    else file["data"]
+                                )
+                                perform_resumable_upload(
+                                    data=data,
+                                    progressbar=pbar_bytes,
+                                    temp_upload_url=temp_upload["url"],
+                                )
+                            else:
+                                data = (
+                                    open(file["path"], "rb")
+                                    if "path" in file
+                                    else file["data"]
+                                )
+                                perform_standard_upload(
+                                    data=data,
+                                    temp_upload_url=temp_upload["url"],
+                                    progressbar=pbar_bytes,
+                                )
 
                         if "path" in file:
                             data.close()
 
-                    with concurrent.futures.ThreadPoolExecutor(
+                    with instrumentation.span(
+                        "redivis.upload_batch",
+                        file_count=len(current_batch_files),
+                        bytes=current_batch_size,
+                    ), concurrent.futures.ThreadPoolExecutor(
                         max_workers=min(100, max_parallelization)
                     ) as executor:
+                        # Run each upload in a copy of the current context, so that its spans are nested under this batch
                         futures = [
-                            executor.submit(upload, batch_file)
+                            executor.submit(
+                                contextvars.copy_context().run,
+                                upload,
+                                batch_file,
+                                time.perf_counter(),
+                            )
                             for batch_file in current_batch_files
                         ]
 
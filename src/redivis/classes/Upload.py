@@ -7,14 +7,13 @@ import warnings
 import io
 import pathlib
 import uuid
-from tqdm.auto import tqdm
 
 from ..common import exceptions
 from ..common.TabularReader import TabularReader
 from ..common.util import convert_data_to_parquet
 
 from .Variable import Variable
-from ..common.api_request import make_request, make_paginated_request
+from ..common.api_request import make_request, iter_paginated_request
 from ..common.retryable_upload import perform_resumable_upload, perform_standard_upload
 
 MAX_SIMPLE_UPLOAD_SIZE = 2**20  # 1MB
@@ -59,6 +58,7 @@ class Upload(TabularReader):
         self.properties = make_request(
             method="GET",
             path=self.uri,
+            cache=True,
         )
         self.uri = self.properties["uri"]
 
@@ -71,13 +71,16 @@ class Upload(TabularReader):
         return response
 
     def list_variables(self, *, max_results=10000):
-        variables = make_paginated_request(
-            path=f"{self.uri}/variables", page_size=1000, max_results=max_results
-        )
-        return [
-            Variable(variable["name"], properties=variable, upload=self)
-            for variable in variables
-        ]
+        return list(self.iter_variables(max_results=max_results))
+
+    def iter_variables(self, *, max_results=10000):
+        for variable in iter_paginated_request(
+            path=f"{self.uri}/variables",
+            page_size=1000,
+            max_results=max_results,
+            cache=True,
+        ):
+            yield Variable(variable["name"], properties=variable, upload=self)
 
     def variable(self, name):
         return Variable(name, upload=self)
@@ -175,6 +178,8 @@ class Upload(TabularReader):
                 size = os.stat(content.name).st_size
 
             if progress:
+                from tqdm.auto import tqdm
+
                 pbar_bytes = tqdm(
                     total=size, unit="B", leave=False, unit_scale=True, mininterval=0.1
                 )
@@ -3,7 +3,7 @@ from .Dataset import Dataset
 from .Base import Base
 from .Secret import Secret
 from .Workflow import Workflow
-from ..common.api_request import make_paginated_request
+from ..common.api_request import iter_paginated_request
 import warnings
 
 
@@ -37,13 +37,13 @@ class User(Base):
         return Secret(name, user=self)
 
     def list_datasets(self, max_results=None):
-        datasets = make_paginated_request(
+        return list(self.iter_datasets(max_results=max_results))
+
+    def iter_datasets(self, max_results=None):
+        for dataset in iter_paginated_request(
             path=f"{self.uri}/datasets", page_size=100, max_results=max_results
-        )
-        return [
-            Dataset(dataset["name"], user=self, properties=dataset)
-            for dataset in datasets
-        ]
+        ):
+            yield Dataset(dataset["name"], user=self, properties=dataset)
 
     def list_projects(self, max_results=None):
         warnings.warn(
@@ -54,10 +54,10 @@ class User(Base):
         return self.list_workflows(max_results)
 
     def list_workflows(self, max_results=None):
-        workflows = make_paginated_request(
+        return list(self.iter_workflows(max_results=max_results))
+
+    def iter_workflows(self, max_results=None):
+        for workflow in iter_paginated_request(
             path=f"{self.uri}/workflows", page_size=100, max_results=max_results
-        )
-        return [
-            Workflow(workflow["name"], user=self, properties=workflow)
-            for workflow in workflows
-        ]
+        ):
+            yield Workflow(workflow["name"], user=self, properties=workflow)
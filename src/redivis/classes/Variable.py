@@ -41,6 +41,7 @@ class Variable(Base):
         self.properties = make_request(
             method="GET",
             path=self.uri,
+            cache=True,
         )
         self.uri = self.properties["uri"]
 
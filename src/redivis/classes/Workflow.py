@@ -10,7 +10,7 @@ from .Base import Base
 from urllib.parse import quote as quote_uri
 
 from ..common import exceptions
-from ..common.api_request import make_request, make_paginated_request
+from ..common.api_request import make_request, iter_paginated_request
 
 
 class Workflow(Base):
@@ -59,58 +59,59 @@ class Workflow(Base):
         return f"<Workflow {self.qualified_reference}>"
 
     def list_datasources(self, *, max_results=None):
-        data_sources = make_paginated_request(
+        return list(self.iter_datasources(max_results=max_results))
+
+    def iter_datasources(self, *, max_results=None):
+        for data_source in iter_paginated_request(
             path=f"{self.uri}/dataSources",
             page_size=100,
             max_results=max_results,
-        )
-        return [
-            Datasource(data_source["id"], workflow=self, properties=data_source)
-            for data_source in data_sources
-        ]
+        ):
+            yield Datasource(data_source["id"], workflow=self, properties=data_source)
 
     def list_tables(self, *, max_results=None):
-        tables = make_paginated_request(
+        return list(self.iter_tables(max_results=max_results))
+
+    def iter_tables(self, *, max_results=None):
+        for table in iter_paginated_request(
             path=f"{self.uri}/tables",
             page_size=100,
             max_results=max_results,
-        )
-        return [
-            Table(table["name"], workflow=self, properties=table) for table in tables
-        ]
+        ):
+            yield Table(table["name"], workflow=self, properties=table)
 
     def list_notebooks(self, *, max_results=None):
-        notebooks = make_paginated_request(
+        return list(self.iter_notebooks(max_results=max_results))
+
+    def iter_notebooks(self, *, max_results=None):
+        for notebook in iter_paginated_request(
             path=f"{self.uri}/notebooks",
             page_size=100,
             max_results=max_results,
-        )
-        return [
-            Notebook(name=notebook["name"], workflow=self, properties=notebook)
-            for notebook in notebooks
-        ]
+        ):
+            yield Notebook(name=notebook["name"], workflow=self, properties=notebook)
 
     def list_transforms(self, *, max_results=None):
-        transforms = make_paginated_request(
+        return list(self.iter_transforms(max_results=max_results))
+
+    def iter_transforms(self, *, max_results=None):
+        for transform in iter_paginated_request(
             path=f"{self.uri}/transforms",
             page_size=100,
             max_results=max_results,
-        )
-        return [
-            Transform(name=transform["name"], workflow=self, properties=transform)
-            for transform in transforms
-        ]
+        ):
+            yield Transform(name=transform["name"], workflow=self, properties=transform)
 
     def list_parameters(self, *, max_results=None):
-        parameters = make_paginated_request(
+        return list(self.iter_parameters(max_results=max_results))
+
+    def iter_parameters(self, *, max_results=None):
+        for parameter in iter_paginated_request(
             path=f"{self.uri}/parameters",
             page_size=100,
             max_results=max_results,
-        )
-        return [
-            Parameter(name=parameter["name"], workflow=self, properties=parameter)
-            for parameter in parameters
-        ]
+        ):
+            yield Parameter(name=parameter["name"], workflow=self, properties=parameter)
 
     def exists(self):
         try:
@@ -8,12 +8,16 @@ from ..classes.File import File
 from ..classes.Directory import Directory
 from pathlib import Path
 from contextlib import closing
-from .fetch_rows import make_rows_request
+from .fetch_rows import make_rows_request, get_filter_expression
+from . import instrumentation, table_cache
+from .auth import get_auth_token
 from ..common.api_request import make_request, make_paginated_request
 from ..common.util import get_warning
 from typing import Any, Dict, Iterable, List, Optional, Tuple, Union, Literal
 from datetime import datetime, timezone
 import weakref
+import re
+import shutil
 
 cached_directories: weakref.WeakValueDictionary[str, Directory] = (
     weakref.WeakValueDictionary()
@@ -216,87 +220,162 @@ class TabularReader(Base):
         max_results: Optional[int] = None,
         *,
         variables: Optional[Iterable[str]] = None,
+        filter: Optional[Any] = None,
         progress: bool = True,
         batch_preprocessor: Optional[Any] = None,
         max_parallelization: int = os.cpu_count() or 1,
+        path: Optional[Union[str, Path]] = None,
+        resume: bool = False,
     ) -> Any:
+        if resume and path is None:
+            raise exceptions.ValueError(
+                "A path must be provided in order to resume a read"
+            )
+
+        # Reads into a path are kept there, rather than in the cache
+        cache_key = (
+            get_table_cache_key(
+                self, max_results, variables, filter, batch_preprocessor
+            )
+            if path is None
+            else None
+        )
+        cached_result = read_from_table_cache(cache_key, output_type="arrow_dataset")
+        if cached_result is not None:
+            return cached_result
+
         mapped_variables, selected_variables, coerce_schema = get_mapped_variables(
             self, variables
         )
 
-        return make_rows_request(
+        result = make_rows_request(
             uri=self.uri,
             instance=self,
             max_results=max_results,
             selected_variables=selected_variables,
+            filter=filter,
             mapped_variables=mapped_variables,
             output_type="arrow_dataset",
             progress=progress,
             coerce_schema=coerce_schema,
             batch_preprocessor=batch_preprocessor,
-            use_export_api=should_use_export_api(self),
+            use_export_api=(
+                cache_key is None and path is None and should_use_export_api(self)
+            ),
             max_parallelization=max_parallelization,
+            output_folder=path,
+            resume=resume,
         )
+        return write_to_table_cache(cache_key, result, output_type="arrow_dataset")
 
     def to_arrow_table(
         self,
         max_results: Optional[int] = None,
         *,
         variables: Optional[Iterable[str]] = None,
+        filter: Optional[Any] = None,
         progress: bool = True,
         batch_preprocessor: Optional[Any] = None,
         max_parallelization: int = os.cpu_count() or 1,
+        compact_types: Optional[Literal["auto"]] = None,
     ) -> Any:
+        # Cached tables are stored in their full types
+        cache_key = (
+            get_table_cache_key(
+                self, max_results, variables, filter, batch_preprocessor
+            )
+            if compact_types is None
+            else None
+        )
+        cached_result = read_from_table_cache(cache_key, output_type="arrow_table")
+        if cached_result is not None:
+            return cached_result
+
         mapped_variables, selected_variables, coerce_schema = get_mapped_variables(
             self, variables
         )
 
-        return make_rows_request(
+        result = make_rows_request(
             uri=self.uri,
             instance=self,
             max_results=max_results,
             selected_variables=selected_variables,
+            filter=filter,
             mapped_variables=mapped_variables,
             output_type="arrow_table",
             progress=progress,
             coerce_schema=coerce_schema,
             batch_preprocessor=batch_preprocessor,
-            use_export_api=should_use_export_api(self),
+            use_export_api=cache_key is None and should_use_export_api(self),
             max_parallelization=max_parallelization,
+            compact_types=compact_types,
         )
+        return write_to_table_cache(cache_key, result, output_type="arrow_table")
 
     def to_polars_lazyframe(
         self,
         max_results: Optional[int] = None,
         *,
         variables: Optional[Iterable[str]] = None,
+        filter: Optional[Any] = None,
         progress: bool = True,
         batch_preprocessor: Optional[Any] = None,
         max_parallelization: int = os.cpu_count() or 1,
     ) -> Any:
+        cache_key = get_table_cache_key(
+            self, max_results, variables, filter, batch_preprocessor
+        )
+        cached_result = read_from_table_cache(
+            cache_key, output_type="polars_lazyframe"
+        )
+        if cached_result is not None:
+            return cached_result
+
         mapped_variables, selected_variables, coerce_schema = get_mapped_variables(
             self, variables
         )
 
-        return make_rows_request(
+        if (
+            cache_key is None
+            and batch_preprocessor is None
+            and not self._is_read_stream
+            and has_polars_io_plugins()
+        ):
+            return scan_polars_lazyframe(
+                self,
+                mapped_variables=mapped_variables,
+                coerce_schema=coerce_schema,
+                max_results=max_results,
+                filter=filter,
+                progress=progress,
+                max_parallelization=max_parallelization,
+            )
+
+        result = make_rows_request(
             uri=self.uri,
             instance=self,
             max_results=max_results,
             selected_variables=selected_variables,
+            filter=filter,
             mapped_variables=mapped_variables,
-            output_type="polars_lazyframe",
+            # When caching, read into feather files that can be added to the cache
+            output_type="arrow_dataset" if cache_key else "polars_lazyframe",
             progress=progress,
             coerce_schema=coerce_schema,
             batch_preprocessor=batch_preprocessor,
-            use_export_api=should_use_export_api(self),
+            use_export_api=cache_key is None and should_use_export_api(self),
             max_parallelization=max_parallelization,
         )
+        return write_to_table_cache(
+            cache_key, result, output_type="polars_lazyframe"
+        )
 
     def to_dask_dataframe(
         self,
         max_results: Optional[int] = None,
         *,
         variables: Optional[Iterable[str]] = None,
+        filter: Optional[Any] = None,
         progress: bool = True,
         batch_preprocessor: Optional[Any] = None,
         max_parallelization: int = os.cpu_count() or 1,
@@ -310,6 +389,7 @@ class TabularReader(Base):
             instance=self,
             max_results=max_results,
             selected_variables=selected_variables,
+            filter=filter,
             mapped_variables=mapped_variables,
             output_type="dask_dataframe",
             progress=progress,
@@ -324,29 +404,46 @@ class TabularReader(Base):
         max_results: Optional[int] = None,
         *,
         variables: Optional[Iterable[str]] = None,
+        filter: Optional[Any] = None,
         progress: bool = True,
         dtype_backend: str = "pyarrow",
         date_as_object: bool = False,
         batch_preprocessor: Optional[Any] = None,
         max_parallelization: int = os.cpu_count() or 1,
+        compact_types: Optional[Literal["auto"]] = None,
     ) -> Any:
-        mapped_variables, selected_variables, coerce_schema = get_mapped_variables(
-            self, variables
+        # Cached tables are stored in their full types
+        cache_key = (
+            get_table_cache_key(
+                self, max_results, variables, filter, batch_preprocessor
+            )
+            if compact_types is None
+            else None
         )
+        arrow_table = read_from_table_cache(cache_key, output_type="arrow_table")
+        if arrow_table is None:
+            mapped_variables, selected_variables, coerce_schema = (
+                get_mapped_variables(self, variables)
+            )
 
-        arrow_table = make_rows_request(
-            uri=self.uri,
-            instance=self,
-            max_results=max_results,
-            selected_variables=selected_variables,
-            mapped_variables=mapped_variables,
-            output_type="arrow_table",
-            progress=progress,
-            coerce_schema=coerce_schema,
-            batch_preprocessor=batch_preprocessor,
-            use_export_api=should_use_export_api(self),
-            max_parallelization=max_parallelization,
-        )
+            arrow_table = make_rows_request(
+                uri=self.uri,
+                instance=self,
+                max_results=max_results,
+                selected_variables=selected_variables,
+                filter=filter,
+                mapped_variables=mapped_variables,
+                output_type="arrow_table",
+                progress=progress,
+                coerce_schema=coerce_schema,
+                batch_preprocessor=batch_preprocessor,
+                use_export_api=cache_key is None and should_use_export_api(self),
+                max_parallelization=max_parallelization,
+                compact_types=compact_types,
+            )
+            arrow_table = write_to_table_cache(
+                cache_key, arrow_table, output_type="arrow_table"
+            )
         return arrow_table_to_pandas(
             arrow_table, dtype_backend, date_as_object, max_parallelization
         )
@@ -356,6 +453,7 @@ class TabularReader(Base):
         max_results: Optional[int] = None,
         *,
         variables: Optional[Iterable[str]] = None,
+        filter: Optional[Any] = None,
         geography_variable: Union[str, None, Literal[""]] = "",
         progress: bool = True,
         dtype_backend: str = "pyarrow",
@@ -374,6 +472,7 @@ class TabularReader(Base):
             instance=self,
             max_results=max_results,
             selected_variables=selected_variables,
+            filter=filter,
             mapped_variables=mapped_variables,
             output_type="arrow_table",
             progress=progress,
@@ -459,7 +558,12 @@ class TabularReader(Base):
         max_results: Optional[int] = None,
         *,
         variables: Optional[Iterable[str]] = None,
+        filter: Optional[Any] = None,
         progress: bool = True,
+        max_parallelization: int = os.cpu_count() or 1,
+        ordered: bool = True,
+        target_batch_rows: Optional[int] = None,
+        target_batch_bytes: Optional[int] = None,
     ) -> Iterable[Any]:
         mapped_variables, selected_variables, coerce_schema = get_mapped_variables(
             self, variables
@@ -470,10 +574,40 @@ class TabularReader(Base):
             instance=self,
             max_results=max_results,
             selected_variables=selected_variables,
+            filter=filter,
             mapped_variables=mapped_variables,
             output_type="arrow_iterator",
             progress=progress,
             coerce_schema=coerce_schema,
+            max_parallelization=max_parallelization,
+            ordered=ordered,
+            target_batch_rows=target_batch_rows,
+            target_batch_bytes=target_batch_bytes,
+        )
+
+    def to_arrow_batch_iterator_async(
+        self,
+        max_results: Optional[int] = None,
+        *,
+        variables: Optional[Iterable[str]] = None,
+        filter: Optional[Any] = None,
+        max_parallelization: int = os.cpu_count() or 1,
+        ordered: bool = True,
+        target_batch_rows: Optional[int] = None,
+        target_batch_bytes: Optional[int] = None,
+    ) -> Any:
+        from .fetch_rows_async import AsyncArrowIterator
+
+        # Nothing is requested until the first batch is awaited, so this can be called outside of an event loop
+        return AsyncArrowIterator(
+            self,
+            max_results=max_results,
+            variables=variables,
+            filter=filter,
+            max_parallelization=max_parallelization,
+            ordered=ordered,
+            target_batch_rows=target_batch_rows,
+            target_batch_bytes=target_batch_bytes,
         )
 
     def to_sas(
@@ -764,6 +898,48 @@ class TabularReader(Base):
             stata.run(load_script, quietly=True)
             stata.run("describe")
 
+    def to_duckdb(
+        self,
+        connection: Optional[Any] = None,
+        name: Optional[str] = None,
+        *,
+        variables: Optional[Iterable[str]] = None,
+        max_results: Optional[int] = None,
+        max_parallelization: int = os.cpu_count() or 1,
+    ) -> Any:
+        from .arrow_scan import register
+
+        if name is None:
+            if not self._is_table:
+                raise exceptions.ValueError(
+                    "A name must be provided to register a query or upload in DuckDB"
+                )
+            name = self.name
+        if connection is None:
+            import duckdb
+
+            connection = duckdb.connect()
+
+        return register(
+            connection,
+            name,
+            self,
+            variables=variables,
+            max_results=max_results,
+            max_parallelization=max_parallelization,
+        )
+
+    def select(self, *variables: str) -> "ArrowStreamView":
+        return ArrowStreamView(self).select(*variables)
+
+    def limit(self, max_results: int) -> "ArrowStreamView":
+        return ArrowStreamView(self).limit(max_results)
+
+    # Arrow PyCapsule interface, so that Arrow-native libraries (pyarrow, polars, duckdb, datafusion...) can
+    # consume the rows as a stream of record batches. Use select() / limit() to read a subset.
+    def __arrow_c_stream__(self, requested_schema: Optional[Any] = None) -> Any:
+        return ArrowStreamView(self).__arrow_c_stream__(requested_schema)
+
     def list_rows(
         self,
         max_results: Optional[int] = None,
@@ -776,6 +952,78 @@ class TabularReader(Base):
         )
 
 
+class ArrowStreamView:
+    """A subset of a table, query, or read stream's rows, which is only read once it's consumed through the Arrow
+    PyCapsule interface, e.g. pyarrow.table(table.select("a", "b").limit(1000)) or duckdb.sql("SELECT ... FROM view").
+    """
+
+    def __init__(
+        self,
+        reader: TabularReader,
+        variables: Optional[List[str]] = None,
+        max_results: Optional[int] = None,
+    ):
+        self.reader = reader
+        self.variables = variables
+        self.max_results = max_results
+
+    def __repr__(self) -> str:
+        return f"<ArrowStreamView {self.reader!r} variables={self.variables} max_results={self.max_results}>"
+
+    def select(self, *variables: str) -> "ArrowStreamView":
+        if self.reader._is_read_stream:
+            raise exceptions.ValueError(
+                "Cannot select variables of a ReadStream. Specify the variables when calling to_read_streams()."
+            )
+        return ArrowStreamView(self.reader, list(variables), self.max_results)
+
+    def limit(self, max_results: int) -> "ArrowStreamView":
+        if max_results < 0:
+            raise exceptions.ValueError("max_results must be at least 0")
+        if self.max_results is not None:
+            max_results = min(max_results, self.max_results)
+        return ArrowStreamView(self.reader, self.variables, max_results)
+
+    def __arrow_c_stream__(self, requested_schema: Optional[Any] = None) -> Any:
+        import pyarrow
+        from .fetch_rows import variable_to_field
+
+        mapped_variables, selected_variables, coerce_schema = get_mapped_variables(
+            self.reader, self.variables
+        )
+        batch_iterator = make_rows_request(
+            uri=self.reader.uri,
+            instance=self.reader,
+            max_results=self.max_results,
+            selected_variables=selected_variables,
+            mapped_variables=mapped_variables,
+            output_type="arrow_iterator",
+            progress=False,
+            coerce_schema=coerce_schema,
+        )
+        # Batches are read as the consumer pulls them, so at most a few batches per stream are held in memory
+        batch_reader = pyarrow.RecordBatchReader.from_batches(
+            pyarrow.schema(map(variable_to_field, mapped_variables)),
+            limit_batches(batch_iterator, self.max_results),
+        )
+        return batch_reader.__arrow_c_stream__(requested_schema)
+
+
+def limit_batches(batch_iterator: Iterable[Any], max_results: Optional[int]) -> Any:
+    # Read streams don't accept maxResults, so the row limit is also applied here
+    row_count = 0
+    try:
+        for batch in batch_iterator:
+            if max_results is not None and row_count + batch.num_rows >= max_results:
+                yield batch.slice(0, max_results - row_count)
+                return
+            row_count += batch.num_rows
+            yield batch
+    finally:
+        if hasattr(batch_iterator, "close"):
+            batch_iterator.close()
+
+
 def check_is_ready(self: TabularReader) -> None:
     if self._is_query:
         self._wait_for_finish()
@@ -804,7 +1052,9 @@ def get_mapped_variables(
     if self._is_table:
         coerce_schema = self.properties["container"]["kind"] == "dataset"
 
-    all_variables = make_paginated_request(path=f"{self.uri}/variables", page_size=1000)
+    all_variables = make_paginated_request(
+        path=f"{self.uri}/variables", page_size=1000, cache=True
+    )
 
     if variables is None:
         return all_variables, variables, coerce_schema
@@ -841,6 +1091,9 @@ def arrow_table_to_pandas(
             self_destruct=True,
             date_as_object=date_as_object,
             types_mapper={
+                pa.int8(): pd.Int8Dtype(),
+                pa.int16(): pd.Int16Dtype(),
+                pa.int32(): pd.Int32Dtype(),
                 pa.int64(): pd.Int64Dtype(),
                 pa.bool_(): pd.BooleanDtype(),
                 pa.float64(): pd.Float64Dtype(),
@@ -883,3 +1136,155 @@ def should_use_export_api(self: TabularReader) -> bool:
     return self.properties.get("numBytes") > (
         1e10 if os.getenv("REDIVIS_DEFAULT_NOTEBOOK") is None else 1e11
     )
+
+
+def has_polars_io_plugins() -> bool:
+    # Custom IO sources were added in polars 1.x; older versions read every stream up front
+    try:
+        from polars.io.plugins import register_io_source
+    except ImportError:
+        return False
+    return True
+
+
+def scan_polars_lazyframe(
+    self: TabularReader,
+    *,
+    mapped_variables: List[Dict[str, Any]],
+    coerce_schema: bool,
+    max_results: Optional[int],
+    filter: Optional[Any],
+    progress: bool,
+    max_parallelization: int,
+) -> Any:
+    import polars
+    import pyarrow
+    from polars.io.plugins import register_io_source
+    from .fetch_rows import variable_to_field
+
+    schema = polars.from_arrow(
+        pyarrow.schema(map(variable_to_field, mapped_variables)).empty_table()
+    ).schema
+
+    # Called by polars when the lazyframe is collected, with the query's projection, predicate, and row limit.
+    # Only the projected variables are read, and with no predicate, the row limit becomes maxResults.
+    # Predicates are evaluated on each batch as it arrives, so rows that don't match are never held.
+    def read_batches(with_columns, predicate, n_rows, batch_size):
+        # The filter may reference variables outside of the projection, so it needs all of them
+        project_variables = with_columns is not None and filter is None
+        read_variables = (
+            [v for v in mapped_variables if v["name"] in with_columns]
+            if project_variables
+            else mapped_variables
+        )
+        read_max_results = max_results
+        if n_rows is not None and predicate is None:
+            read_max_results = (
+                n_rows if max_results is None else min(n_rows, max_results)
+            )
+
+        batch_iterator = make_rows_request(
+            uri=self.uri,
+            instance=self,
+            max_results=read_max_results,
+            selected_variables=(
+                [v["name"] for v in read_variables] if project_variables else None
+            ),
+            filter=filter,
+            mapped_variables=read_variables,
+            output_type="arrow_iterator",
+            progress=progress,
+            coerce_schema=coerce_schema,
+            max_parallelization=max_parallelization,
+        )
+        row_count = 0
+        try:
+            for batch in batch_iterator:
+                df = polars.from_arrow(batch)
+                if predicate is not None:
+                    df = df.filter(predicate)
+                if with_columns is not None and not project_variables:
+                    df = df.select(with_columns)
+                if n_rows is not None and row_count + df.height >= n_rows:
+                    yield df.head(n_rows - row_count)
+                    return
+                row_count += df.height
+                yield df
+        finally:
+            if hasattr(batch_iterator, "close"):
+                batch_iterator.close()
+
+    return register_io_source(read_batches, schema=schema)
+
+
+def get_table_cache_key(
+    self: TabularReader,
+    max_results: Optional[int],
+    variables: Optional[Iterable[str]],
+    filter: Optional[Any],
+    batch_preprocessor: Optional[Any],
+) -> Optional[str]:
+    # Only tables in a specific dataset version (e.g. "user.dataset:v1_2.table") are immutable and can be cached.
+    # This is determined from the reference alone, so that cache hits don't make any requests.
+    if (
+        not table_cache.is_enabled()
+        or not self._is_table
+        or batch_preprocessor is not None
+        or not re.search(r":v\d+[._]\d+(?=[.:])", self.qualified_reference)
+    ):
+        return None
+
+    return table_cache.get_key(
+        qualified_reference=self.qualified_reference,
+        variables=variables,
+        filter_expression=get_filter_expression(filter),
+        max_results=max_results,
+        auth_token=get_auth_token(),
+    )
+
+
+def read_from_table_cache(cache_key: Optional[str], output_type: str) -> Any:
+    entry_path = table_cache.get(cache_key) if cache_key is not None else None
+    if entry_path is None:
+        return None
+    try:
+        result = table_cache.read(entry_path, output_type)
+    except OSError:
+        # Evicted by another process
+        return None
+    instrumentation.record_event("redivis.table_cache_hit", cache_key=cache_key)
+    return result
+
+
+def write_to_table_cache(
+    cache_key: Optional[str], result: Any, output_type: str
+) -> Any:
+    if cache_key is None:
+        return result
+
+    if output_type == "arrow_table":
+        table_cache.put_table(cache_key, result)
+        return result
+
+    # Dataset and lazyframe reads were made as an arrow_dataset of feather files, which are added to the cache
+    folder_path = os.path.dirname(result.files[0]) if result.files else None
+    if folder_path is not None:
+        entry_path = table_cache.put_folder(cache_key, folder_path)
+    else:
+        # No rows were returned; cache an empty file with the table's schema
+        entry_path = table_cache.put_table(cache_key, result.to_table())
+
+    if entry_path is not None:
+        try:
+            cached_result = table_cache.read(entry_path, output_type)
+            if folder_path is not None:
+                shutil.rmtree(folder_path, ignore_errors=True)
+            return cached_result
+        except OSError:
+            pass
+
+    if output_type == "polars_lazyframe":
+        import polars
+
+        return polars.scan_ipc(result.files, memory_map=True)
+    return result
@@ -1,16 +1,91 @@
-import requests
+import niquests
+import asyncio
+import atexit
+import concurrent.futures
+import contextvars
+import inspect
 import logging
 import os
-import json
 import platform
+import threading
 import warnings
 from urllib.parse import unquote
 import time
+import weakref
 
+from niquests.exceptions import RequestException
+
+from . import exceptions, instrumentation, json_codec, metadata_cache
+from .retry_policy import get_retry_policy, get_retry_after, is_retryable_status
 from .auth import get_auth_token, refresh_credentials
 from .._version import __version__
 from .util import raise_api_error
 
+DEFAULT_POOL_SIZE = 32
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+_async_sessions = weakref.WeakKeyDictionary()
+
+
+def get_pool_size():
+    pool_size = int(os.getenv("REDIVIS_HTTP_POOL_SIZE", DEFAULT_POOL_SIZE))
+    if pool_size < 1:
+        raise exceptions.ValueError("REDIVIS_HTTP_POOL_SIZE must be at least 1")
+    return pool_size
+
+
+def get_session():
+    """Return the process-wide pooled HTTP session used for all API requests.
+
+    Connections are kept alive and reused across calls (and multiplexed over a
+    single connection when the server negotiates HTTP/2). The pool size can be
+    configured via the REDIVIS_HTTP_POOL_SIZE environment variable. The session
+    is recreated after a fork, since pooled sockets can't be shared across processes.
+    """
+    global _session, _session_pid
+
+    if _session is not None and _session_pid == os.getpid():
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            _session = niquests.Session(
+                pool_connections=4,
+                pool_maxsize=get_pool_size(),
+            )
+            _session_pid = os.getpid()
+
+    return _session
+
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None and _session_pid == os.getpid():
+            _session.close()
+        _session = None
+
+
+atexit.register(close_session)
+
+
+def get_async_session():
+    """Return the pooled async HTTP session for the currently running event loop.
+
+    Async sessions can't be shared across event loops, so one is created per loop.
+    """
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None:
+        session = niquests.AsyncSession(
+            pool_connections=4,
+            pool_maxsize=get_pool_size(),
+        )
+        _async_sessions[loop] = session
+    return session
+
 
 def make_request(
     *,
@@ -23,12 +98,39 @@ def make_request(
     stream=False,
     files=None,
     headers=None,
-    retry_count=0,
+    retry_state=None,
+    cache=False,
+    credentials_refreshed=False,
 ):
     if headers is None:
         headers = {}
 
     original_parameters = locals().copy()
+
+    # Only metadata lookups opt into the cache; any other write to a resource invalidates it
+    use_cache = (
+        cache
+        and method.upper() == "GET"
+        and parse_response
+        and not stream
+        and metadata_cache.is_enabled()
+    )
+    cache_key = None
+    cache_entry = None
+    if use_cache:
+        cache_key = metadata_cache.get_key(
+            path, query, auth_token=get_auth_token()
+        )
+        cache_entry = metadata_cache.get(cache_key)
+        if cache_entry is not None:
+            if cache_entry.is_fresh():
+                logging.debug(f"Using cached API response for '{cache_key}'")
+                instrumentation.record_event("redivis.metadata_cache_hit", path=path)
+                return cache_entry.value()
+            headers = {**headers, **cache_entry.validation_headers()}
+    elif method.upper() not in ("GET", "HEAD"):
+        metadata_cache.invalidate(path)
+
     args = get_request_args(
         method=method,
         path=path,
@@ -41,13 +143,142 @@ def make_request(
     )
 
     logging.debug(f"Making API '{method}' request to '{args['url']}'")
-    r = requests.request(**args)
+    try:
+        with instrumentation.span(
+            "redivis.request",
+            method=method.upper(),
+            path=path,
+            stream=stream,
+            retry_count=retry_state.retry_count if retry_state else 0,
+        ) as span:
+            r = get_session().request(**args)
+            set_response_attributes(span, r)
+    except RequestException as e:
+        # Streaming callers resume from their own offsets, and other methods may not be idempotent
+        if stream or method.upper() not in ("GET", "HEAD"):
+            raise
+        if retry_state is None:
+            retry_state = get_retry_policy().start()
+        if not retry_state.sleep():
+            raise exceptions.NetworkError(
+                message=f"A network error occurred. API request failed after {retry_state.retry_count} retries.",
+                original_exception=e,
+            ) from e
+        logging.debug(f"A network error occurred, retrying API request: {e}")
+        return make_request(**{**original_parameters, "retry_state": retry_state})
+
+    if cache_entry is not None and r.status_code == 304:
+        metadata_cache.revalidate(cache_entry)
+        return cache_entry.value()
 
-    return process_request_response(r, parse_response, method, original_parameters)
+    res = process_request_response(r, parse_response, method, original_parameters)
+    if use_cache:
+        metadata_cache.put(cache_key, r)
+    return res
+
+
+async def make_request_async(
+    *,
+    method="GET",
+    path="",
+    query=None,
+    payload=None,
+    parse_payload=True,
+    parse_response=True,
+    stream=False,
+    headers=None,
+    retry_state=None,
+    cache=False,
+    credentials_refreshed=False,
+):
+    if headers is None:
+        headers = {}
+
+    original_parameters = locals().copy()
+
+    use_cache = (
+        cache
+        and method.upper() == "GET"
+        and parse_response
+        and not stream
+        and metadata_cache.is_enabled()
+    )
+    cache_key = None
+    cache_entry = None
+    if use_cache:
+        cache_key = metadata_cache.get_key(
+            path, query, auth_token=get_auth_token()
+        )
+        cache_entry = metadata_cache.get(cache_key)
+        if cache_entry is not None:
+            if cache_entry.is_fresh():
+                return cache_entry.value()
+            headers = {**headers, **cache_entry.validation_headers()}
+    elif method.upper() not in ("GET", "HEAD"):
+        metadata_cache.invalidate(path)
+
+    args = get_request_args(
+        method=method,
+        path=path,
+        query=query,
+        payload=payload,
+        parse_payload=parse_payload,
+        stream=stream,
+        headers=headers,
+    )
+
+    logging.debug(f"Making async API '{method}' request to '{args['url']}'")
+    try:
+        with instrumentation.span(
+            "redivis.request",
+            method=method.upper(),
+            path=path,
+            stream=stream,
+            retry_count=retry_state.retry_count if retry_state else 0,
+        ) as span:
+            r = await get_async_session().request(**args)
+            set_response_attributes(span, r)
+    except RequestException as e:
+        # Streaming callers resume from their own offsets, and other methods may not be idempotent
+        if stream or method.upper() not in ("GET", "HEAD"):
+            raise
+        if retry_state is None:
+            retry_state = get_retry_policy().start()
+        if not await retry_state.sleep_async():
+            raise exceptions.NetworkError(
+                message=f"A network error occurred. API request failed after {retry_state.retry_count} retries.",
+                original_exception=e,
+            ) from e
+        logging.debug(f"A network error occurred, retrying API request: {e}")
+        return await make_request_async(
+            **{**original_parameters, "retry_state": retry_state}
+        )
+
+    if stream:
+        return await process_stream_response_async(r, original_parameters)
+
+    if cache_entry is not None and r.status_code == 304:
+        metadata_cache.revalidate(cache_entry)
+        return cache_entry.value()
+
+    res = process_request_response(
+        r, parse_response, method, original_parameters, retry=make_request_async
+    )
+    if inspect.isawaitable(res):
+        res = await res
+    if use_cache:
+        metadata_cache.put(cache_key, r)
+    return res
 
 
 def make_paginated_request(
-    *, path, query={}, page_size=100, max_results=None, parse_response=True
+    *,
+    path,
+    query={},
+    page_size=100,
+    max_results=None,
+    parse_response=True,
+    cache=False,
 ):
     logging.debug(f"Making paginated API request to '{path}'")
 
@@ -63,6 +294,126 @@ def make_paginated_request(
             method="get",
             path=path,
             parse_response=True,
+            cache=cache,
+            query={
+                **query,
+                **{
+                    "pageToken": next_page_token,
+                    "maxResults": (
+                        page_size
+                        if max_results is None or (page + 1) * page_size < max_results
+                        else max_results - page * page_size
+                    ),
+                },
+            },
+        )
+        page += 1
+        results += response["results"]
+        next_page_token = response["nextPageToken"]
+        if not next_page_token:
+            break
+
+    return results
+
+
+def iter_paginated_request(
+    *, path, query={}, page_size=100, max_results=None, prefetch=True, cache=False
+):
+    """Lazily yield the results of a paginated list endpoint, one item at a time.
+
+    Items are yielded as soon as their page arrives. When prefetch is True, the next
+    page is requested on a background thread while the caller works on the current one.
+    """
+    logging.debug(f"Making paginated API request to '{path}'")
+
+    def fetch_page(next_page_token, fetched_count):
+        return make_request(
+            method="get",
+            path=path,
+            parse_response=True,
+            cache=cache,
+            query={
+                **query,
+                **{
+                    "pageToken": next_page_token,
+                    "maxResults": (
+                        page_size
+                        if max_results is None
+                        else min(page_size, max_results - fetched_count)
+                    ),
+                },
+            },
+        )
+
+    if max_results is not None and max_results <= 0:
+        return
+
+    executor = (
+        concurrent.futures.ThreadPoolExecutor(max_workers=1) if prefetch else None
+    )
+    next_page = None
+    yielded_count = 0
+    fetched_count = 0
+
+    try:
+        response = fetch_page(None, 0)
+        while True:
+            results = response["results"]
+            fetched_count += len(results)
+            next_page_token = response["nextPageToken"]
+
+            has_next_page = bool(next_page_token) and (
+                max_results is None or fetched_count < max_results
+            )
+            if has_next_page and executor is not None:
+                # Run in a copy of the caller's context, so the request keeps its span and cache context
+                next_page = executor.submit(
+                    contextvars.copy_context().run,
+                    fetch_page,
+                    next_page_token,
+                    fetched_count,
+                )
+
+            for item in results:
+                if max_results is not None and yielded_count >= max_results:
+                    return
+                yielded_count += 1
+                yield item
+
+            if not has_next_page:
+                return
+
+            response = (
+                next_page.result()
+                if executor is not None
+                else fetch_page(next_page_token, fetched_count)
+            )
+            next_page = None
+    finally:
+        if next_page is not None:
+            next_page.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+async def make_paginated_request_async(
+    *, path, query={}, page_size=100, max_results=None, cache=False
+):
+    logging.debug(f"Making async paginated API request to '{path}'")
+
+    page = 0
+    results = []
+    next_page_token = None
+
+    while True:
+        if max_results is not None and len(results) >= max_results:
+            break
+
+        response = await make_request_async(
+            method="get",
+            path=path,
+            parse_response=True,
+            cache=cache,
             query={
                 **query,
                 **{
@@ -84,6 +435,15 @@ def make_paginated_request(
     return results
 
 
+def set_response_attributes(span, r):
+    content_length = r.headers.get("Content-Length")
+    span.set(
+        status_code=r.status_code,
+        response_bytes=int(content_length) if content_length else None,
+        http_version=getattr(r, "http_version", None),
+    )
+
+
 def get_request_args(
     method,
     path,
@@ -107,7 +467,7 @@ def get_request_args(
     }
 
     if parse_payload and payload:
-        payload = json.dumps(payload)
+        payload = json_codec.dumps(payload)
         headers["Content-Type"] = "application/json"
 
     return {
@@ -126,31 +486,47 @@ previously_printed_warnings = {}
 
 
 def process_request_response(
-    r, parse_response=True, method=None, original_parameters=None
+    r, parse_response=True, method=None, original_parameters=None, retry=None
 ):
+    # Re-issues the original request; for async requests this returns a coroutine
+    if retry is None:
+        retry = make_request
+
     method = method.lower()
     response_json = {}
-    try:
-        # Retry with exponential backoff on service unavailable
-        if r.status_code == 503 and original_parameters["retry_count"] < 0:
-            logging.debug("API is currently unavailable, retrying...")
-            time.sleep(original_parameters["retry_count"])
-            original_parameters["retry_count"] += 1
-            return make_request(**original_parameters)
+    retry_with_refreshed_credentials = False
 
+    # Retry with exponential backoff when the API is throttling us or is temporarily unavailable
+    if is_retryable_status(r.status_code) and original_parameters is not None:
+        retry_state = original_parameters["retry_state"] or get_retry_policy().start()
+        delay = retry_state.get_next_delay(get_retry_after(r))
+        if delay is not None:
+            logging.debug(
+                f"API responded with status {r.status_code}, retrying in {delay:.1f}s..."
+            )
+            retry_parameters = {**original_parameters, "retry_state": retry_state}
+            if inspect.iscoroutinefunction(retry):
+                return retry_after_delay_async(retry, delay, retry_parameters)
+            r.close()
+            time.sleep(delay)
+            return retry(**retry_parameters)
+
+    try:
+        # Parse the raw bytes, rather than r.text / r.json(), so that large responses
+        # (e.g., pages of variables) aren't also decoded into an intermediate str
         if r.status_code >= 400 or (
-            method != "head" and parse_response and r.text != "OK"
+            method != "head" and parse_response and r.content != b"OK"
         ):
             if method == "head":
                 if "X-REDIVIS-ERROR-PAYLOAD" in r.headers:
-                    response_json = json.loads(
+                    response_json = json_codec.loads(
                         unquote(r.headers["X-REDIVIS-ERROR-PAYLOAD"])
                     )
                 else:
                     # This should never happen
                     response_json = {"error": "unknown_error", "status": r.status_code}
             else:
-                response_json = r.json()
+                response_json = json_codec.loads(r.content)
 
         if (
             (
@@ -162,11 +538,14 @@ def process_request_response(
             )
             and os.getenv("REDIVIS_API_TOKEN") is None
             and os.getenv("REDIVIS_DEFAULT_NOTEBOOK") is None
+            # Credentials are refreshed at most once per call; a second 401 is raised
+            and original_parameters is not None
+            and not original_parameters["credentials_refreshed"]
         ):
             warnings.warn(
                 f"{response_json['error']}: {response_json['error_description']}"
             )
-            refresh_credentials(
+            refreshed_token = refresh_credentials(
                 scope=(
                     response_json["scope"].split(" ")
                     if "scope" in response_json
@@ -178,7 +557,12 @@ def process_request_response(
                     else None
                 ),
             )
-            return make_request(**original_parameters)
+            # Only retry with a new token; otherwise (e.g., the token was revoked) the retry would fail again
+            request_headers = getattr(getattr(r, "request", None), "headers", None)
+            request_authorization = (request_headers or {}).get("Authorization")
+            retry_with_refreshed_credentials = (
+                request_authorization != f"Bearer {refreshed_token}"
+            )
     except Exception:
         if method == "head":
             error_payload = r.headers.get("X-REDIVIS-ERROR-PAYLOAD")
@@ -190,6 +574,10 @@ def process_request_response(
         else:
             raise_api_error(response_text=r.text, response=r)
 
+    if retry_with_refreshed_credentials:
+        # Outside of the try block, so that errors from the retried request are raised as-is
+        return retry(**{**original_parameters, "credentials_refreshed": True})
+
     if "X-REDIVIS-WARNING" in r.headers:
         global previously_printed_warnings
         if r.headers["X-REDIVIS-WARNING"] not in previously_printed_warnings:
@@ -204,6 +592,39 @@ def process_request_response(
         return r
 
 
+async def process_stream_response_async(r, original_parameters):
+    # The body of a streamed async response is read by the caller, so only error responses are read here
+    if r.status_code < 400:
+        return r
+
+    content = await r.content
+    if is_retryable_status(r.status_code):
+        retry_state = original_parameters["retry_state"] or get_retry_policy().start()
+        if await retry_state.sleep_async(get_retry_after(r)):
+            logging.debug(
+                f"API responded with status {r.status_code}, retrying streamed request"
+            )
+            return await make_request_async(
+                **{**original_parameters, "retry_state": retry_state}
+            )
+
+    try:
+        response_json = json_codec.loads(content)
+    except Exception:
+        response_json = None
+    if response_json is None:
+        raise_api_error(
+            response_text=content.decode("utf-8", errors="replace") if content else "",
+            response=r,
+        )
+    raise_api_error(response_json=response_json, response=r)
+
+
+async def retry_after_delay_async(retry, delay, retry_parameters):
+    await asyncio.sleep(delay)
+    return await retry(**retry_parameters)
+
+
 def __get_user_agent():
     return f"redivis-python/{__version__} ({platform.platform()}; Python/{platform.python_version()})"
 
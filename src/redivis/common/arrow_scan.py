@@ -0,0 +1,112 @@
+import os
+import pyarrow
+import pyarrow.dataset
+
+from . import exceptions
+from .fetch_rows import make_rows_request, variable_to_field
+
+# Exposes a table, query, or upload to DuckDB as a pyarrow dataset. DuckDB scans pyarrow datasets by calling their
+# scanner() with the columns that the SQL references and the filters it can push down, so each query only reads the
+# variables it needs (as selectedVariables), and drops non-matching rows as batches arrive. The streams of the
+# read session are read in parallel, and batches are pulled as DuckDB consumes them, so a LIMIT stops the read early.
+
+
+class ReadSessionDataset(pyarrow.dataset.Dataset):
+    """A pyarrow Dataset whose scans create a read session for the columns and filter of the scan."""
+
+    def __init__(
+        self,
+        reader,
+        *,
+        mapped_variables,
+        coerce_schema,
+        max_results=None,
+        max_parallelization=os.cpu_count() or 1,
+    ):
+        # The underlying C++ dataset is never initialized; scans only use the schema and scanner() of the dataset
+        self.reader = reader
+        self.mapped_variables = mapped_variables
+        self.variables_by_name = {v["name"].lower(): v for v in mapped_variables}
+        self.coerce_schema = coerce_schema
+        self.max_results = max_results
+        self.max_parallelization = max_parallelization
+        self._schema = pyarrow.schema(map(variable_to_field, mapped_variables))
+
+    def __repr__(self):
+        return f"<ReadSessionDataset {self.reader!r}>"
+
+    @property
+    def schema(self):
+        return self._schema
+
+    def scanner(self, columns=None, filter=None, **kwargs):
+        from .TabularReader import limit_batches
+
+        if columns is not None and not isinstance(columns, list):
+            raise exceptions.ValueError(
+                "Only a list of column names is supported as the projection of a Redivis scan"
+            )
+        variables = (
+            [self.variables_by_name[c.lower()] for c in columns]
+            if columns is not None
+            else self.mapped_variables
+        )
+        batch_iterator = make_rows_request(
+            uri=self.reader.uri,
+            instance=self.reader,
+            max_results=self.max_results,
+            selected_variables=(
+                [v["name"] for v in variables] if columns is not None else None
+            ),
+            filter=filter,
+            mapped_variables=variables,
+            output_type="arrow_iterator",
+            progress=False,
+            coerce_schema=self.coerce_schema,
+            max_parallelization=self.max_parallelization,
+            ordered=False,
+        )
+        return pyarrow.dataset.Scanner.from_batches(
+            limit_batches(batch_iterator, self.max_results),
+            schema=pyarrow.schema(map(variable_to_field, variables)),
+        )
+
+
+def register(
+    connection,
+    name,
+    reader,
+    *,
+    variables=None,
+    max_results=None,
+    max_parallelization=os.cpu_count() or 1,
+):
+    from .TabularReader import get_mapped_variables
+
+    mapped_variables, _, coerce_schema = get_mapped_variables(reader, variables)
+    connection.register(
+        name,
+        ReadSessionDataset(
+            reader,
+            mapped_variables=mapped_variables,
+            coerce_schema=coerce_schema,
+            max_results=max_results,
+            max_parallelization=max_parallelization,
+        ),
+    )
+    return connection
+
+
+def connect(connection=None, **readers):
+    """Registers each table, query, or upload as a view named by its keyword, and returns the DuckDB connection:
+
+    con = redivis.duckdb(observations=redivis.table("demo.ghcn_daily_weather_data.daily_observations"))
+    con.sql("SELECT id, AVG(value) FROM observations JOIN 'stations.parquet' USING (id) GROUP BY id")
+    """
+    if connection is None:
+        import duckdb
+
+        connection = duckdb.connect()
+    for name, reader in readers.items():
+        register(connection, name, reader)
+    return connection
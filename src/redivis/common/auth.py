@@ -6,13 +6,27 @@ import warnings
 import base64
 from pathlib import Path
 import re
-import requests
+import logging
+import threading
+from contextlib import contextmanager
 
 from . import exceptions
 from .util import raise_api_error
 
 redivis_dir = Path.home() / ".redivis"
 cached_credentials = None
+cached_credential_scope = (None, None)
+credentials_lock = threading.RLock()
+background_refresh_lock = threading.Lock()
+background_refresh_thread = None
+background_refresh_started_at = 0
+last_refreshed_at = 0
+# Tokens are refreshed in the background once they're within proactive_refresh_window seconds of expiring,
+# while callers continue to use the current token. Within blocking_refresh_window seconds, callers wait for the refresh.
+proactive_refresh_window = 5 * 60
+blocking_refresh_window = 60
+# Concurrent 401s within this many seconds of a refresh reuse the refreshed token, rather than refreshing again
+min_refresh_interval = 10
 verify_ssl = (
     os.getenv("REDIVIS_API_ENDPOINT", "https://redivis.com").find(
         "https://localhost", 0
@@ -29,8 +43,6 @@ base_url = re.match(
 
 
 def get_auth_token(scope=None):
-    global cached_credentials
-
     if not scope:
         scope = default_scope
 
@@ -46,45 +58,101 @@ This environment variable should only ever be set in a non-interactive environme
 """
             )
         return os.environ["REDIVIS_API_TOKEN"]
-    elif cached_credentials is None and credentials_file.is_file():
-        try:
-            with open(credentials_file, "r") as f:
-                cached_credentials = json.load(f)
-        except Exception as e:
-            """ignore"""
 
-    missing_scope = list(set(scope) - set(get_current_credential_scope()))
+    # Fast path, called on every request: no locking as long as the cached token is valid
+    credentials = cached_credentials
+    if has_valid_credentials(credentials, scope):
+        expires_in = credentials["expires_at"] - time.time()
+        if expires_in > proactive_refresh_window:
+            return credentials["access_token"]
+        elif expires_in > blocking_refresh_window and "refresh_token" in credentials:
+            start_background_refresh()
+            return credentials["access_token"]
+
+    with credentials_lock:
+        return _get_auth_token(scope)
 
-    if (
-        cached_credentials is not None
-        and "expires_at" in cached_credentials
-        and "access_token" in cached_credentials
-        and len(missing_scope) == 0
-    ):
-        if cached_credentials["expires_at"] < (time.time() - 5 * 60):
-            return refresh_credentials()
+
+def _get_auth_token(scope):
+    global cached_credentials
+
+    if cached_credentials is None:
+        cached_credentials = read_credentials_file()
+
+    is_refreshed = False
+    while True:
+        missing_scope = list(set(scope) - set(get_current_credential_scope()))
+
+        if has_valid_credentials(cached_credentials, []) and len(missing_scope) == 0:
+            # Another thread may have already refreshed the token while we waited on the lock.
+            # Refresh at most once: a new token that still expires soon (e.g. a short-lived token, or
+            # when the local clock is ahead) is used as is.
+            if (
+                not is_refreshed
+                and cached_credentials["expires_at"]
+                < time.time() + blocking_refresh_window
+            ):
+                refresh_access_token()
+                is_refreshed = True
+                continue
+            return cached_credentials["access_token"]
         else:
+            if not redivis_dir.is_dir():
+                redivis_dir.mkdir()
+
+            perform_oauth_login(
+                scope=missing_scope if len(missing_scope) > 0 else scope,
+                upgrade_credentials=bool(len(missing_scope)),
+            )
+
             return cached_credentials["access_token"]
-    else:
-        if not redivis_dir.is_dir():
-            redivis_dir.mkdir()
 
-        perform_oauth_login(
-            scope=missing_scope if len(missing_scope) > 0 else scope,
-            upgrade_credentials=bool(len(missing_scope)),
+
+def has_valid_credentials(credentials, scope):
+    return (
+        credentials is not None
+        and "expires_at" in credentials
+        and "access_token" in credentials
+        and set(scope).issubset(get_credential_scope(credentials))
+    )
+
+
+def start_background_refresh():
+    global background_refresh_thread, background_refresh_started_at
+
+    # Single-flight: at most one background refresh is ever in progress, and failed ones aren't retried immediately
+    with background_refresh_lock:
+        if (
+            background_refresh_thread is not None
+            and background_refresh_thread.is_alive()
+        ) or time.time() - background_refresh_started_at < min_refresh_interval:
+            return
+        background_refresh_started_at = time.time()
+        background_refresh_thread = threading.Thread(
+            target=_background_refresh, daemon=True
         )
+        background_refresh_thread.start()
+
 
-        return cached_credentials["access_token"]
+def _background_refresh():
+    try:
+        with credentials_lock:
+            # Foreground callers take over (and clear credentials on failure) once the token is about to expire
+            refresh_access_token(clear_on_failure=False)
+    except Exception as e:
+        logging.debug(f"Background credential refresh failed: {e}")
 
 
 def clear_cached_credentials():
     global cached_credentials
-    cached_credentials = None
-    credentials_file.unlink(missing_ok=True)
+    with credentials_lock:
+        cached_credentials = None
+        credentials_file.unlink(missing_ok=True)
 
 
 def perform_oauth_login(scope, amr_values=None, upgrade_credentials=False):
     global cached_credentials
+    import requests
     import webbrowser
 
     challenge, verifier = get_pkce()
@@ -152,57 +220,140 @@ def perform_oauth_login(scope, amr_values=None, upgrade_credentials=False):
             raise_api_error(response_json=res.json(), response=res)
 
     cached_credentials = res.json()
-
-    with open(credentials_file, "w") as f:
-        json.dump(cached_credentials, f, indent=2)
+    write_credentials_file(cached_credentials)
 
     return cached_credentials
 
 
 def refresh_credentials(scope=None, amr_values=None):
-    global cached_credentials
+    with credentials_lock:
+        if scope or amr_values:
+            perform_oauth_login(
+                scope=scope or get_current_credential_scope(),
+                amr_values=amr_values,
+                upgrade_credentials=True,
+            )
+        elif time.time() - last_refreshed_at > min_refresh_interval:
+            # Otherwise, another thread has just refreshed the token on behalf of all callers
+            refresh_access_token()
 
-    if scope or amr_values:
-        perform_oauth_login(
-            scope=scope or get_current_credential_scope(),
-            amr_values=amr_values,
-            upgrade_credentials=True,
-        )
-    elif "refresh_token" in cached_credentials:
-        res = requests.post(
-            f"{base_url}/oauth/token",
-            verify=verify_ssl,
-            data={
-                "client_id": client_id,
-                "grant_type": "refresh_token",
-                "refresh_token": cached_credentials["refresh_token"],
-            },
-        )
-        if res.status_code >= 400:
+    return get_auth_token()
+
+
+def refresh_access_token(clear_on_failure=True):
+    global cached_credentials, last_refreshed_at
+    import requests
+
+    # Must be called while holding the credentials_lock. The file lock makes sure that concurrent
+    # processes on the same machine share one refreshed credential, rather than each refreshing it.
+    with lock_credentials_file():
+        file_credentials = read_credentials_file()
+        if (
+            has_valid_credentials(file_credentials, [])
+            and cached_credentials is not None
+            and file_credentials["access_token"] != cached_credentials["access_token"]
+            and file_credentials["expires_at"] > time.time() + proactive_refresh_window
+        ):
+            cached_credentials = file_credentials
+        elif cached_credentials is not None and "refresh_token" in cached_credentials:
+            res = requests.post(
+                f"{base_url}/oauth/token",
+                verify=verify_ssl,
+                data={
+                    "client_id": client_id,
+                    "grant_type": "refresh_token",
+                    "refresh_token": cached_credentials["refresh_token"],
+                },
+            )
+            if res.status_code >= 400:
+                if clear_on_failure:
+                    clear_cached_credentials()
+                return
+            else:
+                refresh_response = res.json()
+                cached_credentials = {
+                    **cached_credentials,
+                    "access_token": refresh_response["access_token"],
+                    "expires_at": refresh_response["expires_at"],
+                    "expires_in": refresh_response["expires_in"],
+                }
+                write_credentials_file(cached_credentials)
+        elif clear_on_failure:
             clear_cached_credentials()
-        else:
-            refresh_response = res.json()
-            cached_credentials["access_token"] = refresh_response["access_token"]
-            cached_credentials["expires_at"] = refresh_response["expires_at"]
-            cached_credentials["expires_in"] = refresh_response["expires_in"]
+            return
 
-            with open(credentials_file, "w") as f:
-                json.dump(cached_credentials, f, indent=2)
-    else:
-        clear_cached_credentials()
+    last_refreshed_at = time.time()
 
-    return get_auth_token()
+
+def read_credentials_file():
+    if credentials_file.is_file():
+        try:
+            with open(credentials_file, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            """ignore"""
+    return None
+
+
+def write_credentials_file(credentials):
+    # Write to a temp file first, so that other processes never read a partially written file
+    temp_file = credentials_file.with_name(f"{credentials_file.name}.{os.getpid()}.tmp")
+    with open(temp_file, "w") as f:
+        json.dump(credentials, f, indent=2)
+    os.replace(temp_file, credentials_file)
+
+
+@contextmanager
+def lock_credentials_file():
+    if not redivis_dir.is_dir():
+        redivis_dir.mkdir(exist_ok=True)
+
+    with open(redivis_dir / "python_credentials.lock", "a+") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    """LK_LOCK gives up after 10 seconds, keep waiting"""
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
 
 
 def get_current_credential_scope():
+    return get_credential_scope(cached_credentials)
+
+
+def get_credential_scope(credentials):
+    global cached_credential_scope
     try:
-        if cached_credentials is not None:
-            base64_payload = cached_credentials["access_token"].split(".")[1]
+        if credentials is not None:
+            access_token = credentials["access_token"]
+            # Decoding the JWT on every request is wasteful; it only changes when the token does
+            if cached_credential_scope[0] == access_token:
+                return cached_credential_scope[1]
+            base64_payload = access_token.split(".")[1]
             # IMPORTANT: b64decode requires that the string length be a multiple of 4, with "=" at the end for padding
             padded_base64_payload = f"{base64_payload}{'=' * (len(base64_payload) % 4)}"
-            return json.loads(base64.b64decode(padded_base64_payload))["scope"].split(
+            scope = json.loads(base64.b64decode(padded_base64_payload))["scope"].split(
                 " "
             )
+            cached_credential_scope = (access_token, scope)
+            return scope
     except Exception as e:
         """ignore"""
 
@@ -0,0 +1,164 @@
+from threading import Lock
+
+from . import exceptions
+
+# Compact types for reads that are collected in memory (to_arrow_table, to_pandas_dataframe), with compact_types="auto".
+# The first batch of the read is sampled to choose a type per column: low-cardinality string variables are
+# dictionary-encoded, and integer variables use the narrowest integer type that fits the sample's values.
+# Each batch is converted as it's collected, so only the compact columns are held in memory.
+#
+# The sample may not be representative of the rest of the read. If a later batch has values outside of an integer
+# column's type, the column is widened for the rest of the read, and the batches collected before that are cast to
+# the wider type when the table is assembled. Dictionary encoding is always valid, though it's less compact if later
+# batches have many distinct values.
+#
+# Variable statistics (Variable.get_statistics()) aren't used, since they take a request per variable, and may need
+# to be computed first, which is slower than the read itself for wide tables.
+
+COMPACT_TYPES = ("auto",)
+# Strings are dictionary-encoded if at most this share of the sample's values are distinct
+DICTIONARY_MAX_DISTINCT_RATIO = 0.5
+
+
+def validate_compact_types(compact_types):
+    if compact_types is not None and compact_types not in COMPACT_TYPES:
+        raise exceptions.ValueError(
+            f"Invalid compact_types '{compact_types}'. Must be one of 'auto'|None"
+        )
+
+
+def get_integer_types():
+    import pyarrow
+
+    return [pyarrow.int8(), pyarrow.int16(), pyarrow.int32(), pyarrow.int64()]
+
+
+def get_integer_type(min_value, max_value, current_type=None):
+    """The narrowest integer type (no narrower than current_type) that fits the values."""
+    import numpy
+
+    integer_types = get_integer_types()
+    start_index = integer_types.index(current_type) if current_type is not None else 0
+    for integer_type in integer_types[start_index:]:
+        bounds = numpy.iinfo(integer_type.to_pandas_dtype())
+        if (min_value is None or min_value >= bounds.min) and (
+            max_value is None or max_value <= bounds.max
+        ):
+            return integer_type
+    return integer_types[-1]
+
+
+class TypeCompactor:
+    """Chooses and applies the compact types of a read. Shared by all of the read's streams (and threads)."""
+
+    def __init__(self, mapped_variables):
+        self.variables_by_name = {v["name"].lower(): v for v in mapped_variables}
+        # Compact type by column name, chosen from the first batch
+        self.types = None
+        self.lock = Lock()
+
+    def compact(self, batch):
+        import pyarrow
+        import pyarrow.compute
+
+        with self.lock:
+            if self.types is None:
+                self.types = self.sample(batch)
+            types = self.types
+
+        columns = []
+        for field, column in zip(batch.schema, batch.columns):
+            compact_type = types.get(field.name)
+            if compact_type is not None and pyarrow.types.is_integer(compact_type):
+                min_max = pyarrow.compute.min_max(column)
+                fitting_type = get_integer_type(
+                    min_max["min"].as_py(), min_max["max"].as_py(), compact_type
+                )
+                if fitting_type != compact_type:
+                    # Values outside of the sample's range; widen the column for the rest of the read
+                    self.widen(field.name, fitting_type)
+                compact_type = fitting_type
+            columns.append(convert_array(column, compact_type))
+
+        return pyarrow.RecordBatch.from_arrays(
+            columns,
+            schema=pyarrow.schema(
+                [f.with_type(c.type) for f, c in zip(batch.schema, columns)],
+                metadata=batch.schema.metadata,
+            ),
+        )
+
+    def sample(self, batch):
+        import pyarrow
+        import pyarrow.compute
+
+        types = {}
+        for field, column in zip(batch.schema, batch.columns):
+            variable = self.variables_by_name.get(field.name.lower())
+            if variable is None:
+                continue
+            if variable["type"] == "integer" and pyarrow.types.is_int64(field.type):
+                min_max = pyarrow.compute.min_max(column)
+                types[field.name] = get_integer_type(
+                    min_max["min"].as_py(), min_max["max"].as_py()
+                )
+            elif (
+                variable["type"] == "string"
+                and pyarrow.types.is_string(field.type)
+                and len(column)
+                and pyarrow.compute.count_distinct(column).as_py()
+                <= len(column) * DICTIONARY_MAX_DISTINCT_RATIO
+            ):
+                types[field.name] = pyarrow.dictionary(
+                    pyarrow.int32(), pyarrow.string()
+                )
+        return types
+
+    def widen(self, name, integer_type):
+        integer_types = get_integer_types()
+        with self.lock:
+            if integer_types.index(integer_type) > integer_types.index(
+                self.types[name]
+            ):
+                self.types = {**self.types, name: integer_type}
+
+    def get_schema(self, schema):
+        """The read's final schema, including columns that were widened during the read."""
+        import pyarrow
+
+        types = self.types or {}
+        return pyarrow.schema(
+            [f.with_type(types[f.name]) if f.name in types else f for f in schema],
+            metadata=schema.metadata,
+        )
+
+    def to_table(self, batches, schema):
+        """Assembles the read's compact batches, casting those that were read before a column was widened."""
+        import pyarrow
+
+        schema = self.get_schema(schema)
+        return pyarrow.Table.from_batches(
+            (conform_batch(batch, schema) for batch in batches), schema=schema
+        )
+
+
+def convert_array(array, target_type):
+    import pyarrow
+    import pyarrow.compute
+
+    if target_type is None or array.type == target_type:
+        return array
+    if pyarrow.types.is_dictionary(target_type):
+        return array.dictionary_encode()
+    return pyarrow.compute.cast(array, target_type)
+
+
+def conform_batch(batch, schema):
+    import pyarrow
+
+    if batch.schema.equals(schema):
+        return batch
+    return pyarrow.RecordBatch.from_arrays(
+        [convert_array(c, f.type) for c, f in zip(batch.columns, schema)],
+        schema=schema,
+    )
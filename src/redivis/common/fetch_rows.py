@@ -1,31 +1,313 @@
+import collections
 import concurrent.futures
+import contextvars
+import math
+import queue
+import time
 import uuid
 import os
 import pathlib
-import time
-from requests import RequestException
-from urllib3.exceptions import HTTPError
-from contextlib import closing, nullcontext
+from niquests.exceptions import RequestException
+from niquests.packages.urllib3.exceptions import HTTPError
+from contextlib import closing
 
-from . import exceptions
-from tqdm.auto import tqdm
+from . import exceptions, instrumentation, read_journal, read_planner
+from .compact_types import TypeCompactor, conform_batch, validate_compact_types
 import shutil
-from .util import get_tempdir
+from .util import get_tempdir, get_available_memory
 from .api_request import make_request
-from threading import Event
+from .retry_policy import get_retry_policy
+from threading import Event, Lock
+
+# Max record batches buffered per stream (ordered) or per worker (unordered) by ParallelArrowIterator
+PREFETCH_BATCHES = 4
+# Used when the memory available to the process can't be determined
+DEFAULT_MEMORY_BUDGET = 4 * 1024**3
+
+
+def get_memory_budget():
+    # Max bytes of record batches that a read holds in memory before spilling streams to disk.
+    # Defaults to half of the memory available to the process; override with REDIVIS_READ_MEMORY_BUDGET.
+    if os.getenv("REDIVIS_READ_MEMORY_BUDGET"):
+        return int(float(os.environ["REDIVIS_READ_MEMORY_BUDGET"]))
+    available_memory = get_available_memory()
+    return available_memory // 2 if available_memory else DEFAULT_MEMORY_BUDGET
+
+
+def get_spill_compression():
+    # Compression for the feather files that streams are written to when reading into a folder or spilling:
+    # "lz4", "zstd", or "none" (the default). Uncompressed files are memory-mapped without copying when read back,
+    # while compressed files take a fraction of the temp disk space. Override with REDIVIS_SPILL_COMPRESSION.
+    compression = os.getenv("REDIVIS_SPILL_COMPRESSION", "none").lower()
+    if compression == "none":
+        return None
+    if compression not in ("lz4", "zstd"):
+        raise exceptions.ValueError(
+            f"Invalid REDIVIS_SPILL_COMPRESSION '{compression}'. Must be one of 'lz4'|'zstd'|'none'"
+        )
+    return compression
+
+
+def get_target_batch_size(target_batch_rows=None, target_batch_bytes=None):
+    # Record batches are coalesced to about target_batch_rows rows and/or target_batch_bytes bytes, which default to
+    # REDIVIS_TARGET_BATCH_ROWS / REDIVIS_TARGET_BATCH_BYTES. Without either, batches are passed through in the
+    # sizes that the API streams them. Returns (rows, bytes), either of which may be None, or None if both are.
+    if target_batch_rows is None and os.getenv("REDIVIS_TARGET_BATCH_ROWS"):
+        target_batch_rows = int(float(os.environ["REDIVIS_TARGET_BATCH_ROWS"]))
+    if target_batch_bytes is None and os.getenv("REDIVIS_TARGET_BATCH_BYTES"):
+        target_batch_bytes = int(float(os.environ["REDIVIS_TARGET_BATCH_BYTES"]))
+    if target_batch_rows is not None and target_batch_rows < 1:
+        raise exceptions.ValueError("target_batch_rows must be at least 1")
+    if target_batch_bytes is not None and target_batch_bytes < 1:
+        raise exceptions.ValueError("target_batch_bytes must be at least 1")
+    if target_batch_rows is None and target_batch_bytes is None:
+        return None
+    return target_batch_rows, target_batch_bytes
+
+
+def open_feather_dataset(folder_path, schema=None):
+    import pyarrow.dataset as pyarrow_dataset
+    import pyarrow.fs
+
+    # Memory-map the files, so that they're read through the page cache rather than into separate buffers
+    return pyarrow_dataset.dataset(
+        folder_path,
+        format="feather",
+        schema=schema,
+        filesystem=pyarrow.fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+class MemoryBudget:
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.spilled = False
+        self.lock = Lock()
+
+    def reserve(self, nbytes):
+        # Returns False (and marks the read as spilled) if the batch doesn't fit in the remaining budget
+        with self.lock:
+            if self.used + nbytes > self.limit:
+                self.spilled = True
+                return False
+            self.used += nbytes
+            return True
+
+    def release(self, nbytes):
+        with self.lock:
+            self.used -= nbytes
+
+
+class BatchCoalescer:
+    """Concatenates the small record batches of a stream, and splits large ones, into batches of one to two times
+    the target size (except for the stream's last batch). Without a target, batches are passed through.
+    """
+
+    def __init__(self, target_batch_size=None):
+        self.target_rows, self.target_bytes = target_batch_size or (None, None)
+        self.batches = []
+        self.row_count = 0
+        self.nbytes = 0
+
+    def is_empty(self):
+        return not self.batches
+
+    def add(self, batch):
+        # Returns the batches that are ready. Once the target is reached, all of the buffered rows are returned,
+        # so the coalescer is always empty after a call that returns batches.
+        if batch is None:
+            return []
+        if self.target_rows is None and self.target_bytes is None:
+            return [batch]
+        if batch.num_rows == 0:
+            return []
+        self.batches.append(batch)
+        self.row_count += batch.num_rows
+        self.nbytes += batch.nbytes
+        if (self.target_rows is not None and self.row_count >= self.target_rows) or (
+            self.target_bytes is not None and self.nbytes >= self.target_bytes
+        ):
+            return self.flush()
+        return []
+
+    def flush(self):
+        import pyarrow
+
+        if not self.batches:
+            return []
+        target_rows = self.get_target_rows()
+        batches = (
+            self.batches
+            if len(self.batches) == 1
+            else pyarrow.Table.from_batches(self.batches).combine_chunks().to_batches()
+        )
+        self.batches = []
+        self.row_count = 0
+        self.nbytes = 0
+
+        output_batches = []
+        for batch in batches:
+            if batch.num_rows < target_rows * 2:
+                output_batches.append(batch)
+                continue
+            # Equal slices of at least target_rows rows
+            slice_rows = math.ceil(batch.num_rows / (batch.num_rows // target_rows))
+            output_batches.extend(
+                batch.slice(offset, slice_rows)
+                for offset in range(0, batch.num_rows, slice_rows)
+            )
+        return output_batches
+
+    def get_target_rows(self):
+        # The byte target is converted to rows using the average row size of the buffered batches
+        target_rows = self.target_rows
+        if self.target_bytes is not None and self.nbytes:
+            bytes_target_rows = max(
+                self.target_bytes * self.row_count // self.nbytes, 1
+            )
+            target_rows = (
+                bytes_target_rows
+                if target_rows is None
+                else min(target_rows, bytes_target_rows)
+            )
+        return target_rows
+
+
+class ColumnPlanner:
+    """Builds the ColumnPlan for each stream of a read. Streams of a read session share the same schema,
+    so the plan is built once and reused by every stream (and thread)."""
+
+    def __init__(self, mapped_variables, coerce_schema):
+        self.mapped_variables = mapped_variables
+        self.coerce_schema = coerce_schema
+        # Variable names are case-insensitive
+        self.variables_by_name = (
+            {v["name"].lower(): v for v in mapped_variables}
+            if mapped_variables is not None
+            else {}
+        )
+        self.plans = {}
+        self.lock = Lock()
+
+    def get_plan(self, reader_schema):
+        with self.lock:
+            plan = self.plans.get(reader_schema)
+            if plan is None:
+                plan = ColumnPlan(reader_schema, self)
+                self.plans[reader_schema] = plan
+            return plan
+
+
+class ColumnPlan:
+    """Maps batches with a stream's schema to the output schema: casting columns whose type doesn't match
+    their variable, reordering columns to the order of the mapped variables, and null-filling missing ones.
+    """
+
+    def __init__(self, reader_schema, planner):
+        import pyarrow
+
+        mapped_variables = planner.mapped_variables
+        reader_names = [name.lower() for name in reader_schema.names]
+
+        # (column index, variable) of the columns that need to be cast
+        self.casts = []
+        if planner.coerce_schema:
+            variables_in_stream = [planner.variables_by_name[n] for n in reader_names]
+            stream_fields = list(map(variable_to_field, variables_in_stream))
+            for i, (variable, field) in enumerate(
+                zip(variables_in_stream, stream_fields)
+            ):
+                if (
+                    variable["type"] not in ("string", "geography")
+                    and reader_schema.field(i).type != field.type
+                ):
+                    self.casts.append((i, variable))
+            stream_schema = pyarrow.schema(stream_fields)
+        else:
+            stream_schema = reader_schema
+
+        # For each output column, the index of the reader column, or None if it's filled with nulls
+        self.column_indices = None
+        self.output_schema = stream_schema
+        if mapped_variables is not None:
+            index_by_name = {name: i for i, name in enumerate(reader_names)}
+            column_indices = [
+                index_by_name.get(v["name"].lower()) for v in mapped_variables
+            ]
+            if column_indices != list(range(len(reader_names))):
+                self.column_indices = column_indices
+                self.output_schema = pyarrow.schema(
+                    map(variable_to_field, mapped_variables)
+                )
+
+        self.is_noop = (
+            not self.casts
+            and self.column_indices is None
+            and reader_schema.equals(self.output_schema)
+        )
+        # The null arrays for missing columns, built once per batch size
+        self.null_arrays = (None, {})
+
+    def apply(self, batch):
+        import pyarrow
+
+        if self.is_noop:
+            return batch
+
+        columns = batch.columns
+        for i, variable in self.casts:
+            columns[i] = coerce_arrow_array(columns[i], variable)
+
+        if self.column_indices is not None:
+            num_rows, null_arrays = self.null_arrays
+            if num_rows != batch.num_rows:
+                null_arrays = {}
+                self.null_arrays = (batch.num_rows, null_arrays)
+            output_columns = []
+            for output_index, column_index in enumerate(self.column_indices):
+                if column_index is not None:
+                    output_columns.append(columns[column_index])
+                else:
+                    null_array = null_arrays.get(output_index)
+                    if null_array is None:
+                        null_array = pyarrow.nulls(
+                            batch.num_rows,
+                            type=self.output_schema.field(output_index).type,
+                        )
+                        null_arrays[output_index] = null_array
+                    output_columns.append(null_array)
+            columns = output_columns
 
-MAX_PARALLELIZATION = 8
+        return pyarrow.RecordBatch.from_arrays(columns, schema=self.output_schema)
 
 
 class RedivisArrowIterator:
-    def __init__(self, streams, mapped_variables, progressbar, coerce_schema):
+    def __init__(
+        self,
+        streams,
+        mapped_variables,
+        progressbar,
+        coerce_schema,
+        filter_expression=None,
+        column_planner=None,
+        target_batch_size=None,
+    ):
         self.streams = streams
-        self.mapped_variables = mapped_variables
         self.progressbar = progressbar
-        self.coerce_schema = coerce_schema
+        self.column_planner = column_planner or ColumnPlanner(
+            mapped_variables, coerce_schema
+        )
+        self.column_plan = None
+        self.filter_expression = filter_expression
+        self.coalescer = BatchCoalescer(target_batch_size)
+        # Coalesced batches that are ready to be returned
+        self.output_batches = collections.deque()
+        self.is_finished = False
         self.current_stream_index = 0
         self.current_offset = 0
-        self.retry_count = 0
+        self.retry_state = get_retry_policy().start()
+        self.span = instrumentation.NOOP_SPAN
         self.__get_next_reader__()
 
     def __get_next_reader__(self, offset=0):
@@ -33,6 +315,12 @@ class RedivisArrowIterator:
 
         try:
             self.current_offset = offset
+            self.span = instrumentation.start_span(
+                "redivis.read_stream",
+                stream_id=self.streams[self.current_stream_index]["id"],
+                offset=offset,
+                retry_count=self.retry_state.retry_count,
+            )
             # TODO: this won't get closed properly if the iterator is not fully consumed
             arrow_response = make_request(
                 method="get",
@@ -43,115 +331,57 @@ class RedivisArrowIterator:
             self.current_record_batch_reader = pyarrow.ipc.RecordBatchStreamReader(
                 arrow_response.raw
             )
-            if self.coerce_schema:
-                self.variables_in_stream = list(
-                    map(
-                        lambda field_name: next(
-                            x for x in self.mapped_variables if x["name"] == field_name
-                        ),
-                        self.current_record_batch_reader.schema.names,
-                    )
-                )
-                self.stream_schema = pyarrow.schema(
-                    map(variable_to_field, self.variables_in_stream)
-                )
-            else:
-                self.stream_schema = self.current_record_batch_reader.schema
-
-            self.should_reorder_fields = False
-            self.fields_to_add = []
-
-            if self.mapped_variables is not None:
-                reader_names = self.current_record_batch_reader.schema.names
-
-                for i, field_name in enumerate(reader_names):
-                    mapped_index = next(
-                        (
-                            j
-                            for j, v in enumerate(self.mapped_variables)
-                            if v["name"] == field_name
-                        ),
-                        None,
-                    )
-                    if mapped_index is not None and mapped_index != i:
-                        self.should_reorder_fields = True
-                        break
-
-                self.fields_to_add = [
-                    v for v in self.mapped_variables if v["name"] not in reader_names
-                ]
-
-                if self.fields_to_add:
-                    self.should_reorder_fields = True
-
-            self.output_schema = (
-                pyarrow.schema(map(variable_to_field, self.mapped_variables))
-                if self.should_reorder_fields
-                else self.stream_schema
+            self.column_plan = self.column_planner.get_plan(
+                self.current_record_batch_reader.schema
             )
         except (RequestException, HTTPError) as e:
-            self.retry_count = self.retry_count + 1
-            if self.retry_count > 10:
+            self.span.set_error(e)
+            self.span.end()
+            if not self.retry_state.sleep():
                 raise exceptions.NetworkError(
-                    message=f"Download connection failed after {self.retry_count} retries.",
+                    message=f"Download connection failed after {self.retry_state.retry_count} retries.",
                     original_exception=e,
                 ) from e
 
-            time.sleep(self.retry_count)
             return self.__get_next_reader__(self.current_offset)
 
     def __iter__(self):
         return self
 
     def __next__(self):
+        # Loop rather than recurse, since a selective filter may drop many batches in a row
+        while not self.output_batches:
+            if self.is_finished:
+                raise StopIteration
+            try:
+                batch = self.__read_next_batch__()
+            except StopIteration:
+                self.is_finished = True
+                self.output_batches.extend(self.coalescer.flush())
+                continue
+            if self.filter_expression is not None:
+                batch = filter_batch(batch, self.filter_expression)
+            self.output_batches.extend(self.coalescer.add(batch))
+        return self.output_batches.popleft()
+
+    def __read_next_batch__(self):
         import pyarrow
 
         try:
-            batch = self.current_record_batch_reader.read_next_batch()
-            if self.coerce_schema:
-                batch = pyarrow.RecordBatch.from_arrays(
-                    list(
-                        map(
-                            coerce_arrow_array,
-                            batch.columns,
-                            self.variables_in_stream,
-                        )
-                    ),
-                    schema=self.stream_schema,
-                )
-
-            if self.fields_to_add:
-                null_arrays = [
-                    pyarrow.nulls(batch.num_rows, type=variable_to_field(v).type)
-                    for v in self.fields_to_add
-                ]
-                all_arrays = list(batch.columns) + null_arrays
-                all_names = list(batch.schema.names) + [
-                    v["name"] for v in self.fields_to_add
-                ]
-                name_to_array = dict(zip(all_names, all_arrays))
-                ordered_arrays = [
-                    name_to_array[v["name"]] for v in self.mapped_variables
-                ]
-                batch = pyarrow.RecordBatch.from_arrays(
-                    ordered_arrays, schema=self.output_schema
-                )
-            elif self.should_reorder_fields:
-                name_to_array = dict(zip(batch.schema.names, batch.columns))
-                ordered_arrays = [
-                    name_to_array[v["name"]] for v in self.mapped_variables
-                ]
-                batch = pyarrow.RecordBatch.from_arrays(
-                    ordered_arrays, schema=self.output_schema
-                )
+            batch = self.column_plan.apply(
+                self.current_record_batch_reader.read_next_batch()
+            )
 
             if self.progressbar is not None:
                 self.progressbar.update(batch.num_rows)
 
             self.current_offset += batch.num_rows
-            self.retry_count = 0
+            self.span.add("rows", batch.num_rows)
+            self.span.add("bytes", batch.nbytes)
+            self.retry_state.reset()
             return batch
         except StopIteration:
+            self.span.end()
             if self.current_stream_index == len(self.streams) - 1:
                 if self.progressbar:
                     self.progressbar.close()
@@ -159,17 +389,158 @@ class RedivisArrowIterator:
             else:
                 self.current_stream_index += 1
                 self.__get_next_reader__()
-                return self.__next__()
+                return self.__read_next_batch__()
         except (RequestException, HTTPError) as e:
-            self.retry_count = self.retry_count + 1
-            if self.retry_count > 10:
+            self.span.set_error(e)
+            self.span.end()
+            if not self.retry_state.sleep():
                 raise exceptions.NetworkError(
-                    message=f"A network error occurred. Download connection failed after {self.retry_count} retries.",
+                    message=f"A network error occurred. Download connection failed after {self.retry_state.retry_count} retries.",
                     original_exception=e,
                 ) from e
-            time.sleep(self.retry_count)
             self.__get_next_reader__(self.current_offset)
-            return self.__next__()
+            return self.__read_next_batch__()
+
+
+class StreamWorkers:
+    """The worker threads of a ParallelArrowIterator, and the queues they fill. Workers only reference this object,
+    not the iterator, so an abandoned iterator can be garbage collected, which cancels them."""
+
+    def __init__(self, streams, max_parallelization, ordered):
+        self.cancel_event = Event()
+        worker_count = min(max_parallelization, len(streams))
+        if ordered:
+            self.queues = [queue.Queue(maxsize=PREFETCH_BATCHES) for _ in streams]
+        else:
+            shared_queue = queue.Queue(maxsize=PREFETCH_BATCHES * worker_count)
+            self.queues = [shared_queue for _ in streams]
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=worker_count)
+
+    def start(self, streams, column_planner, filter_expression, target_batch_size):
+        # Streams are submitted in order, so in ordered mode the stream being consumed is always running
+        for stream, stream_queue in zip(streams, self.queues):
+            self.executor.submit(
+                contextvars.copy_context().run,
+                self.read_stream,
+                stream,
+                stream_queue,
+                column_planner,
+                filter_expression,
+                target_batch_size,
+            )
+
+    def read_stream(
+        self,
+        stream,
+        stream_queue,
+        column_planner,
+        filter_expression,
+        target_batch_size,
+    ):
+        try:
+            if self.cancel_event.is_set():
+                return
+            for batch in RedivisArrowIterator(
+                streams=[stream],
+                mapped_variables=column_planner.mapped_variables,
+                progressbar=None,
+                coerce_schema=column_planner.coerce_schema,
+                filter_expression=filter_expression,
+                column_planner=column_planner,
+                target_batch_size=target_batch_size,
+            ):
+                if not self.put(stream_queue, ("batch", batch)):
+                    return
+            self.put(stream_queue, ("done", None))
+        except Exception as e:
+            self.put(stream_queue, ("error", e))
+
+    def put(self, stream_queue, item):
+        # Block while the buffer is full, but give up once the read is cancelled
+        while not self.cancel_event.is_set():
+            try:
+                stream_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ParallelArrowIterator:
+    """Reads several streams concurrently on worker threads, into a bounded prefetch buffer.
+
+    When ordered is True, batches are yielded in the same order as RedivisArrowIterator (stream by stream),
+    while the following streams are prefetched. Otherwise, batches are yielded as soon as any stream produces
+    them, for maximum throughput. Use it as a context manager, or call close(), to stop the workers early;
+    they're also stopped once the iterator is garbage collected.
+    """
+
+    def __init__(
+        self,
+        streams,
+        mapped_variables,
+        progressbar,
+        coerce_schema,
+        max_parallelization,
+        ordered=True,
+        filter_expression=None,
+        column_planner=None,
+        target_batch_size=None,
+    ):
+        self.streams = streams
+        self.progressbar = progressbar
+        self.ordered = ordered
+        self.current_stream_index = 0
+        self.finished_stream_count = 0
+
+        self.workers = StreamWorkers(streams, max_parallelization, ordered)
+        self.workers.start(
+            streams,
+            column_planner or ColumnPlanner(mapped_variables, coerce_schema),
+            filter_expression,
+            target_batch_size,
+        )
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while self.finished_stream_count < len(self.streams):
+            queue_index = self.current_stream_index if self.ordered else 0
+            kind, value = self.workers.queues[queue_index].get()
+            if kind == "batch":
+                if self.progressbar is not None:
+                    self.progressbar.update(value.num_rows)
+                return value
+            elif kind == "error":
+                self.close()
+                raise value
+            else:
+                self.finished_stream_count += 1
+                self.current_stream_index += 1
+
+        self.close()
+        raise StopIteration
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.workers.cancel()
+        if self.progressbar is not None:
+            self.progressbar.close()
+            self.progressbar = None
+
+    def __del__(self):
+        if hasattr(self, "workers"):
+            self.close()
 
 
 def make_rows_request(
@@ -185,6 +556,13 @@ def make_rows_request(
     instance=None,
     use_export_api=False,
     max_parallelization=os.cpu_count(),
+    ordered=True,
+    filter=None,
+    output_folder=None,
+    resume=False,
+    compact_types=None,
+    target_batch_rows=None,
+    target_batch_bytes=None,
 ):
     import pyarrow
     import pyarrow.dataset as pyarrow_dataset  # need to import separately, it's not on the pyarrow import
@@ -192,6 +570,24 @@ def make_rows_request(
     from ..classes.ReadStream import ReadStream
 
     progressbar = None
+    filter_expression = get_filter_expression(filter)
+    target_batch_size = get_target_batch_size(target_batch_rows, target_batch_bytes)
+    validate_compact_types(compact_types)
+    # Compact types only apply to reads that are collected into an in-memory table
+    type_compactor = (
+        TypeCompactor(mapped_variables)
+        if compact_types is not None
+        and output_type == "arrow_table"
+        and batch_preprocessor is None
+        and mapped_variables is not None
+        else None
+    )
+
+    journal = None
+    if output_folder is not None:
+        journal_key = f"{uri}|{selected_variables}|{max_results}|{filter_expression}|{batch_preprocessor is not None}"
+        if resume:
+            journal = read_journal.ReadJournal.resume(output_folder, journal_key)
 
     if isinstance(instance, ReadStream):
         read_session = {
@@ -212,19 +608,21 @@ def make_rows_request(
             and output_type != "arrow_iterator"
             and selected_variables is None
             and batch_preprocessor is None
+            and filter is None
             and max_results is None
+            and output_folder is None
+        )
+        payload = get_read_session_payload(
+            instance,
+            max_results=max_results,
+            selected_variables=selected_variables,
+            max_parallelization=max_parallelization,
         )
-        payload = {
-            "requestedStreamCount": min(MAX_PARALLELIZATION, max_parallelization)
-        }
-
-        if max_results is not None:
-            payload["maxResults"] = max_results
-
-        if selected_variables is not None:
-            payload["selectedVariables"] = selected_variables
 
-        if not use_export_api:
+        if journal is not None:
+            # Continue the previous read session
+            read_session = journal.read_session
+        elif not use_export_api:
             read_session = make_request(
                 method="post",
                 path=f"{uri}/readSessions",
@@ -232,37 +630,91 @@ def make_rows_request(
                 payload=payload,
             )
 
+    if output_folder is not None and journal is None:
+        journal = read_journal.ReadJournal.create(
+            output_folder, journal_key, read_session
+        )
+
+    if output_type == "dask_dataframe" and not use_export_api:
+        # Streams are read lazily by the dask workers, so there's no progress to report here
+        return make_dask_dataframe(
+            streams=read_session["streams"],
+            mapped_variables=mapped_variables,
+            coerce_schema=coerce_schema,
+            batch_preprocessor=batch_preprocessor,
+            filter_expression=filter_expression,
+            target_batch_size=target_batch_size,
+        )
+
     if progress:
+        from tqdm.auto import tqdm
+
         progressbar = tqdm(total=read_session["numRows"], leave=False, mininterval=0.2)
+        if journal is not None:
+            progressbar.update(journal.get_completed_row_count())
+
+    column_planner = ColumnPlanner(mapped_variables, coerce_schema)
 
     if output_type == "arrow_iterator":
+        if len(read_session["streams"]) > 1 and max_parallelization > 1:
+            return ParallelArrowIterator(
+                streams=read_session["streams"],
+                mapped_variables=mapped_variables,
+                progressbar=progressbar,
+                coerce_schema=coerce_schema,
+                max_parallelization=max_parallelization,
+                ordered=ordered,
+                filter_expression=filter_expression,
+                column_planner=column_planner,
+                target_batch_size=target_batch_size,
+            )
         return RedivisArrowIterator(
             streams=read_session["streams"],
             mapped_variables=mapped_variables,
             progressbar=progressbar,
             coerce_schema=coerce_schema,
+            filter_expression=filter_expression,
+            column_planner=column_planner,
+            target_batch_size=target_batch_size,
         )
 
     folder = None
     folder_path = None
+    memory_budget = None
+    spill_folder_path = None
     # get the absolute folder path, as a string
-    # We need to always write to disk if we're doing things in parallel,
-    # because we can't efficiently copy results between processes when working in parallel
-    if (
-        use_export_api
-        or output_type in ["arrow_dataset", "dask_dataframe", "polars_lazyframe"]
-        or (len(read_session["streams"]) > 1 and max_parallelization > 1)
-    ):
+    # Datasets and lazy frames are read back from disk, so their streams are always written to a folder.
+    # Otherwise, batches from all streams are collected in memory, and streams only spill to disk once
+    # the read's memory budget is used up.
+    if output_folder is not None:
+        folder = pathlib.Path(output_folder)
+        folder_path = str(folder.absolute())
+    elif use_export_api or output_type in [
+        "arrow_dataset",
+        "polars_lazyframe",
+    ]:
         folder = pathlib.Path().joinpath(
             get_tempdir(),
             "tables",
             f"{uuid.uuid4()}",
         )
         folder_path = str(folder.absolute())
+    else:
+        memory_budget = MemoryBudget(get_memory_budget())
+        spill_folder_path = str(
+            pathlib.Path()
+            .joinpath(
+                get_tempdir(),
+                "tables",
+                f"{uuid.uuid4()}",
+            )
+            .absolute()
+        )
 
     try:
         arrow_dataset = None
-        all_batches = []
+        # The batches of each stream range that was read into memory, by (stream index, range start)
+        batches_by_range = {}
         if use_export_api:
             instance.download(folder_path + "/", format="parquet", progress=progress)
         else:
@@ -278,26 +730,62 @@ def make_rows_request(
             # with concurrent.futures.ProcessPoolExecutor(max_workers=len(read_session["streams"]), mp_context=mp.get_context('fork')) as executor:
 
             # See https://github.com/googleapis/python-bigquery/blob/main/google/cloud/bigquery/_pandas_helpers.py#L920
-            futures = []
-            if len(read_session["streams"]):
-                with concurrent.futures.ThreadPoolExecutor(
-                    max_workers=min(max_parallelization, len(read_session["streams"]))
+            # The rows each stream's worker reads. Streams are split as workers become idle, except for
+            # journaled reads, whose checkpoints are per stream.
+            stream_ranges = [
+                read_planner.StreamRange(
+                    stream,
+                    journal.get_offset(stream["id"]) if journal is not None else 0,
+                )
+                for stream in read_session["streams"]
+                if journal is None or not journal.is_completed(stream["id"])
+            ]
+            if stream_ranges:
+                worker_count = (
+                    max_parallelization
+                    if journal is None
+                    else min(max_parallelization, len(stream_ranges))
+                )
+                with instrumentation.span(
+                    "redivis.read",
+                    uri=uri,
+                    output_type=output_type,
+                    stream_count=len(read_session["streams"]),
+                    max_parallelization=max_parallelization,
+                ) as read_span, concurrent.futures.ThreadPoolExecutor(
+                    max_workers=worker_count
                 ) as executor:
-                    futures = [
-                        executor.submit(
+
+                    def submit(stream_range):
+                        # Run each stream in a copy of the current context, so that its spans are nested under this read
+                        return executor.submit(
+                            contextvars.copy_context().run,
                             process_stream,
-                            stream,
+                            stream_range.stream,
                             folder_path,
                             mapped_variables,
                             coerce_schema,
                             progressbar,
                             batch_preprocessor,
                             cancel_event,
+                            submitted_at=time.perf_counter(),
+                            memory_budget=memory_budget,
+                            spill_folder_path=spill_folder_path,
+                            filter_expression=filter_expression,
+                            column_planner=column_planner,
+                            offset=stream_range.start,
+                            journal=journal,
+                            stream_range=stream_range,
+                            type_compactor=type_compactor,
+                            target_batch_size=target_batch_size,
                         )
-                        for stream in read_session["streams"]
-                    ]
 
-                    not_done = futures
+                    stream_indices = {
+                        stream["id"]: i
+                        for i, stream in enumerate(read_session["streams"])
+                    }
+                    ranges_by_future = {submit(r): r for r in stream_ranges}
+                    not_done = set(ranges_by_future)
 
                     try:
                         while not_done and not cancel_event.is_set():
@@ -308,8 +796,26 @@ def make_rows_request(
                             for future in freshly_done:
                                 # Call result() on any finished threads to raise any exceptions encountered.
                                 res = future.result()
+                                stream_range = ranges_by_future.pop(future)
                                 if folder_path is None and res:
-                                    all_batches.extend(res)
+                                    batches_by_range[
+                                        (
+                                            stream_indices[stream_range.stream["id"]],
+                                            stream_range.start,
+                                        )
+                                    ] = res
+
+                            # Rebalance the long tail: split running streams for workers that are now idle
+                            while journal is None and len(not_done) < worker_count:
+                                split_range = read_planner.split_largest_range(
+                                    ranges_by_future.values()
+                                )
+                                if split_range is None:
+                                    break
+                                read_span.add("split_count", 1)
+                                future = submit(split_range)
+                                ranges_by_future[future] = split_range
+                                not_done.add(future)
                     finally:
                         cancel_event.set()
                         # Shutdown all background threads, now that they should know to exit early.
@@ -325,11 +831,37 @@ def make_rows_request(
         )
 
         if folder_path is None:
-            if all_batches:
-                return pyarrow.Table.from_batches(all_batches, schema=schema)
+            # Ranges finish in any order, and a split stream's ranges are read concurrently, so the batches
+            # are joined in the order of their rows to keep the order of ordered results (e.g. ORDER BY)
+            pieces = [
+                (key, False, batches) for key, batches in batches_by_range.items()
+            ]
+            if memory_budget.spilled:
+                pieces.extend(
+                    (key, True, file_path)
+                    for key, file_path in get_stream_files(
+                        spill_folder_path, read_session["streams"]
+                    )
+                )
+            all_batches = []
+            for _, is_spilled, piece in sorted(pieces, key=lambda p: p[:2]):
+                if not is_spilled:
+                    all_batches.extend(piece)
+                    continue
+                spilled_batches = open_feather_dataset(
+                    piece, schema=schema
+                ).to_batches()
+                # Spilled batches are in the original types, and are converted as they're read back
+                all_batches.extend(
+                    map(type_compactor.compact, spilled_batches)
+                    if type_compactor is not None
+                    else spilled_batches
+                )
 
-            # No batches were returned; construct an empty table with the expected schema
-            return pyarrow.Table.from_batches([], schema=schema)
+            if type_compactor is not None:
+                return type_compactor.to_table(all_batches, schema)
+            # If no batches were returned, this constructs an empty table with the expected schema
+            return pyarrow.Table.from_batches(all_batches, schema=schema)
         elif use_export_api:
             if output_type == "polars_lazyframe":
                 import polars
@@ -343,6 +875,13 @@ def make_rows_request(
             arrow_dataset = pyarrow_dataset.dataset(folder_path, format="parquet")
             if output_type == "arrow_dataset":
                 return arrow_dataset
+            elif type_compactor is not None:
+                arrow_table = type_compactor.to_table(
+                    [type_compactor.compact(b) for b in arrow_dataset.to_batches()],
+                    arrow_dataset.schema,
+                )
+                shutil.rmtree(folder_path, ignore_errors=True)
+                return arrow_table
             else:
                 arrow_table = arrow_dataset.to_table()
                 shutil.rmtree(folder_path, ignore_errors=True)
@@ -353,45 +892,97 @@ def make_rows_request(
 
                 return polars.scan_ipc(f"{folder_path}/*", memory_map=True)
 
-            arrow_dataset = pyarrow_dataset.dataset(
-                folder_path,
-                format="feather",
-                schema=schema,
-            )
+            arrow_dataset = open_feather_dataset(folder_path, schema=schema)
 
         if output_type == "arrow_dataset":
             return arrow_dataset
-        elif output_type == "dask_dataframe":
-            import dask.dataframe as dd
-
-            # TODO: simplify once dask supports reading from feather: https://github.com/dask/dask/issues/6865
-            # Make sure we no longer remove the folder in the finally clause after making this change
-            # Create the Parquet base directory
-            parquet_base_dir = str(
-                pathlib.Path()
-                .joinpath(
-                    get_tempdir(),
-                    "tables",
-                    f"{uuid.uuid4()}",
-                )
-                .absolute()
-            )
-            pyarrow_dataset.write_dataset(
-                arrow_dataset, parquet_base_dir, format="parquet"
-            )
-            shutil.rmtree(folder_path, ignore_errors=True)
-            return dd.read_parquet(parquet_base_dir, dtype_backend="pyarrow")
         else:
             arrow_table = arrow_dataset.to_table()
             shutil.rmtree(folder_path, ignore_errors=True)
             return arrow_table
     finally:
-        if (
-            folder_path
-            and output_type != "arrow_dataset"
-            and output_type != "polars_lazyframe"
-        ):
+        # Datasets and lazy frames (including dask's, from the export API) read from the folder after returning
+        if folder_path and output_folder is None and output_type not in [
+            "arrow_dataset",
+            "polars_lazyframe",
+            "dask_dataframe",
+        ]:
             shutil.rmtree(folder_path, ignore_errors=True)
+        if spill_folder_path:
+            shutil.rmtree(spill_folder_path, ignore_errors=True)
+
+
+def get_read_session_payload(
+    instance, *, max_results, selected_variables, max_parallelization
+):
+    # Based on the size of the read, the number of workers, and the throughput of previous reads
+    stream_count = read_planner.get_stream_count(
+        estimated_bytes=read_planner.estimate_read_bytes(
+            getattr(instance, "properties", None),
+            max_results=max_results,
+            selected_variables=selected_variables,
+        ),
+        max_parallelization=max_parallelization,
+    )
+    payload = {"requestedStreamCount": stream_count}
+
+    if max_results is not None:
+        payload["maxResults"] = max_results
+
+    if selected_variables is not None:
+        payload["selectedVariables"] = selected_variables
+
+    return payload
+
+
+def get_stream_file_path(folder_path, stream_id, offset):
+    retry_suffix = f"-retry_offset-{offset}" if offset > 0 else ""
+    return (
+        pathlib.Path(folder_path)
+        .joinpath(f"{stream_id}{retry_suffix}.feather")
+        .absolute()
+    )
+
+
+def get_stream_files(folder_path, streams):
+    """Returns ((stream index, offset), file path) for the files written by get_stream_file_path()."""
+    stream_indices = {stream["id"]: i for i, stream in enumerate(streams)}
+    stream_files = []
+    for file_path in pathlib.Path(folder_path).glob("*.feather"):
+        stream_id, _, offset = file_path.stem.partition("-retry_offset-")
+        stream_files.append(
+            ((stream_indices[stream_id], int(offset or 0)), str(file_path))
+        )
+    return stream_files
+
+
+def get_filter_expression(filter):
+    # Accepts a pyarrow.compute.Expression, e.g. pyarrow.compute.field("year") >= 2020, or filters in
+    # disjunctive normal form, as accepted by pyarrow.parquet.read_table, e.g. [("year", ">=", 2020)]
+    if filter is None:
+        return None
+
+    import pyarrow.compute
+    import pyarrow.parquet
+
+    if isinstance(filter, pyarrow.compute.Expression):
+        return filter
+    try:
+        return pyarrow.parquet.filters_to_expression(filter)
+    except (TypeError, ValueError) as e:
+        raise exceptions.ValueError(
+            f"Invalid filter: {e}. The filter must be a pyarrow.compute.Expression, or a list of (column, operator, value) tuples."
+        ) from e
+
+
+def filter_batch(batch, filter_expression):
+    # Returns None if no rows match
+    import pyarrow
+
+    table = pyarrow.Table.from_batches([batch]).filter(filter_expression)
+    if table.num_rows == 0:
+        return None
+    return table.combine_chunks().to_batches()[0]
 
 
 def variable_to_field(variable):
@@ -416,6 +1007,7 @@ def variable_to_field(variable):
 # If streaming from a dataset, data types _may_ be incorrect. We need to check and convert if possible.
 def coerce_arrow_array(pyarrow_array, variable):
     import pyarrow
+    import pyarrow.compute
 
     if variable["type"] == "string" or variable["type"] == "geography":
         return pyarrow_array
@@ -443,6 +1035,9 @@ def coerce_arrow_array(pyarrow_array, variable):
         if pyarrow_array.type == "time64[us]":
             return pyarrow_array
         else:
+            parsed_array = parse_time_strings(pyarrow_array)
+            if parsed_array is not None:
+                return parsed_array
             # Hopefully someday this is supported. Until then, need to do the workaround below
             # return pyarrow.compute.cast(pyarrow_array, pyarrow.time64("us"))
             return pyarrow.compute.cast(
@@ -461,6 +1056,156 @@ def coerce_arrow_array(pyarrow_array, variable):
             return pyarrow.compute.cast(pyarrow_array, pyarrow.bool_())
 
 
+def parse_time_strings(pyarrow_array):
+    """Parses an array of "HH:MM:SS[.ffffff]" strings that all have the same format as time64[us], directly from
+    the array's character buffer. Returns None for any other array, which is parsed by coerce_arrow_array()."""
+    import numpy
+    import pyarrow
+
+    if isinstance(pyarrow_array, pyarrow.ChunkedArray):
+        chunks = [parse_time_strings(chunk) for chunk in pyarrow_array.chunks]
+        if any(chunk is None for chunk in chunks):
+            return None
+        return pyarrow.chunked_array(chunks, type=pyarrow.time64("us"))
+
+    if pyarrow.types.is_string(pyarrow_array.type):
+        offset_type = numpy.int32
+    elif pyarrow.types.is_large_string(pyarrow_array.type):
+        offset_type = numpy.int64
+    else:
+        return None
+    row_count = len(pyarrow_array)
+    if row_count == pyarrow_array.null_count:
+        return None
+
+    _, offsets_buffer, data_buffer = pyarrow_array.buffers()
+    offsets = numpy.frombuffer(
+        offsets_buffer, dtype=offset_type, count=pyarrow_array.offset + row_count + 1
+    )[pyarrow_array.offset :]
+    lengths = numpy.diff(offsets)
+    is_null = (
+        pyarrow_array.is_null().to_numpy(zero_copy_only=False)
+        if pyarrow_array.null_count
+        else None
+    )
+    # Every value must have the same width, and nulls must be empty, so that the values are a matrix of characters
+    width = int(lengths.max())
+    fraction_digits = width - 9
+    if width != 8 and not 1 <= fraction_digits <= 6:
+        return None
+    expected_lengths = numpy.where(is_null, 0, width) if is_null is not None else width
+    if (lengths != expected_lengths).any():
+        return None
+
+    characters = numpy.frombuffer(data_buffer, dtype=numpy.uint8)[
+        offsets[0] : offsets[-1]
+    ].reshape(-1, width)
+    # One row per character position, as digits (anything that isn't a digit becomes greater than 9)
+    digits = numpy.ascontiguousarray(characters.T) - numpy.uint8(ord("0"))
+    separators = [2, 5] + ([8] if width > 8 else [])
+    digit_positions = [i for i in range(width) if i not in separators]
+    if (
+        not (characters[:, 2] == ord(":")).all()
+        or not (characters[:, 5] == ord(":")).all()
+        or (width > 8 and not (characters[:, 8] == ord(".")).all())
+        or (digits[digit_positions] > 9).any()
+    ):
+        return None
+
+    # Two-digit fields fit in a uint8, so they're combined before widening
+    hours, minutes, seconds = (
+        (digits[i] * numpy.uint8(10) + digits[i + 1]).astype(numpy.int64)
+        for i in (0, 3, 6)
+    )
+    if (hours > 23).any() or (minutes > 59).any() or (seconds > 59).any():
+        return None
+    microseconds = ((hours * 60 + minutes) * 60 + seconds) * 1_000_000
+    if fraction_digits > 0:
+        fraction = numpy.zeros(len(characters), dtype=numpy.int64)
+        for i in range(9, width):
+            fraction *= 10
+            fraction += digits[i]
+        microseconds += fraction * 10 ** (6 - fraction_digits)
+
+    if is_null is not None:
+        values = numpy.zeros(row_count, dtype=numpy.int64)
+        values[~is_null] = microseconds
+        return pyarrow.array(values, type=pyarrow.time64("us"), mask=is_null)
+    return pyarrow.array(microseconds, type=pyarrow.time64("us"))
+
+
+def make_dask_dataframe(
+    *,
+    streams,
+    mapped_variables,
+    coerce_schema,
+    batch_preprocessor,
+    filter_expression,
+    target_batch_size=None,
+):
+    import dask.dataframe as dd
+    import pandas
+    import pyarrow
+
+    schema = (
+        pyarrow.schema(map(variable_to_field, mapped_variables))
+        if batch_preprocessor is None and mapped_variables is not None
+        else None
+    )
+    # Without a known schema (e.g., with a batch_preprocessor), dask computes the first partition to infer it
+    meta_kwargs = (
+        {"meta": schema.empty_table().to_pandas(types_mapper=pandas.ArrowDtype)}
+        if schema is not None
+        else {}
+    )
+    # One partition per stream, each of which is only fetched when a dask worker computes it.
+    # Arguments must be picklable, so that partitions can be computed on a distributed cluster.
+    return dd.from_map(
+        read_stream_partition,
+        streams,
+        **meta_kwargs,
+        label="redivis-read-stream",
+        enforce_metadata=False,
+        mapped_variables=mapped_variables,
+        coerce_schema=coerce_schema,
+        batch_preprocessor=batch_preprocessor,
+        filter_expression=filter_expression,
+        target_batch_size=target_batch_size,
+        schema=schema,
+    )
+
+
+def read_stream_partition(
+    stream,
+    *,
+    mapped_variables,
+    coerce_schema,
+    batch_preprocessor,
+    filter_expression,
+    target_batch_size,
+    schema,
+):
+    import pandas
+    import pyarrow
+
+    record_batches = process_stream(
+        stream,
+        None,
+        mapped_variables,
+        coerce_schema,
+        None,
+        batch_preprocessor,
+        Event(),
+        filter_expression=filter_expression,
+        target_batch_size=target_batch_size,
+    )
+    if not record_batches and schema is None:
+        return pandas.DataFrame()
+    return pyarrow.Table.from_batches(record_batches, schema=schema).to_pandas(
+        types_mapper=pandas.ArrowDtype
+    )
+
+
 def process_stream(
     stream,
     folder_path,
@@ -470,13 +1215,42 @@ def process_stream(
     batch_preprocessor,
     cancel_event,
     offset=0,
-    retry_count=0,
+    retry_state=None,
+    submitted_at=None,
+    memory_budget=None,
+    spill_folder_path=None,
+    filter_expression=None,
+    column_planner=None,
+    journal=None,
+    stream_range=None,
+    type_compactor=None,
+    target_batch_size=None,
 ):
+    import pyarrow
+
+    if column_planner is None:
+        column_planner = ColumnPlanner(mapped_variables, coerce_schema)
+    write_options = pyarrow.ipc.IpcWriteOptions(compression=get_spill_compression())
+    sink = None
     writer = None
+    initial_offset = offset
+    # Rows before output_offset have been output; the coalescer may hold batches of the rows after it
+    output_offset = offset
+    coalescer = BatchCoalescer(target_batch_size)
+    started_at = time.perf_counter()
+    stream_bytes = 0
+    record_batches = [] if folder_path is None else None
     try:
-        import pyarrow
-
-        with closing(
+        with instrumentation.span(
+            "redivis.read_stream",
+            stream_id=stream["id"],
+            offset=offset,
+            retry_count=retry_state.retry_count if retry_state is not None else 0,
+            # Time spent waiting for a free worker thread
+            queue_wait=(
+                time.perf_counter() - submitted_at if submitted_at is not None else 0
+            ),
+        ) as span, closing(
             make_request(
                 method="get",
                 path=f'/readStreams/{stream["id"]}?offset={offset}',
@@ -484,172 +1258,175 @@ def process_stream(
                 parse_response=False,
             )
         ) as arrow_response:
-            record_batches = [] if folder_path is None else None
             has_content = False
-            retry_suffix = f"-retry_offset-{offset}" if offset > 0 else ""
+            # Batches are written to disk when reading into a folder, or once the read's memory budget is used up.
+            # After that, every stream starts on disk, so that the rows of a range that's retried after it spilled
+            # are read back in order.
+            write_to_disk = folder_path is not None or (
+                memory_budget is not None and memory_budget.spilled
+            )
+            output_folder_path = (
+                folder_path if folder_path is not None else spill_folder_path
+            )
             # create the os_file path
             os_file = (
-                pathlib.Path(folder_path)
-                .joinpath(f"{stream['id']}{retry_suffix}.feather")
-                .absolute()
-                if folder_path is not None
+                get_stream_file_path(output_folder_path, stream["id"], offset)
+                if output_folder_path is not None
                 else None
             )
-            file_context = (
-                pyarrow.OSFile(str(os_file), mode="wb")
-                if folder_path is not None
-                else nullcontext()
-            )
-            with file_context as f, pyarrow.ipc.RecordBatchStreamReader(
-                arrow_response.raw
-            ) as reader:
-                if coerce_schema:
-                    variables_in_stream = list(
-                        map(
-                            lambda field_name: next(
-                                x
-                                for x in mapped_variables
-                                if x["name"].lower() == field_name.lower()
-                            ),
-                            reader.schema.names,
-                        )
-                    )
-
-                    stream_schema = pyarrow.schema(
-                        map(variable_to_field, variables_in_stream)
-                    )
-                else:
-                    stream_schema = reader.schema
-
-                should_reorder_fields = False
-                fields_to_add = []
-
-                if mapped_variables is not None:
-                    reader_names_lower = [n.lower() for n in reader.schema.names]
-
-                    for i, field_name in enumerate(reader.schema.names):
-                        mapped_index = next(
-                            (
-                                j
-                                for j, v in enumerate(mapped_variables)
-                                if v["name"].lower() == field_name.lower()
-                            ),
-                            None,
-                        )
-                        if mapped_index is not None and mapped_index != i:
-                            should_reorder_fields = True
-                            break
-
-                    fields_to_add = [
-                        v
-                        for v in mapped_variables
-                        if v["name"].lower() not in reader_names_lower
-                    ]
-
-                    if fields_to_add:
-                        should_reorder_fields = True
-
-                output_schema = (
-                    pyarrow.schema(map(variable_to_field, mapped_variables))
-                    if should_reorder_fields
-                    else stream_schema
-                )
-
-                for batch in reader:
+            with pyarrow.ipc.RecordBatchStreamReader(arrow_response.raw) as reader:
+                column_plan = column_planner.get_plan(reader.schema)
+                output_schema = column_plan.output_schema
+
+                batches = map(column_plan.apply, reader)
+                is_stream_finished = False
+                while not is_stream_finished:
+                    batch = next(batches, None)
                     # exit out of thread
                     if cancel_event.is_set():
                         has_content = False
                         break
 
-                    if coerce_schema:
-                        batch = pyarrow.RecordBatch.from_arrays(
-                            list(
-                                map(
-                                    coerce_arrow_array,
-                                    batch.columns,
-                                    variables_in_stream,
-                                )
-                            ),
-                            schema=stream_schema,
-                        )
-
-                    if fields_to_add:
-                        null_arrays = [
-                            pyarrow.nulls(
-                                batch.num_rows, type=variable_to_field(v).type
-                            )
-                            for v in fields_to_add
-                        ]
-                        all_arrays = list(batch.columns) + null_arrays
-                        all_names = [n.lower() for n in batch.schema.names] + [
-                            v["name"].lower() for v in fields_to_add
-                        ]
-                        name_to_array = dict(zip(all_names, all_arrays))
-                        ordered_arrays = [
-                            name_to_array[v["name"].lower()] for v in mapped_variables
-                        ]
-                        batch = pyarrow.RecordBatch.from_arrays(
-                            ordered_arrays, schema=output_schema
-                        )
-                    elif should_reorder_fields:
-                        name_to_array = {
-                            n.lower(): a
-                            for n, a in zip(batch.schema.names, batch.columns)
-                        }
-                        ordered_arrays = [
-                            name_to_array[v["name"].lower()] for v in mapped_variables
-                        ]
-                        batch = pyarrow.RecordBatch.from_arrays(
-                            ordered_arrays, schema=output_schema
+                    if batch is None:
+                        is_stream_finished = True
+                    elif stream_range is not None:
+                        # The rest of the stream may have been split off to another worker
+                        row_count = stream_range.claim(offset, batch.num_rows)
+                        if row_count < batch.num_rows:
+                            batch = batch.slice(0, row_count) if row_count else None
+                        is_stream_finished = stream_range.is_finished(
+                            offset + row_count
                         )
 
-                    num_rows = batch.num_rows
-                    offset += num_rows
-                    if batch_preprocessor:
-                        batch = batch_preprocessor(batch)
-
                     if batch is not None:
+                        offset += batch.num_rows
+                        stream_bytes += batch.nbytes
+                        span.add("rows", batch.num_rows)
+                        span.add("bytes", batch.nbytes)
+                        # Drop non-matching rows before the batch is kept in memory or written to disk
+                        if filter_expression is not None:
+                            batch = filter_batch(batch, filter_expression)
+
+                    # Small batches are buffered until they reach the target size, and the rest are output
+                    # once the stream (or its range) is finished
+                    output_batches = coalescer.add(batch)
+                    if is_stream_finished:
+                        output_batches.extend(coalescer.flush())
+
+                    for batch in output_batches:
+                        if batch_preprocessor:
+                            batch = batch_preprocessor(batch)
+                        if batch is None:
+                            continue
+
                         has_content = True
-                        if folder_path is None:
-                            record_batches.append(batch)
+                        # Batches that are kept in memory are converted to compact types as they're read
+                        memory_batch = (
+                            type_compactor.compact(batch)
+                            if type_compactor is not None and not write_to_disk
+                            else batch
+                        )
+                        if (
+                            not write_to_disk
+                            and memory_budget is not None
+                            and not memory_budget.reserve(memory_batch.nbytes)
+                        ):
+                            write_to_disk = True
+
+                        if not write_to_disk:
+                            record_batches.append(memory_batch)
                         else:
                             if writer is None:
+                                pathlib.Path(output_folder_path).mkdir(
+                                    parents=True, exist_ok=True
+                                )
+                                sink = pyarrow.OSFile(str(os_file), mode="wb")
                                 writer = pyarrow.ipc.RecordBatchFileWriter(
-                                    f,
+                                    sink,
                                     (
                                         output_schema
                                         if batch_preprocessor is None
                                         else batch.schema
                                     ),
+                                    options=write_options,
                                 )
+                                if record_batches:
+                                    # Over the memory budget; move the batches this stream already holds to disk
+                                    for record_batch in record_batches:
+                                        writer.write_batch(
+                                            conform_batch(record_batch, output_schema)
+                                            if type_compactor is not None
+                                            else record_batch
+                                        )
+                                    memory_budget.release(
+                                        sum(b.nbytes for b in record_batches)
+                                    )
+                                    record_batches.clear()
 
                             writer.write_batch(batch)
 
-                    if progressbar is not None:
-                        progressbar.update(num_rows)
+                    if coalescer.is_empty():
+                        # All of the rows up to the offset have been output
+                        if progressbar is not None:
+                            progressbar.update(offset - output_offset)
+                        output_offset = offset
+
+                        if (
+                            journal is not None
+                            and writer is not None
+                            and sink.tell() >= read_journal.CHECKPOINT_BYTES
+                        ):
+                            # Checkpoint the rows read so far, and continue in a new file
+                            writer.close()
+                            sink.close()
+                            journal.add_file(stream["id"], os_file.name, offset)
+                            writer = None
+                            sink = None
+                            os_file = get_stream_file_path(
+                                output_folder_path, stream["id"], offset
+                            )
 
                 if writer is not None:
                     writer.close()
+                    sink.close()
+
+            if not cancel_event.is_set():
+                read_planner.record_stream_throughput(
+                    stream_bytes, time.perf_counter() - started_at
+                )
 
+            if writer is not None and not has_content:
+                os.remove(os_file)
+            if journal is not None and not cancel_event.is_set():
+                journal.complete_stream(
+                    stream["id"], os_file.name if writer is not None else None, offset
+                )
             if folder_path is None:
                 return record_batches
-            elif not has_content:
-                os.remove(os_file)
     except (RequestException, HTTPError) as e:
         if writer is not None:
             try:
                 writer.close()
+                sink.close()
+                if journal is not None:
+                    # The file is complete up to the output offset, where the retry continues
+                    journal.add_file(stream["id"], os_file.name, output_offset)
             except Exception:
                 pass
 
-        if retry_count >= 10:
+        if retry_state is None:
+            retry_state = get_retry_policy().start()
+        elif output_offset > initial_offset:
+            # The previous attempt made progress, so this stream gets a fresh set of retries
+            retry_state.reset()
+
+        if not retry_state.sleep():
             raise exceptions.NetworkError(
-                message=f"A network error occurred. Stream rows connection failed after {retry_count} retries.",
+                message=f"A network error occurred. Stream rows connection failed after {retry_state.retry_count} retries.",
                 original_exception=e,
             ) from e
 
-        time.sleep(retry_count + 1)
-        return process_stream(
+        remaining_batches = process_stream(
             stream,
             folder_path,
             mapped_variables,
@@ -657,6 +1434,19 @@ def process_stream(
             progressbar,
             batch_preprocessor,
             cancel_event,
-            offset=offset,
-            retry_count=retry_count + 1,
+            # Rows that were still buffered by the coalescer are read again
+            offset=output_offset,
+            retry_state=retry_state,
+            memory_budget=memory_budget,
+            spill_folder_path=spill_folder_path,
+            filter_expression=filter_expression,
+            column_planner=column_planner,
+            journal=journal,
+            stream_range=stream_range,
+            type_compactor=type_compactor,
+            target_batch_size=target_batch_size,
         )
+        # Keep the batches that were read before the connection dropped
+        if folder_path is None:
+            return record_batches + remaining_batches
+        return remaining_batches
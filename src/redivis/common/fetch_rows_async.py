@@ -0,0 +1,375 @@
+import asyncio
+import os
+import time
+from niquests.exceptions import RequestException
+from niquests.packages.urllib3.exceptions import HTTPError
+
+from . import exceptions, instrumentation, read_planner
+from .api_request import make_request_async
+from .fetch_rows import (
+    PREFETCH_BATCHES,
+    BatchCoalescer,
+    ColumnPlanner,
+    filter_batch,
+    get_filter_expression,
+    get_read_session_payload,
+    get_target_batch_size,
+)
+from .retry_policy import get_retry_policy
+
+# Reads the streams of a read session on the event loop, for asyncio applications that serve rows without blocking.
+# All requests go through the loop's pooled async session, so when the API negotiates HTTP/2 the streams are
+# multiplexed over a single connection. Each stream is read by a task into a bounded queue: once the consumer falls
+# behind, the task stops reading the response, and the connection's flow control stops the server from sending more.
+#
+# Arrow's stream reader only reads from blocking file objects, so the response's chunks are buffered, and batches are
+# only read from the buffer once their messages have fully arrived.
+
+CHUNK_SIZE = 256 * 1024
+
+
+class TruncatedStreamError(Exception):
+    pass
+
+
+class IpcStreamBuffer:
+    """The bytes of an IPC stream that have arrived, read as a file by Arrow's stream reader."""
+
+    closed = False
+
+    def __init__(self):
+        self.buffer = bytearray()
+        # The stream reader has read the bytes before read_offset; the bytes before scan_offset are complete messages
+        self.read_offset = 0
+        self.scan_offset = 0
+
+    def append(self, data):
+        # Drop the bytes that were read once they're most of the buffer, so each byte is only moved a few times
+        if self.read_offset > len(self.buffer) // 2:
+            del self.buffer[: self.read_offset]
+            self.scan_offset -= self.read_offset
+            self.read_offset = 0
+        self.buffer += data
+
+    def read(self, nbytes=None):
+        # The stream reader is only asked for complete messages, so it never reads past them
+        end = (
+            self.scan_offset
+            if nbytes is None
+            else min(self.read_offset + nbytes, self.scan_offset)
+        )
+        data = bytes(self.buffer[self.read_offset : end])
+        self.read_offset = end
+        return data
+
+    def get_incomplete_length(self):
+        return len(self.buffer) - self.scan_offset
+
+
+class IpcStreamDecoder:
+    """Decodes the record batches of an Arrow IPC stream from its bytes, as they arrive.
+
+    Arrow's stream reader blocks until it has read a whole message, so the bytes are first scanned with a
+    MessageReader for the messages that have fully arrived, and the stream reader (which also resolves the
+    dictionaries of dictionary-encoded columns) is only asked for the batches whose messages are complete.
+    """
+
+    def __init__(self):
+        self.stream_buffer = IpcStreamBuffer()
+        self.reader = None
+        self.schema = None
+        self.has_schema = False
+        self.ready_batch_count = 0
+        self.is_finished = False
+
+    def feed(self, data):
+        import pyarrow.ipc
+
+        self.stream_buffer.append(data)
+        self.scan()
+        if self.reader is None and self.has_schema:
+            # Reads the schema message, and then the other messages as batches are requested
+            self.reader = pyarrow.ipc.open_stream(self.stream_buffer)
+            self.schema = self.reader.schema
+
+        batches = []
+        while self.ready_batch_count:
+            batches.append(self.reader.read_next_batch())
+            self.ready_batch_count -= 1
+        return batches
+
+    def scan(self):
+        import pyarrow
+        import pyarrow.ipc
+
+        # A zero-copy view of the unscanned bytes, which is released (when this returns) before the buffer is resized
+        buffer_reader = pyarrow.BufferReader(
+            pyarrow.py_buffer(self.stream_buffer.buffer).slice(
+                self.stream_buffer.scan_offset
+            )
+        )
+        message_reader = pyarrow.ipc.MessageReader.open_stream(buffer_reader)
+        while not self.is_finished:
+            position = buffer_reader.tell()
+            try:
+                message_type = message_reader.read_next_message().type
+            except StopIteration:
+                # Either the end-of-stream marker, or no more bytes
+                self.is_finished = buffer_reader.tell() > position
+                self.stream_buffer.scan_offset += buffer_reader.tell() - position
+                break
+            except (pyarrow.ArrowException, OSError):
+                # The next message hasn't fully arrived
+                break
+            self.stream_buffer.scan_offset += buffer_reader.tell() - position
+            if message_type == "schema":
+                self.has_schema = True
+            elif message_type == "record batch":
+                self.ready_batch_count += 1
+
+    def close(self):
+        # A stream may end without an end-of-stream marker, but not partway through a message
+        incomplete_length = self.stream_buffer.get_incomplete_length()
+        if incomplete_length:
+            raise TruncatedStreamError(
+                f"The read stream ended partway through a message ({incomplete_length} bytes)"
+            )
+
+
+class AsyncArrowIterator:
+    """Asynchronously iterates over the record batches of a table, query, upload, or read stream:
+
+    async with table.to_arrow_batch_iterator_async() as batches:
+        async for batch in batches:
+            ...
+
+    The read session is created on the first iteration. Up to max_parallelization streams are read concurrently,
+    and at most PREFETCH_BATCHES batches per stream (ordered) or per worker (unordered) are buffered. Breaking out
+    of an `async for` loop cancels the streams' tasks, as do leaving an `async with` block and aclose().
+    """
+
+    def __init__(
+        self,
+        reader,
+        *,
+        max_results=None,
+        variables=None,
+        filter=None,
+        max_parallelization=os.cpu_count() or 1,
+        ordered=True,
+        target_batch_rows=None,
+        target_batch_bytes=None,
+        prepare=None,
+    ):
+        if max_parallelization < 1:
+            raise exceptions.ValueError("max_parallelization must be greater than 0")
+
+        self.reader = reader
+        self.max_results = max_results
+        self.variables = variables
+        self.filter_expression = get_filter_expression(filter)
+        self.max_parallelization = max_parallelization
+        self.ordered = ordered
+        self.target_batch_size = get_target_batch_size(
+            target_batch_rows, target_batch_bytes
+        )
+        # Awaited before the read starts, e.g. to wait for an async query to finish
+        self.prepare = prepare
+        self.streams = None
+        self.queues = None
+        self.tasks = None
+        self.column_planner = None
+        self.current_stream_index = 0
+        self.finished_stream_count = 0
+        self.is_closed = False
+
+    def __repr__(self):
+        return f"<AsyncArrowIterator {self.reader!r}>"
+
+    def __aiter__(self):
+        return self.__iter_batches__()
+
+    async def __iter_batches__(self):
+        # An async generator, which is closed once `async for` stops using it (e.g. after a break), so that the
+        # streams' tasks don't keep reading after the consumer has gone away
+        try:
+            while True:
+                try:
+                    batch = await self.__anext__()
+                except StopAsyncIteration:
+                    return
+                yield batch
+        finally:
+            await self.aclose()
+
+    async def __anext__(self):
+        if self.tasks is None and not self.is_closed:
+            await self.start()
+
+        while not self.is_closed and self.finished_stream_count < len(self.streams):
+            queue_index = self.current_stream_index if self.ordered else 0
+            kind, value = await self.queues[queue_index].get()
+            if kind == "batch":
+                return value
+            elif kind == "error":
+                await self.aclose()
+                raise value
+            else:
+                self.finished_stream_count += 1
+                self.current_stream_index += 1
+
+        await self.aclose()
+        raise StopAsyncIteration
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def start(self):
+        from .TabularReader import get_mapped_variables
+        from ..classes.ReadStream import ReadStream
+
+        if self.prepare is not None:
+            await self.prepare()
+
+        # Variables are listed with the synchronous client (and cached), so they're listed on a worker thread
+        mapped_variables, selected_variables, coerce_schema = await asyncio.to_thread(
+            get_mapped_variables, self.reader, self.variables
+        )
+        self.column_planner = ColumnPlanner(mapped_variables, coerce_schema)
+
+        max_parallelization = self.max_parallelization
+        if isinstance(self.reader, ReadStream):
+            self.streams = [{"id": self.reader.id}]
+            max_parallelization = 1
+        else:
+            read_session = await make_request_async(
+                method="post",
+                path=f"{self.reader.uri}/readSessions",
+                payload=get_read_session_payload(
+                    self.reader,
+                    max_results=self.max_results,
+                    selected_variables=selected_variables,
+                    max_parallelization=max_parallelization,
+                ),
+            )
+            self.streams = read_session["streams"]
+
+        worker_count = max(min(max_parallelization, len(self.streams)), 1)
+        if self.ordered:
+            self.queues = [
+                asyncio.Queue(maxsize=PREFETCH_BATCHES) for _ in self.streams
+            ]
+        else:
+            shared_queue = asyncio.Queue(maxsize=PREFETCH_BATCHES * worker_count)
+            self.queues = [shared_queue for _ in self.streams]
+
+        # Tasks acquire the semaphore in the order they're created, so in ordered mode the stream being
+        # consumed is always being read
+        semaphore = asyncio.Semaphore(worker_count)
+        self.tasks = [
+            asyncio.ensure_future(
+                self.__read_stream__(stream, stream_queue, semaphore)
+            )
+            for stream, stream_queue in zip(self.streams, self.queues)
+        ]
+
+    async def __read_stream__(self, stream, stream_queue, semaphore):
+        async with semaphore:
+            try:
+                started_at = time.monotonic()
+                nbytes = await self.__read_stream_batches__(stream, stream_queue)
+                read_planner.record_stream_throughput(
+                    nbytes, time.monotonic() - started_at
+                )
+                await stream_queue.put(("done", None))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await stream_queue.put(("error", e))
+
+    async def __read_stream_batches__(self, stream, stream_queue):
+        retry_state = get_retry_policy().start()
+        offset = 0
+        nbytes = 0
+        # Batches that were buffered before a reconnect are kept, since the stream resumes after them
+        coalescer = BatchCoalescer(self.target_batch_size)
+        while True:
+            span = instrumentation.start_span(
+                "redivis.read_stream",
+                stream_id=stream["id"],
+                offset=offset,
+                retry_count=retry_state.retry_count,
+            )
+            response = None
+            error = None
+            try:
+                response = await make_request_async(
+                    method="get",
+                    path=f'/readStreams/{stream["id"]}?offset={offset}',
+                    stream=True,
+                    parse_response=False,
+                )
+                # Each response starts with the schema, including when resuming from an offset
+                decoder = IpcStreamDecoder()
+                column_plan = None
+                async for chunk in await response.iter_content(CHUNK_SIZE):
+                    for batch in decoder.feed(chunk):
+                        if column_plan is None:
+                            column_plan = self.column_planner.get_plan(decoder.schema)
+                        offset += batch.num_rows
+                        nbytes += batch.nbytes
+                        span.add("rows", batch.num_rows)
+                        span.add("bytes", batch.nbytes)
+                        retry_state.reset()
+
+                        batch = await self.__process_batch__(batch, column_plan)
+                        for output_batch in coalescer.add(batch):
+                            await stream_queue.put(("batch", output_batch))
+                decoder.close()
+                for output_batch in coalescer.flush():
+                    await stream_queue.put(("batch", output_batch))
+                return nbytes
+            except (RequestException, HTTPError, TruncatedStreamError) as e:
+                span.set_error(e)
+                error = e
+            finally:
+                span.end()
+                if response is not None:
+                    await response.close()
+
+            # Resume the stream from the last batch that was read
+            if not await retry_state.sleep_async():
+                raise exceptions.NetworkError(
+                    message=f"A network error occurred. Download connection failed after {retry_state.retry_count} retries.",
+                    original_exception=error,
+                ) from error
+
+    async def __process_batch__(self, batch, column_plan):
+        # Coercing and filtering are CPU-bound, so they're done on a worker thread to keep the loop responsive
+        if column_plan.is_noop and self.filter_expression is None:
+            return batch
+        return await asyncio.to_thread(self.__apply__, batch, column_plan)
+
+    def __apply__(self, batch, column_plan):
+        batch = column_plan.apply(batch)
+        if self.filter_expression is not None:
+            return filter_batch(batch, self.filter_expression)
+        return batch
+
+    async def aclose(self):
+        self.is_closed = True
+        tasks = self.tasks or []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def __del__(self):
+        for task in getattr(self, "tasks", None) or []:
+            try:
+                task.cancel()
+            except RuntimeError:
+                # The event loop was already closed
+                pass
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+
+# Lightweight, OpenTelemetry-style instrumentation of API requests, read streams, downloads and uploads.
+# Hooks are callables that receive an event dict for every span start / end and for point-in-time events
+# (e.g. retries). When no hooks are registered, spans are no-ops and cost next to nothing.
+#
+#   from redivis.common import instrumentation
+#   instrumentation.add_hook(lambda event: print(event))
+#
+# Set REDIVIS_TRACE_FILE (or call add_hook(JSONLExporter(path))) to append all events to a local JSONL file.
+#
+# Events look like:
+#   {"event": "span_end", "name": "redivis.read_stream", "trace_id": ..., "span_id": ..., "parent_span_id": ...,
+#    "start_time": 1700000000.0, "end_time": 1700000001.2, "duration": 1.2, "status": "ok", "error": None,
+#    "attributes": {"stream_id": ..., "rows": 100000, "bytes": 8000000, "queue_wait": 0.01}}
+
+hooks = []
+_current_span = contextvars.ContextVar("redivis_current_span", default=None)
+
+
+def add_hook(hook):
+    hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    if hook in hooks:
+        hooks.remove(hook)
+
+
+def is_enabled():
+    return bool(hooks)
+
+
+def emit(event):
+    for hook in list(hooks):
+        try:
+            hook(event)
+        except Exception as e:
+            # Instrumentation must never break the operation being instrumented
+            logging.debug(f"Instrumentation hook failed: {e}")
+
+
+class Span:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        parent = _current_span.get()
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_span_id = parent.span_id if parent else None
+        self.start_time = None
+        self.end_time = None
+        self.error = None
+        self._token = None
+
+    def start(self):
+        self.start_time = time.time()
+        self._started_at = time.perf_counter()
+        emit(self._to_event("span_start"))
+        return self
+
+    def end(self):
+        if self.end_time is not None:
+            return
+        self.end_time = self.start_time + (time.perf_counter() - self._started_at)
+        emit(self._to_event("span_end"))
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, name, value):
+        self.attributes[name] = self.attributes.get(name, 0) + value
+
+    def set_error(self, error):
+        self.error = error
+
+    def __enter__(self):
+        self.start()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current_span.reset(self._token)
+        if exc_value is not None and self.error is None:
+            self.error = exc_value
+        self.end()
+        return False
+
+    def _to_event(self, event_type):
+        event = {
+            "event": event_type,
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time": self.start_time,
+            "attributes": dict(self.attributes),
+        }
+        if event_type == "span_end":
+            event["end_time"] = self.end_time
+            event["duration"] = self.end_time - self.start_time
+            event["status"] = "error" if self.error is not None else "ok"
+            event["error"] = repr(self.error) if self.error is not None else None
+        return event
+
+
+class NoopSpan:
+    def start(self):
+        return self
+
+    def end(self):
+        pass
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, name, value):
+        pass
+
+    def set_error(self, error):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NOOP_SPAN = NoopSpan()
+
+
+def span(name, **attributes):
+    # Use as a context manager; the span becomes the parent of any spans / events created within it
+    if not hooks:
+        return NOOP_SPAN
+    return Span(name, attributes)
+
+
+def start_span(name, **attributes):
+    # For spans that don't map onto a single block of code (e.g., iterators); the caller must call end()
+    if not hooks:
+        return NOOP_SPAN
+    return Span(name, attributes).start()
+
+
+def record_event(name, **attributes):
+    if not hooks:
+        return
+    parent = _current_span.get()
+    emit(
+        {
+            "event": "event",
+            "name": name,
+            "trace_id": parent.trace_id if parent else None,
+            "parent_span_id": parent.span_id if parent else None,
+            "time": time.time(),
+            "attributes": attributes,
+        }
+    )
+
+
+class JSONLExporter:
+    def __init__(self, path):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        self.file = None
+        self.pid = None
+
+    def __call__(self, event):
+        line = json.dumps(event, default=str)
+        with self.lock:
+            # Reopen after a fork, so that processes don't share a file offset
+            if self.file is None or self.pid != os.getpid():
+                self.file = open(self.path, "a", buffering=1)
+                self.pid = os.getpid()
+            self.file.write(line + "\n")
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+if os.getenv("REDIVIS_TRACE_FILE"):
+    add_hook(JSONLExporter(os.environ["REDIVIS_TRACE_FILE"]))
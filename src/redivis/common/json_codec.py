@@ -0,0 +1,41 @@
+import os
+import json
+
+# JSON encoding / decoding for API payloads and responses.
+# orjson is used when it's installed (pip install "redivis[orjson]"), which is several times faster than the
+# standard library for large payloads such as variable listings or batches of temp uploads. It also parses
+# response bodies directly from bytes, rather than first decoding them to a str.
+# Set REDIVIS_JSON_BACKEND=json to always use the standard library.
+
+orjson = None
+if os.getenv("REDIVIS_JSON_BACKEND", "orjson").lower() != "json":
+    try:
+        import orjson
+    except ImportError:
+        pass
+
+
+def get_backend():
+    return "orjson" if orjson is not None else "json"
+
+
+def dumps(value):
+    # Always returns utf-8 encoded bytes
+    if orjson is not None:
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            # E.g., integers larger than 64 bits, or non-string dict keys, which the standard library can encode
+            pass
+    return json.dumps(value).encode("utf-8")
+
+
+def loads(data):
+    # Accepts str or bytes
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # E.g., NaN or Infinity, which the standard library can decode
+            pass
+    return json.loads(data)
@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import hashlib
+import pathlib
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from . import json_codec
+
+# Client-side cache for metadata GET requests (table / upload / variable lookups).
+# Entries are keyed by the request path (which includes the resource's version), the query string, and a hash of the
+# auth token, so that responses are never served to a different identity after the credentials change.
+# Within an entry's TTL it is served without a network request; afterwards it's revalidated
+# with If-None-Match / If-Modified-Since, so unchanged resources only cost a 304 response.
+#
+# Configuration (environment variables, or configure()):
+#   REDIVIS_METADATA_CACHE=0          disable the cache
+#   REDIVIS_METADATA_CACHE_TTL        default TTL in seconds (default 0, i.e. always revalidate)
+#   REDIVIS_METADATA_CACHE_SIZE       max number of in-memory entries (default 512)
+#   REDIVIS_METADATA_CACHE_MAX_BYTES  max total size of the in-memory entries' bodies (default 32MiB)
+#   REDIVIS_METADATA_CACHE_DIR        if set, entries are also persisted to this directory
+
+config = {
+    "enabled": os.getenv("REDIVIS_METADATA_CACHE", "1").lower()
+    not in ("0", "false", "no"),
+    "ttl": float(os.getenv("REDIVIS_METADATA_CACHE_TTL", 0)),
+    # Per-resource TTLs, keyed by the resource kind (e.g. "tables", "variables", "uploads")
+    "ttls": {},
+    "max_entries": int(os.getenv("REDIVIS_METADATA_CACHE_SIZE", 512)),
+    "max_bytes": int(
+        float(os.getenv("REDIVIS_METADATA_CACHE_MAX_BYTES", 32 * 1024**2))
+    ),
+    "directory": os.getenv("REDIVIS_METADATA_CACHE_DIR"),
+}
+
+_entries = OrderedDict()
+_entries_bytes = 0
+_lock = threading.Lock()
+
+
+def configure(
+    *,
+    enabled=None,
+    ttl=None,
+    ttls=None,
+    max_entries=None,
+    max_bytes=None,
+    directory=None,
+):
+    if enabled is not None:
+        config["enabled"] = enabled
+    if ttl is not None:
+        config["ttl"] = ttl
+    if ttls is not None:
+        config["ttls"].update(ttls)
+    if max_entries is not None:
+        config["max_entries"] = max_entries
+    if max_bytes is not None:
+        config["max_bytes"] = max_bytes
+    if directory is not None:
+        config["directory"] = str(directory)
+
+
+def is_enabled():
+    return config["enabled"]
+
+
+def clear():
+    global _entries_bytes
+    with _lock:
+        _entries.clear()
+        _entries_bytes = 0
+    if config["directory"]:
+        shutil.rmtree(config["directory"], ignore_errors=True)
+
+
+def get_key(path, query=None, auth_token=None):
+    params = {k: v for k, v in (query or {}).items() if v is not None}
+    key = f"{path}?{urlencode(sorted(params.items()), doseq=True)}" if params else path
+    # URL paths can't contain a "#", so the identity is always separable from the path
+    return f"{key}#{_hash(auth_token or '')[:32]}"
+
+
+def get_path(key):
+    return key.split("#")[0].split("?")[0]
+
+
+def get_resource_kind(path):
+    # Collections are the even path segments, e.g. /tables/{ref}/variables/{name} -> "variables"
+    return get_path(path).strip("/").split("/")[0::2][-1]
+
+
+def get_ttl(path):
+    return config["ttls"].get(get_resource_kind(path), config["ttl"])
+
+
+class CacheEntry:
+    def __init__(self, key, body, etag=None, last_modified=None, fetched_at=None):
+        self.key = key
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at or time.time()
+
+    def is_fresh(self):
+        return time.time() - self.fetched_at < get_ttl(self.key)
+
+    def validation_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def value(self):
+        # Parse on every hit, so callers never share (and mutate) the same object
+        return json_codec.loads(self.body)
+
+
+def get(key):
+    if not config["enabled"]:
+        return None
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            return entry
+
+    entry = _read_from_disk(key)
+    if entry is not None:
+        _set_in_memory(entry)
+    return entry
+
+
+def put(key, response):
+    if not config["enabled"] or response.status_code != 200:
+        return
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag is None and last_modified is None and get_ttl(key) <= 0:
+        # Nothing to revalidate with, and the entry would never be fresh
+        return
+
+    entry = CacheEntry(key, response.text, etag=etag, last_modified=last_modified)
+    _set_in_memory(entry)
+    _write_to_disk(entry)
+
+
+def revalidate(entry):
+    entry.fetched_at = time.time()
+    _write_to_disk(entry)
+
+
+def invalidate(path):
+    """Drop all entries belonging to the resource at path (e.g. after a PATCH / POST / DELETE)."""
+    global _entries_bytes
+    resource_root = get_resource_root(path)
+    with _lock:
+        for key in [k for k in _entries if get_resource_root(k) == resource_root]:
+            _entries_bytes -= len(_entries.pop(key).body)
+
+    if config["directory"]:
+        shutil.rmtree(_get_resource_dir(resource_root), ignore_errors=True)
+
+
+def get_resource_root(path):
+    # E.g. /tables/{ref}/variables/{name} -> /tables/{ref}
+    return "/" + "/".join(get_path(path).strip("/").split("/")[0:2])
+
+
+def _set_in_memory(entry):
+    global _entries_bytes
+    with _lock:
+        previous_entry = _entries.pop(entry.key, None)
+        if previous_entry is not None:
+            _entries_bytes -= len(previous_entry.body)
+        # Entries larger than the whole cache are only kept on disk
+        if len(entry.body) > config["max_bytes"]:
+            return
+        _entries[entry.key] = entry
+        _entries_bytes += len(entry.body)
+        while _entries and (
+            len(_entries) > max(config["max_entries"], 0)
+            or _entries_bytes > config["max_bytes"]
+        ):
+            _, evicted_entry = _entries.popitem(last=False)
+            _entries_bytes -= len(evicted_entry.body)
+
+
+def _hash(value):
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def _get_resource_dir(resource_root):
+    return pathlib.Path(config["directory"]) / _hash(resource_root)
+
+
+def _get_entry_path(key):
+    return _get_resource_dir(get_resource_root(key)) / f"{_hash(key)}.json"
+
+
+def _read_from_disk(key):
+    if not config["directory"]:
+        return None
+    try:
+        with open(_get_entry_path(key), "r") as f:
+            data = json.load(f)
+        if data["key"] != key:
+            return None
+        return CacheEntry(
+            key,
+            data["body"],
+            etag=data.get("etag"),
+            last_modified=data.get("last_modified"),
+            fetched_at=data.get("fetched_at"),
+        )
+    except Exception:
+        return None
+
+
+def _write_to_disk(entry):
+    if not config["directory"]:
+        return
+    try:
+        entry_path = _get_entry_path(entry.key)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file first, so that concurrent readers never see a partial entry
+        temp_path = entry_path.with_name(f"{entry_path.name}.{uuid.uuid4()}.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(
+                {
+                    "key": entry.key,
+                    "body": entry.body,
+                    "etag": entry.etag,
+                    "last_modified": entry.last_modified,
+                    "fetched_at": entry.fetched_at,
+                },
+                f,
+            )
+        os.replace(temp_path, entry_path)
+    except OSError:
+        pass
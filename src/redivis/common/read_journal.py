@@ -0,0 +1,121 @@
+import os
+import json
+import pathlib
+import uuid
+from threading import Lock
+
+from . import exceptions
+
+# Checkpoint journal for reads into a stable output folder (e.g. to_arrow_dataset(path=..., resume=True)).
+# It records the read session, and for each stream, the feather files that were completely written and the
+# offset (row count) that they reach. If the process is killed, re-running the same read with resume=True
+# skips completed streams and restarts the others at their last checkpoint, reusing the same read session
+# for as long as it remains valid on the server.
+#
+# The journal is stored in the output folder as _redivis_read.json; pyarrow datasets ignore files prefixed
+# with an underscore, so it isn't read as data.
+
+JOURNAL_FILE_NAME = "_redivis_read.json"
+
+# While journaling, a stream's output is split into files of roughly this size, each of which is a checkpoint
+CHECKPOINT_BYTES = 256 * 1024**2
+
+
+class ReadJournal:
+    def __init__(self, folder_path, key, read_session, streams=None):
+        self.path = pathlib.Path(folder_path) / JOURNAL_FILE_NAME
+        self.key = key
+        self.read_session = read_session
+        self.streams = streams or {
+            stream["id"]: {"files": [], "offset": 0, "completed": False}
+            for stream in read_session["streams"]
+        }
+        self.lock = Lock()
+
+    @classmethod
+    def create(cls, folder_path, key, read_session):
+        folder = pathlib.Path(folder_path)
+        existing_journal = cls.load(folder_path)
+        if existing_journal is not None:
+            # Left over from a previous read into the same folder, which isn't being resumed
+            existing_journal.remove_files(all_files=True)
+            existing_journal.path.unlink(missing_ok=True)
+        elif folder.exists() and any(folder.iterdir()):
+            raise exceptions.ValueError(
+                f"The folder {folder_path} is not empty. Please provide an empty or new folder to read into."
+            )
+        folder.mkdir(parents=True, exist_ok=True)
+
+        journal = cls(folder_path, key, read_session)
+        journal.save()
+        return journal
+
+    @classmethod
+    def load(cls, folder_path):
+        try:
+            with open(pathlib.Path(folder_path) / JOURNAL_FILE_NAME, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        return cls(
+            folder_path, data["key"], data["read_session"], streams=data["streams"]
+        )
+
+    @classmethod
+    def resume(cls, folder_path, key):
+        journal = cls.load(folder_path)
+        if journal is None:
+            return None
+        if journal.key != key:
+            raise exceptions.ValueError(
+                f"The folder {folder_path} contains a different read, which can't be resumed with these arguments. Please use the same arguments, or set resume=False to start over."
+            )
+        # Files that aren't in the journal were being written when the previous read stopped
+        journal.remove_files(all_files=False)
+        return journal
+
+    def is_completed(self, stream_id):
+        return self.streams[stream_id]["completed"]
+
+    def get_offset(self, stream_id):
+        return self.streams[stream_id]["offset"]
+
+    def get_completed_row_count(self):
+        return sum(stream["offset"] for stream in self.streams.values())
+
+    def add_file(self, stream_id, file_name, offset, completed=False):
+        with self.lock:
+            stream = self.streams[stream_id]
+            if file_name is not None:
+                stream["files"].append(file_name)
+            stream["offset"] = offset
+            stream["completed"] = completed
+            self.save()
+
+    def complete_stream(self, stream_id, file_name, offset):
+        self.add_file(stream_id, file_name, offset, completed=True)
+
+    def remove_files(self, *, all_files):
+        journaled_files = {
+            file_name
+            for stream in self.streams.values()
+            for file_name in stream["files"]
+        }
+        for stream_id in self.streams:
+            for file_path in self.path.parent.glob(f"{stream_id}*.feather"):
+                if all_files or file_path.name not in journaled_files:
+                    file_path.unlink(missing_ok=True)
+
+    def save(self):
+        # Write to a temp file first, so that the journal is never partially written
+        temp_path = self.path.with_name(f"{self.path.name}.{uuid.uuid4()}.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(
+                {
+                    "key": self.key,
+                    "read_session": self.read_session,
+                    "streams": self.streams,
+                },
+                f,
+            )
+        os.replace(temp_path, self.path)
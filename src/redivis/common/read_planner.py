@@ -0,0 +1,118 @@
+import math
+from threading import Lock
+
+# Plans the streams of a read: how many streams the read session requests, and how the remaining rows are
+# rebalanced once some streams finish early.
+#
+# Each stream should be large enough that the overhead of requesting it is negligible, i.e. take about
+# TARGET_STREAM_SECONDS to read at the per-stream throughput measured in previous reads. A read requests up to
+# STREAMS_PER_WORKER streams per worker thread, so that workers that finish their streams pick up the others.
+# Once there are no more streams to pick up, the stream with the most remaining rows is split in two: its worker
+# stops halfway through the remaining rows, and an idle worker reads the rest from that offset.
+
+TARGET_STREAM_SECONDS = 10
+# Per-stream throughput (bytes of record batches per second) assumed until a stream has been measured
+DEFAULT_STREAM_THROUGHPUT = 25 * 1024**2
+MIN_STREAM_BYTES = 64 * 1024**2
+STREAMS_PER_WORKER = 2
+# Streams are only split if each half has at least this many rows
+MIN_SPLIT_ROWS = 50_000
+# Streams that took less time than this to read are too short for a meaningful measurement
+MIN_MEASURED_SECONDS = 1
+
+stream_throughput = {"bytes_per_second": None}
+stream_throughput_lock = Lock()
+
+
+def record_stream_throughput(nbytes, seconds):
+    if seconds < MIN_MEASURED_SECONDS or not nbytes:
+        return
+    with stream_throughput_lock:
+        previous = stream_throughput["bytes_per_second"]
+        current = nbytes / seconds
+        # Exponential moving average, so that a single slow or fast stream doesn't swing the next read's plan
+        stream_throughput["bytes_per_second"] = (
+            current if previous is None else previous * 0.7 + current * 0.3
+        )
+
+
+def get_stream_throughput():
+    return stream_throughput["bytes_per_second"] or DEFAULT_STREAM_THROUGHPUT
+
+
+def estimate_read_bytes(properties, *, max_results=None, selected_variables=None):
+    """Estimates the bytes that a read returns from the table's numRows/numBytes/variableCount, or None if unknown."""
+    num_bytes = (properties or {}).get("numBytes")
+    if num_bytes is None:
+        return None
+    num_rows = properties.get("numRows")
+    if max_results is not None and num_rows:
+        num_bytes *= min(max_results / num_rows, 1)
+    variable_count = properties.get("variableCount")
+    if selected_variables is not None and variable_count:
+        num_bytes *= min(len(selected_variables) / variable_count, 1)
+    return num_bytes
+
+
+def get_stream_count(*, estimated_bytes, max_parallelization):
+    if estimated_bytes is None:
+        return max_parallelization
+    target_stream_bytes = max(
+        MIN_STREAM_BYTES, get_stream_throughput() * TARGET_STREAM_SECONDS
+    )
+    stream_count = math.ceil(estimated_bytes / target_stream_bytes)
+    return max(1, min(stream_count, max_parallelization * STREAMS_PER_WORKER))
+
+
+class StreamRange:
+    """The rows of a stream that a worker reads: from start up to end, or to the end of the stream if end is None.
+    The end is moved when the range is split, so the worker checks it (with claim()) for every batch.
+    """
+
+    def __init__(self, stream, start=0, end=None):
+        self.stream = stream
+        self.start = start
+        self.end = end
+        self.offset = start
+        self.lock = Lock()
+
+    def claim(self, offset, row_count):
+        # Returns how many of the row_count rows at offset belong to this range
+        with self.lock:
+            if self.end is not None:
+                row_count = max(min(row_count, self.end - offset), 0)
+            self.offset = offset + row_count
+            return row_count
+
+    def is_finished(self, offset):
+        with self.lock:
+            return self.end is not None and offset >= self.end
+
+    def get_remaining_rows(self):
+        end = self.end if self.end is not None else self.stream.get("estimatedRows")
+        if end is None:
+            return 0
+        return end - self.offset
+
+    def split(self):
+        """Splits off the second half of the remaining rows as a new range, or returns None if too few remain."""
+        with self.lock:
+            remaining_rows = self.get_remaining_rows()
+            if remaining_rows < MIN_SPLIT_ROWS * 2:
+                return None
+            split_offset = self.offset + remaining_rows // 2
+            # The new range reads to the end of the stream, so it also picks up any rows beyond the estimate
+            split_range = StreamRange(self.stream, split_offset, self.end)
+            self.end = split_offset
+            return split_range
+
+
+def split_largest_range(stream_ranges):
+    """Splits the range with the most remaining rows, returning the new range or None if none can be split."""
+    for stream_range in sorted(
+        stream_ranges, key=lambda r: r.get_remaining_rows(), reverse=True
+    ):
+        split_range = stream_range.split()
+        if split_range is not None:
+            return split_range
+    return None
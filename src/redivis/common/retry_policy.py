@@ -0,0 +1,216 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+
+from . import instrumentation
+
+# Shared retry / backoff policy for all network paths (API requests, read streams, uploads and downloads).
+# Delays grow exponentially with "full jitter", so that many clients that failed at the same time don't retry in lockstep.
+# A process-wide retry budget (a token bucket) limits retries across all threads: once a burst of retries has
+# used it up, each retry waits for the next token (up to the max delay), so that brief throttling is ridden out
+# without a retry storm. If the budget stays used up for longer than its timeout, which means that most requests
+# across the process are failing (e.g. an outage), retries give up straight away until it refills.
+#
+# Configuration (environment variables, or configure()):
+#   REDIVIS_MAX_RETRIES             max retries per operation (default 10)
+#   REDIVIS_RETRY_INITIAL_DELAY     base delay in seconds (default 1)
+#   REDIVIS_RETRY_MAX_DELAY         max delay between retries in seconds (default 32)
+#   REDIVIS_RETRY_DEADLINE          give up after retrying for this many seconds without progress (default: no deadline)
+#   REDIVIS_RETRY_BUDGET            max burst of retries across the process (default 100), refilled at
+#   REDIVIS_RETRY_BUDGET_RATE       this many retries per second (default 2)
+#   REDIVIS_RETRY_BUDGET_TIMEOUT    give up on retries once the budget has been used up for this many seconds (default 60)
+
+RETRYABLE_STATUS_CODES = (429, 502, 503, 504)
+
+
+class RetryBudget:
+    def __init__(self, capacity=100, refill_rate=2, timeout=60):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.timeout = timeout
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        # When the budget was last used up, or None if it currently has tokens
+        self.exhausted_at = None
+        self.lock = threading.Lock()
+
+    def acquire(self, max_wait):
+        # Takes a token and returns how long to wait until it's available (0 if it already is), or None if the
+        # budget has been used up for longer than its timeout. Tokens are reserved ahead of time, so waiting
+        # retries are spread out at the refill rate; past max_wait, the retry waits max_wait without reserving one.
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate
+            )
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.exhausted_at = None
+                self.tokens -= 1
+                return 0
+            if self.exhausted_at is None:
+                self.exhausted_at = now
+            elif now - self.exhausted_at > self.timeout:
+                return None
+            if self.refill_rate <= 0:
+                return max_wait
+            wait = (1 - self.tokens) / self.refill_rate
+            if wait > max_wait:
+                return max_wait
+            self.tokens -= 1
+            return wait
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        *,
+        max_retries=10,
+        initial_delay=1,
+        max_delay=32,
+        multiplier=2,
+        jitter=True,
+        deadline=None,
+        budget=None,
+    ):
+        self.max_retries = max_retries
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+        self.budget = budget
+
+    def start(self):
+        return RetryState(self)
+
+    def get_delay(self, retry_count, retry_after=None):
+        delay = min(
+            self.max_delay, self.initial_delay * self.multiplier ** (retry_count - 1)
+        )
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        # Never retry sooner than the server asked us to
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class RetryState:
+    def __init__(self, policy):
+        self.policy = policy
+        self.retry_count = 0
+        self.started_at = time.monotonic()
+
+    def get_next_delay(self, retry_after=None):
+        # Returns how long to wait before the next attempt, or None if the operation should give up
+        if self.retry_count >= self.policy.max_retries:
+            return None
+
+        delay = self.policy.get_delay(self.retry_count + 1, retry_after)
+        # When the budget is used up, wait for the next token, unless it's been used up for too long
+        if self.policy.budget is not None:
+            budget_wait = self.policy.budget.acquire(self.policy.max_delay)
+            if budget_wait is None:
+                return None
+            delay = max(delay, budget_wait)
+
+        if (
+            self.policy.deadline is not None
+            and time.monotonic() - self.started_at + delay > self.policy.deadline
+        ):
+            return None
+
+        self.retry_count += 1
+        instrumentation.record_event(
+            "redivis.retry",
+            retry_count=self.retry_count,
+            delay=delay,
+            retry_after=retry_after,
+        )
+        return delay
+
+    def sleep(self, retry_after=None):
+        delay = self.get_next_delay(retry_after)
+        if delay is None:
+            return False
+        time.sleep(delay)
+        return True
+
+    async def sleep_async(self, retry_after=None):
+        delay = self.get_next_delay(retry_after)
+        if delay is None:
+            return False
+        await asyncio.sleep(delay)
+        return True
+
+    def reset(self):
+        # Called after an operation makes progress (e.g., a chunk was transferred), so it gets a fresh set of retries
+        self.retry_count = 0
+        self.started_at = time.monotonic()
+
+
+def get_retry_after(response):
+    # Retry-After is either a number of seconds or an HTTP date
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return None
+
+
+def is_retryable_status(status_code):
+    return status_code in RETRYABLE_STATUS_CODES
+
+
+def _get_float_env(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+default_policy = RetryPolicy(
+    max_retries=int(_get_float_env("REDIVIS_MAX_RETRIES", 10)),
+    initial_delay=_get_float_env("REDIVIS_RETRY_INITIAL_DELAY", 1),
+    max_delay=_get_float_env("REDIVIS_RETRY_MAX_DELAY", 32),
+    deadline=_get_float_env("REDIVIS_RETRY_DEADLINE", None),
+    budget=RetryBudget(
+        capacity=_get_float_env("REDIVIS_RETRY_BUDGET", 100),
+        refill_rate=_get_float_env("REDIVIS_RETRY_BUDGET_RATE", 2),
+        timeout=_get_float_env("REDIVIS_RETRY_BUDGET_TIMEOUT", 60),
+    ),
+)
+
+
+def get_retry_policy():
+    return default_policy
+
+
+def configure(
+    *,
+    max_retries=None,
+    initial_delay=None,
+    max_delay=None,
+    multiplier=None,
+    jitter=None,
+    deadline=None,
+    budget=None,
+):
+    for name, value in (
+        ("max_retries", max_retries),
+        ("initial_delay", initial_delay),
+        ("max_delay", max_delay),
+        ("multiplier", multiplier),
+        ("jitter", jitter),
+        ("deadline", deadline),
+        ("budget", budget),
+    ):
+        if value is not None:
+            setattr(default_policy, name, value)
@@ -1,4 +1,3 @@
-from tqdm.auto import tqdm
 import os
 import pathlib
 from base64 import b64decode
@@ -8,13 +7,15 @@ import re
 import asyncio
 import math
 import concurrent.futures
+import contextvars
 import threading
-from ..common import exceptions
+from ..common import exceptions, instrumentation
 from ..common.api_request import __get_api_endpoint, __get_user_agent, make_request
 from ..common.auth import get_auth_token
+from ..common.retry_policy import get_retry_policy, get_retry_after, is_retryable_status
 from contextlib import closing
-from requests import RequestException
-from urllib3.exceptions import HTTPError
+from niquests.exceptions import RequestException
+from niquests.packages.urllib3.exceptions import HTTPError
 import niquests
 
 
@@ -88,8 +89,9 @@ def perform_retryable_download(
     md5_hash=None,
     start_byte=0,
     on_progress=None,
-    retry_count=0,
+    retry_state=None,
 ):
+    retry_count = retry_state.retry_count if retry_state is not None else 0
     if size is not None and md5_hash is not None:
         exact_file_exists = check_filename(
             filename, overwrite, retry_count, size, md5_hash
@@ -100,7 +102,13 @@ def perform_retryable_download(
             return filename
 
     try:
-        with closing(
+        with instrumentation.span(
+            "redivis.download",
+            path=path,
+            filename=str(filename),
+            start_byte=start_byte,
+            retry_count=retry_count,
+        ) as span, closing(
             make_request(
                 method="GET",
                 path=path,
@@ -141,6 +149,8 @@ def perform_retryable_download(
 
             with open(filename, "wb" if retry_count == 0 else "ab") as f:
                 if progress and not pbar:
+                    from tqdm.auto import tqdm
+
                     pbar = tqdm(
                         total=int(r.headers["content-length"]),
                         leave=False,
@@ -150,18 +160,21 @@ def perform_retryable_download(
                     )
 
                 for chunk in r.iter_content(chunk_size=1024 * 1024):
-                    retry_count = 0
+                    if retry_state is not None:
+                        retry_state.reset()
                     if cancel_event and cancel_event.is_set():
                         os.remove(filename)
                         return None
                     if pbar:
                         pbar.update(len(chunk))
                     f.write(chunk)
+                    span.add("bytes", len(chunk))
                     if on_progress:
                         on_progress(len(chunk))
     except (RequestException, HTTPError) as e:
-        if retry_count < 10:
-            time.sleep(retry_count)
+        if retry_state is None:
+            retry_state = get_retry_policy().start()
+        if retry_state.sleep():
             return perform_retryable_download(
                 path=path,
                 filename=filename,
@@ -176,12 +189,12 @@ def perform_retryable_download(
                     os.path.getsize(filename) if os.path.exists(filename) else 0
                 ),
                 on_progress=on_progress,
-                retry_count=retry_count + 1,
+                retry_state=retry_state,
             )
         else:
             # TODO: remove partially downloaded files
             raise exceptions.NetworkError(
-                message=f"A network error occurred. Download failed after {retry_count} retries.",
+                message=f"A network error occurred. Download failed after {retry_state.retry_count} retries.",
                 original_exception=e,
             ) from e
 
@@ -251,6 +264,8 @@ def perform_parallel_download(
     pbar = None
     on_progress = None
     if progress and total_bytes:
+        from tqdm.auto import tqdm
+
         file_count = 0
         pbar = tqdm(
             total=total_bytes,
@@ -308,21 +323,33 @@ def perform_parallel_download(
         )
 
     try:
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(slices))
-        futures = [executor.submit(run_worker, s) for s in slices]
-        not_done = list(futures)
-        try:
-            while not_done and not cancel_event.is_set():
-                freshly_done, not_done = concurrent.futures.wait(not_done, timeout=0.2)
-                for future in freshly_done:
-                    future.result()
-        except KeyboardInterrupt:
-            pass
-        finally:
-            cancel_event.set()
-            for future in not_done:
-                future.cancel()
-            executor.shutdown(wait=True, cancel_futures=True)
+        with instrumentation.span(
+            "redivis.parallel_download",
+            file_count=n,
+            total_bytes=total_bytes,
+            worker_count=len(slices),
+        ):
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(slices))
+            # Run each worker in a copy of the current context, so that its spans are nested under this download
+            futures = [
+                executor.submit(contextvars.copy_context().run, run_worker, s)
+                for s in slices
+            ]
+            not_done = list(futures)
+            try:
+                while not_done and not cancel_event.is_set():
+                    freshly_done, not_done = concurrent.futures.wait(
+                        not_done, timeout=0.2
+                    )
+                    for future in freshly_done:
+                        future.result()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                cancel_event.set()
+                for future in not_done:
+                    future.cancel()
+                executor.shutdown(wait=True, cancel_futures=True)
     finally:
         cancel_event.set()
         if pbar:
@@ -439,8 +466,7 @@ async def _download_single_file(
     cancel_event=None,
     created_dirs=None,
 ):
-    MAX_RETRIES = 10
-    retry_count = 0
+    retry_state = get_retry_policy().start()
     start_byte = 0
     supports_range_requests = False
     current_size = size
@@ -448,226 +474,243 @@ async def _download_single_file(
     did_pre_check = False
     loop = asyncio.get_running_loop()
 
-    while True:
-        # Pre-network check: skip the connection entirely when we already have
-        # enough information to verify the local file.
-        if (
-            not did_pre_check
-            and retry_count == 0
-            and start_byte == 0
-            and current_size is not None
-            and current_md5 is not None
-        ):
-            did_pre_check = True
-            if await loop.run_in_executor(
-                None,
-                check_filename,
-                download_path,
-                overwrite,
-                0,
-                current_size,
-                current_md5,
+    with instrumentation.span(
+        "redivis.download_file", url=url, download_path=str(download_path)
+    ) as span:
+        while True:
+            # Pre-network check: skip the connection entirely when we already have
+            # enough information to verify the local file.
+            if (
+                not did_pre_check
+                and retry_state.retry_count == 0
+                and start_byte == 0
+                and current_size is not None
+                and current_md5 is not None
             ):
-                if on_progress:
-                    on_progress(current_size, 1)
-                return
-
-        if retry_count > 0:
-            await asyncio.sleep(retry_count)
-
-        if cancel_event and cancel_event.is_set():
-            return
-
-        request_headers = {}
-        if start_byte > 0:
-            request_headers["Range"] = f"bytes={start_byte}-"
+                did_pre_check = True
+                if await loop.run_in_executor(
+                    None,
+                    check_filename,
+                    download_path,
+                    overwrite,
+                    0,
+                    current_size,
+                    current_md5,
+                ):
+                    if on_progress:
+                        on_progress(current_size, 1)
+                    span.set(skipped=True)
+                    return
 
-        should_retry = False
-        completed = False
+            if cancel_event and cancel_event.is_set():
+                return
 
-        await sem.acquire(estimated_size)
-        response = None
-        try:
+            request_headers = {}
+            if start_byte > 0:
+                request_headers["Range"] = f"bytes={start_byte}-"
+
+            should_retry = False
+            retry_after = None
+            retry_reason = None
+            retry_exception = None
+            completed = False
+
+            # Time spent waiting for a free connection slot
+            queued_at = time.perf_counter()
+            await sem.acquire(estimated_size)
+            span.add("queue_wait", time.perf_counter() - queued_at)
+            response = None
             try:
-                response = await client.get(url, stream=True, headers=request_headers)
-                status = response.status_code
+                try:
+                    response = await client.get(
+                        url, stream=True, headers=request_headers
+                    )
+                    status = response.status_code
+                    span.set(status_code=status)
 
-                if status == 503:
-                    if retry_count < MAX_RETRIES:
+                    if is_retryable_status(status):
                         should_retry = True
-                    else:
-                        raise exceptions.NetworkError(
-                            message=(
-                                f"HTTP 503. Download failed after"
-                                f" {MAX_RETRIES} retries: {url}"
-                            )
-                        )
+                        retry_after = get_retry_after(response)
+                        retry_reason = f"HTTP {status}"
 
-                elif status >= 400:
-                    body = (await response.content).decode("utf-8", errors="replace")
-                    raise exceptions.APIError(
-                        message=f"HTTP {status}",
-                        status_code=status,
-                        error_description=body,
-                    )
+                    elif status >= 400:
+                        body = (await response.content).decode(
+                            "utf-8", errors="replace"
+                        )
+                        raise exceptions.APIError(
+                            message=f"HTTP {status}",
+                            status_code=status,
+                            error_description=body,
+                        )
 
-                else:
-                    # Determine whether the server supports byte-range requests
-                    # (needed to resume interrupted downloads).
-                    accept_ranges = response.headers.get("accept-ranges", "")
-                    if accept_ranges and accept_ranges.lower() != "none":
-                        supports_range_requests = True
-
-                    # When resuming (start_byte > 0), ensure the server actually
-                    # honored the Range request. If not, fall back to a full
-                    # download starting at byte 0 to avoid corrupting the file.
-                    if start_byte > 0:
-                        if status == 206:
-                            content_range = response.headers.get("Content-Range")
-                            # Expect "bytes <start_byte>-..." at the beginning.
-                            if not content_range:
-                                supports_range_requests = False
-                                start_byte = 0
-                            else:
-                                match = re.match(r"bytes\s+(\d+)-", content_range)
-                                if not match or int(match.group(1)) != start_byte:
+                    else:
+                        # Determine whether the server supports byte-range requests
+                        # (needed to resume interrupted downloads).
+                        accept_ranges = response.headers.get("accept-ranges", "")
+                        if accept_ranges and accept_ranges.lower() != "none":
+                            supports_range_requests = True
+
+                        # When resuming (start_byte > 0), ensure the server actually
+                        # honored the Range request. If not, fall back to a full
+                        # download starting at byte 0 to avoid corrupting the file.
+                        if start_byte > 0:
+                            if status == 206:
+                                content_range = response.headers.get("Content-Range")
+                                # Expect "bytes <start_byte>-..." at the beginning.
+                                if not content_range:
                                     supports_range_requests = False
                                     start_byte = 0
-                        elif status == 200:
-                            # Server ignored the Range header and is sending the
-                            # entire file. Treat this as a fresh download and
-                            # overwrite any existing partial file.
-                            supports_range_requests = False
-                            start_byte = 0
-
-                    # Prefer total-size from Content-Range over Content-Length
-                    # so that current_size always reflects the complete file size.
-                    content_range = response.headers.get("content-range")
-                    if content_range:
-                        total_str = content_range.split("/")[-1]
-                        if total_str.isdigit():
-                            current_size = int(total_str)
-                    elif current_size is None:
-                        cl = response.headers.get("content-length")
-                        if cl and cl.isdigit():
-                            current_size = int(cl)
-
-                    # Parse MD5 from Content-Digest (colons around value) or
-                    # x-goog-hash (no colons).
-                    content_digest = response.headers.get("content-digest")
-                    if content_digest:
-                        md5_match = md5_regexp.search(content_digest)
-                        current_md5 = (
-                            md5_match.group(1).strip().strip(":") if md5_match else None
-                        )
-                    else:
-                        md5_match = md5_regexp.search(
-                            response.headers.get("x-goog-hash", "")
-                        )
-                        current_md5 = md5_match.group(1).strip() if md5_match else None
-
-                    # Post-network check: we now have hash/size from headers.
-                    if not did_pre_check:
-                        did_pre_check = True
-                        if await loop.run_in_executor(
-                            None,
-                            check_filename,
-                            download_path,
-                            overwrite,
-                            retry_count,
-                            current_size,
-                            current_md5,
-                        ):
+                                else:
+                                    match = re.match(r"bytes\s+(\d+)-", content_range)
+                                    if not match or int(match.group(1)) != start_byte:
+                                        supports_range_requests = False
+                                        start_byte = 0
+                            elif status == 200:
+                                # Server ignored the Range header and is sending the
+                                # entire file. Treat this as a fresh download and
+                                # overwrite any existing partial file.
+                                supports_range_requests = False
+                                start_byte = 0
+
+                        # Prefer total-size from Content-Range over Content-Length
+                        # so that current_size always reflects the complete file size.
+                        content_range = response.headers.get("content-range")
+                        if content_range:
+                            total_str = content_range.split("/")[-1]
+                            if total_str.isdigit():
+                                current_size = int(total_str)
+                        elif current_size is None:
+                            cl = response.headers.get("content-length")
+                            if cl and cl.isdigit():
+                                current_size = int(cl)
+
+                        # Parse MD5 from Content-Digest (colons around value) or
+                        # x-goog-hash (no colons).
+                        content_digest = response.headers.get("content-digest")
+                        if content_digest:
+                            md5_match = md5_regexp.search(content_digest)
+                            current_md5 = (
+                                md5_match.group(1).strip().strip(":")
+                                if md5_match
+                                else None
+                            )
+                        else:
+                            md5_match = md5_regexp.search(
+                                response.headers.get("x-goog-hash", "")
+                            )
+                            current_md5 = (
+                                md5_match.group(1).strip() if md5_match else None
+                            )
+
+                        # Post-network check: we now have hash/size from headers.
+                        if not did_pre_check:
+                            did_pre_check = True
+                            if await loop.run_in_executor(
+                                None,
+                                check_filename,
+                                download_path,
+                                overwrite,
+                                retry_state.retry_count,
+                                current_size,
+                                current_md5,
+                            ):
+                                if on_progress:
+                                    on_progress(current_size, 1)
+                                span.set(skipped=True)
+                                return
+
+                        # Reset retries after a successful connection so that
+                        # mid-stream errors get a fresh set of retries.
+                        retry_state.reset()
+
+                        parent_dir = str(pathlib.Path(download_path).parent)
+                        if created_dirs is None or parent_dir not in created_dirs:
+                            pathlib.Path(parent_dir).mkdir(exist_ok=True, parents=True)
+                            if created_dirs is not None:
+                                created_dirs.add(parent_dir)
+
+                        if 0 < estimated_size <= _STREAM_THRESHOLD:
+                            # Small-file fast path: read the entire body in
+                            # one call and write to disk in a single write.
+                            body = await response.content
+                            if cancel_event and cancel_event.is_set():
+                                return
+                            with open(
+                                download_path,
+                                "wb" if start_byte == 0 else "ab",
+                            ) as f:
+                                f.write(body)
+                            span.add("bytes", len(body))
                             if on_progress:
-                                on_progress(current_size, 1)
-                            return
-
-                    # Reset retry counter after a successful connection so
-                    # that mid-stream errors get the same 10 fresh retries.
-                    retry_count = 0
-
-                    parent_dir = str(pathlib.Path(download_path).parent)
-                    if created_dirs is None or parent_dir not in created_dirs:
-                        pathlib.Path(parent_dir).mkdir(exist_ok=True, parents=True)
-                        if created_dirs is not None:
-                            created_dirs.add(parent_dir)
-
-                    if 0 < estimated_size <= _STREAM_THRESHOLD:
-                        # Small-file fast path: read the entire body in
-                        # one call and write to disk in a single write.
-                        body = await response.content
-                        if cancel_event and cancel_event.is_set():
-                            return
-                        with open(
-                            download_path,
-                            "wb" if start_byte == 0 else "ab",
-                        ) as f:
-                            f.write(body)
-                        if on_progress:
-                            on_progress(len(body), 1)
-                    else:
-                        pending_progress_bytes = 0
-                        last_updated_progress = time.time()
-
-                        with open(
-                            download_path,
-                            "wb" if start_byte == 0 else "ab",
-                        ) as f:
-                            try:
-                                async for chunk in await response.iter_content(
-                                    chunk_size=256 * 1024
-                                ):
-                                    if cancel_event and cancel_event.is_set():
+                                on_progress(len(body), 1)
+                        else:
+                            pending_progress_bytes = 0
+                            last_updated_progress = time.time()
+
+                            with open(
+                                download_path,
+                                "wb" if start_byte == 0 else "ab",
+                            ) as f:
+                                try:
+                                    async for chunk in await response.iter_content(
+                                        chunk_size=256 * 1024
+                                    ):
+                                        if cancel_event and cancel_event.is_set():
+                                            try:
+                                                os.remove(download_path)
+                                            except OSError:
+                                                pass
+                                            return
+                                        await loop.run_in_executor(None, f.write, chunk)
+                                        span.add("bytes", len(chunk))
+                                        if on_progress:
+                                            pending_progress_bytes += len(chunk)
+                                            if (
+                                                time.time() - last_updated_progress
+                                                >= 0.2
+                                            ):
+                                                on_progress(pending_progress_bytes)
+                                                pending_progress_bytes = 0
+                                                last_updated_progress = time.time()
+                                except Exception as e:
+                                    if not supports_range_requests:
                                         try:
                                             os.remove(download_path)
                                         except OSError:
                                             pass
-                                        return
-                                    await loop.run_in_executor(None, f.write, chunk)
-                                    if on_progress:
-                                        pending_progress_bytes += len(chunk)
-                                        if time.time() - last_updated_progress >= 0.2:
-                                            on_progress(pending_progress_bytes)
-                                            pending_progress_bytes = 0
-                                            last_updated_progress = time.time()
-                            except Exception as e:
-                                if not supports_range_requests:
-                                    try:
-                                        os.remove(download_path)
-                                    except OSError:
-                                        pass
-                                raise
-
-                        if on_progress:
-                            on_progress(pending_progress_bytes, 1)
-                    completed = True
-
-            except (niquests.exceptions.RequestException,) as e:
-                if retry_count < MAX_RETRIES:
+                                    raise
+
+                            if on_progress:
+                                on_progress(pending_progress_bytes, 1)
+                        completed = True
+
+                except (niquests.exceptions.RequestException, HTTPError) as e:
                     should_retry = True
-                else:
+                    retry_reason = "A network error occurred"
+                    retry_exception = e
+            finally:
+                if response is not None:
+                    await response.close()
+                await sem.release(estimated_size)
+
+            if completed:
+                return
+
+            if should_retry:
+                span.add("retry_count", 1)
+                if not await retry_state.sleep_async(retry_after):
                     raise exceptions.NetworkError(
                         message=(
-                            f"A network error occurred. Download failed after"
-                            f" {MAX_RETRIES} retries: {url}"
+                            f"{retry_reason}. Download failed after"
+                            f" {retry_state.retry_count} retries: {url}"
                         ),
-                        original_exception=e,
-                    ) from e
-        finally:
-            if response is not None:
-                await response.close()
-            await sem.release(estimated_size)
-
-        if completed:
-            return
-
-        if should_retry:
-            retry_count += 1
-            start_byte = (
-                os.path.getsize(download_path)
-                if supports_range_requests and os.path.exists(download_path)
-                else 0
-            )
+                        original_exception=retry_exception,
+                    ) from retry_exception
+                start_byte = (
+                    os.path.getsize(download_path)
+                    if supports_range_requests and os.path.exists(download_path)
+                    else 0
+                )
 
 
 def check_filename(filename, overwrite, retry_count, size, md5_hash):
@@ -1,13 +1,11 @@
 import re
 import math
-import time
-import requests
 import os
 import logging
-from tqdm.utils import CallbackIOWrapper
 
 from .auth import get_auth_token
-from ..common import exceptions
+from ..common import exceptions, instrumentation
+from .retry_policy import get_retry_policy, get_retry_after, is_retryable_status
 
 verify_ssl = (
     False
@@ -20,7 +18,10 @@ verify_ssl = (
 
 
 def perform_resumable_upload(data, size=None, temp_upload_url=None, progressbar=None):
-    retry_count = 0
+    import requests
+    from tqdm.utils import CallbackIOWrapper
+
+    retry_state = get_retry_policy().start()
     start_byte = 0
     is_file = True if hasattr(data, "read") else False
     file_size = size
@@ -53,38 +54,46 @@ def perform_resumable_upload(data, size=None, temp_upload_url=None, progressbar=
                 chunk = data
 
         try:
-            res = requests.put(
-                url=resumable_url,
-                verify=verify_ssl,
-                headers={
-                    **headers,
-                    **{
-                        "Content-Length": f"{end_byte - start_byte + 1}",
-                        "Content-Range": f"bytes {start_byte}-{end_byte}/{file_size}",
+            with instrumentation.span(
+                "redivis.upload_chunk",
+                start_byte=start_byte,
+                bytes=end_byte - start_byte + 1,
+                file_size=file_size,
+                retry_count=retry_state.retry_count,
+            ) as span:
+                res = requests.put(
+                    url=resumable_url,
+                    verify=verify_ssl,
+                    headers={
+                        **headers,
+                        **{
+                            "Content-Length": f"{end_byte - start_byte + 1}",
+                            "Content-Range": f"bytes {start_byte}-{end_byte}/{file_size}",
+                        },
                     },
-                },
-                data=chunk,
-            )
-            res.raise_for_status()
+                    data=chunk,
+                )
+                span.set(status_code=res.status_code)
+                res.raise_for_status()
 
             start_byte += chunk_size
-            retry_count = 0  # reset retry_count after a successfully uploaded chunk
+            retry_state.reset()  # reset retries after a successfully uploaded chunk
         except requests.RequestException as e:
-            if retry_count > 10:
+            if not retry_state.sleep(get_retry_after(e.response)):
                 raise exceptions.NetworkError(
-                    message=f"A network error occurred. Upload failed after {retry_count} retries.",
+                    message=f"A network error occurred. Upload failed after {retry_state.retry_count} retries.",
                     original_exception=e,
                 ) from e
 
-            retry_count += 1
-            time.sleep(retry_count)
             print("A network error occurred. Retrying last chunk of resumable upload.")
             start_byte = retry_partial_upload(
                 file_size=file_size, resumable_url=resumable_url, headers=headers
             )
 
 
-def initiate_resumable_upload(size, temp_upload_url, headers, retry_count=0):
+def initiate_resumable_upload(size, temp_upload_url, headers, retry_state=None):
+    import requests
+
     did_request_complete = False
     try:
         res = requests.post(
@@ -103,21 +112,24 @@ def initiate_resumable_upload(size, temp_upload_url, headers, retry_count=0):
         return res.headers["location"]
 
     except requests.RequestException as e:
-        if did_request_complete:
+        if did_request_complete and not is_retryable_status(res.status_code):
             raise exceptions.NetworkError(original_exception=e)
         else:
-            if retry_count > 10:
+            if retry_state is None:
+                retry_state = get_retry_policy().start()
+            if not retry_state.sleep(get_retry_after(e.response)):
                 raise exceptions.NetworkError(
-                    message=f"A network error occurred. Upload failed after {retry_count} retries.",
+                    message=f"A network error occurred. Upload failed after {retry_state.retry_count} retries.",
                     original_exception=e,
                 ) from e
-            time.sleep(retry_count + 1)
-            initiate_resumable_upload(
-                size, temp_upload_url, headers, retry_count=retry_count + 1
+            return initiate_resumable_upload(
+                size, temp_upload_url, headers, retry_state=retry_state
             )
 
 
-def retry_partial_upload(*, retry_count=0, file_size, resumable_url, headers):
+def retry_partial_upload(*, retry_state=None, file_size, resumable_url, headers):
+    import requests
+
     logging.debug("Attempting to resume upload")
 
     try:
@@ -155,12 +167,13 @@ def retry_partial_upload(*, retry_count=0, file_size, resumable_url, headers):
                 "An unknown error occurred. Please try again."
             )
     except requests.RequestException as e:
-        if retry_count > 10:
+        if retry_state is None:
+            retry_state = get_retry_policy().start()
+        if not retry_state.sleep(get_retry_after(e.response)):
             raise exceptions.NetworkError(original_exception=e) from e
 
-        time.sleep(retry_count + 1)
         return retry_partial_upload(
-            retry_count=retry_count + 1,
+            retry_state=retry_state,
             file_size=file_size,
             resumable_url=resumable_url,
             headers=headers,
@@ -168,28 +181,37 @@ def retry_partial_upload(*, retry_count=0, file_size, resumable_url, headers):
 
 
 def perform_standard_upload(
-    data, temp_upload_url=None, retry_count=0, progressbar=None
+    data, temp_upload_url=None, retry_state=None, progressbar=None
 ):
+    import requests
+    from tqdm.utils import CallbackIOWrapper
+
     try:
         if progressbar:
             data = CallbackIOWrapper(progressbar.update, data, "read")
 
         headers = {"Authorization": f"Bearer {get_auth_token()}"}
 
-        res = requests.put(
-            url=temp_upload_url, data=data, headers=headers, verify=verify_ssl
-        )
-        res.raise_for_status()
+        with instrumentation.span(
+            "redivis.upload",
+            retry_count=retry_state.retry_count if retry_state is not None else 0,
+        ) as span:
+            res = requests.put(
+                url=temp_upload_url, data=data, headers=headers, verify=verify_ssl
+            )
+            span.set(status_code=res.status_code)
+            res.raise_for_status()
     except requests.RequestException as e:
-        if retry_count > 10:
+        if retry_state is None:
+            retry_state = get_retry_policy().start()
+        if not retry_state.sleep(get_retry_after(e.response)):
             raise exceptions.NetworkError(
-                message=f"A network error occurred. Upload failed after {retry_count} retries.",
+                message=f"A network error occurred. Upload failed after {retry_state.retry_count} retries.",
                 original_exception=e,
             ) from e
-        time.sleep(retry_count + 1)
         return perform_standard_upload(
             data=data,
             temp_upload_url=temp_upload_url,
-            retry_count=retry_count + 1,
+            retry_state=retry_state,
             progressbar=progressbar,
         )
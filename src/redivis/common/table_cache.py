@@ -0,0 +1,252 @@
+import os
+import time
+import hashlib
+import pathlib
+import shutil
+import uuid
+import weakref
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where entries aren't pinned
+    fcntl = None
+
+# On-disk cache for reads of immutable tables, i.e. tables in a specific dataset version (e.g. "v1_2").
+# Entries are keyed by the table's qualified reference (which includes the version), the selected variables,
+# the filter, max_results, and a hash of the auth token, since users with different access to a table (e.g. to
+# its sample only) may read different rows. A hit is served from local disk without any network requests.
+# Each entry is a directory of Arrow IPC (feather) files, which are memory-mapped when read. Entries for datasets and
+# lazyframes reuse the read's files, so they're compressed if REDIVIS_SPILL_COMPRESSION is set.
+#
+# Entries are written to a temporary directory and atomically renamed into place, and readers treat a
+# missing entry as a miss, so several processes can safely share the same cache directory.
+# Once the cache grows beyond its size limit, the least recently used entries are evicted.
+# Datasets and lazyframes read their files lazily, so reading one pins its entry with a shared lock, which is held
+# until the returned dataset or lazyframe is garbage collected; eviction skips entries that are pinned by any process.
+#
+# Configuration (environment variables, or configure()):
+#   REDIVIS_TABLE_CACHE_DIR           enables the cache, storing entries in this directory
+#   REDIVIS_TABLE_CACHE_SIZE          max size of the cache in bytes (default 10GiB)
+
+config = {
+    "directory": os.getenv("REDIVIS_TABLE_CACHE_DIR"),
+    "max_bytes": int(os.getenv("REDIVIS_TABLE_CACHE_SIZE", 10 * 1024**3)),
+}
+
+STALE_TEMP_SECONDS = 24 * 60 * 60
+LOCK_FILE_NAME = ".lock"
+
+
+def configure(*, directory=None, max_bytes=None):
+    if directory is not None:
+        config["directory"] = str(directory)
+    if max_bytes is not None:
+        config["max_bytes"] = max_bytes
+
+
+def is_enabled():
+    return bool(config["directory"])
+
+
+def clear():
+    if config["directory"]:
+        shutil.rmtree(config["directory"], ignore_errors=True)
+
+
+def get_key(
+    *,
+    qualified_reference,
+    variables=None,
+    filter_expression=None,
+    max_results=None,
+    auth_token=None,
+):
+    variables_key = (
+        ",".join(variable.lower() for variable in variables)
+        if variables is not None
+        else "*"
+    )
+    filter_key = str(filter_expression) if filter_expression is not None else ""
+    auth_key = hashlib.sha256((auth_token or "").encode("utf-8")).hexdigest()[:32]
+    return "|".join(
+        [qualified_reference, variables_key, filter_key, str(max_results), auth_key]
+    )
+
+
+def get(key):
+    """Returns the path to the entry's directory, or None on a miss."""
+    if not is_enabled():
+        return None
+
+    entry_path = _get_entry_path(key)
+    try:
+        # Update the mtime, which is used to determine the least recently used entries
+        os.utime(entry_path)
+    except OSError:
+        return None
+    return entry_path
+
+
+def put_table(key, arrow_table):
+    """Writes an in-memory pyarrow.Table to the cache and returns the entry's path, or None if caching failed."""
+    import pyarrow
+
+    def write(temp_path):
+        with pyarrow.OSFile(str(temp_path / "part-0.feather"), mode="wb") as sink:
+            with pyarrow.ipc.new_file(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table)
+
+    return _put(key, write)
+
+
+def put_folder(key, folder_path):
+    """Adds a folder of feather files to the cache and returns the entry's path, or None if caching failed.
+    The folder is left in place, so the caller can still fall back to it."""
+
+    def write(temp_path):
+        for file_path in pathlib.Path(folder_path).iterdir():
+            try:
+                # Hard links avoid copying the data when the cache is on the same filesystem
+                os.link(file_path, temp_path / file_path.name)
+            except OSError:
+                shutil.copyfile(file_path, temp_path / file_path.name)
+
+    return _put(key, write)
+
+
+def read(entry_path, output_type):
+    """Raises an OSError if the entry was concurrently evicted."""
+    lock_fd = _lock(entry_path, shared=True)
+    try:
+        files = sorted(str(p) for p in pathlib.Path(entry_path).glob("*.feather"))
+        if not files:
+            raise FileNotFoundError(f"No files in table cache entry {entry_path}")
+
+        if output_type == "polars_lazyframe":
+            import polars
+
+            result = polars.scan_ipc(files, memory_map=True)
+        elif output_type == "arrow_dataset":
+            import pyarrow.dataset as pyarrow_dataset
+            import pyarrow.fs
+
+            result = pyarrow_dataset.dataset(
+                files,
+                format="feather",
+                filesystem=pyarrow.fs.LocalFileSystem(use_mmap=True),
+            )
+        else:
+            import pyarrow
+
+            # Memory-map the files, so the table's buffers are backed by the page cache rather than copied.
+            # The mappings stay valid if the files are then removed, so the entry doesn't need to stay pinned.
+            result = pyarrow.concat_tables(
+                [pyarrow.ipc.open_file(pyarrow.memory_map(f)).read_all() for f in files]
+            )
+            _unlock(lock_fd)
+            return result
+    except BaseException:
+        _unlock(lock_fd)
+        raise
+
+    # The result reads the files later, so the entry stays pinned until it's garbage collected
+    if lock_fd is not None:
+        weakref.finalize(result, _unlock, lock_fd)
+    return result
+
+
+def evict():
+    if not is_enabled():
+        return
+
+    entries = []
+    total_bytes = 0
+    for entry_path in pathlib.Path(config["directory"]).glob("*"):
+        if entry_path.name.endswith(".tmp"):
+            try:
+                if time.time() - entry_path.stat().st_mtime > STALE_TEMP_SECONDS:
+                    # Left behind by a process that exited while writing an entry
+                    shutil.rmtree(entry_path, ignore_errors=True)
+            except OSError:
+                pass
+            continue
+        if not entry_path.is_dir():
+            continue
+        try:
+            size = sum(f.stat().st_size for f in entry_path.iterdir())
+            entries.append((entry_path.stat().st_mtime, size, entry_path))
+        except OSError:
+            # Concurrently removed by another process
+            continue
+        total_bytes += size
+
+    for _, size, entry_path in sorted(entries):
+        if total_bytes <= config["max_bytes"]:
+            break
+        try:
+            lock_fd = _lock(entry_path, shared=False)
+        except OSError:
+            # Pinned by a reader, or concurrently removed
+            continue
+        try:
+            shutil.rmtree(entry_path, ignore_errors=True)
+        finally:
+            _unlock(lock_fd)
+        total_bytes -= size
+
+
+def _put(key, write):
+    if not is_enabled():
+        return None
+
+    entry_path = _get_entry_path(key)
+    temp_path = entry_path.with_name(f"{entry_path.name}.{uuid.uuid4()}.tmp")
+    try:
+        temp_path.mkdir(parents=True)
+        write(temp_path)
+        try:
+            os.rename(temp_path, entry_path)
+        except OSError:
+            # Another process already cached this entry, which is identical since the table is immutable
+            shutil.rmtree(temp_path, ignore_errors=True)
+            os.utime(entry_path)
+    except OSError:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        return None
+
+    evict()
+    return entry_path if entry_path.exists() else None
+
+
+def _lock(entry_path, *, shared):
+    # Returns the file descriptor of the entry's lock, or raises an OSError if it's locked by another reader
+    # (or, for a shared lock, being evicted) or the entry was removed
+    if fcntl is None:
+        return None
+
+    lock_path = pathlib.Path(entry_path) / LOCK_FILE_NAME
+    lock_fd = os.open(lock_path, os.O_RDONLY | os.O_CREAT)
+    try:
+        fcntl.flock(
+            lock_fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB
+        )
+        # The entry may have been evicted (and written again) between opening and locking its lock file
+        if os.fstat(lock_fd).st_ino != os.stat(lock_path).st_ino:
+            raise FileNotFoundError(f"Table cache entry {entry_path} was evicted")
+    except BaseException:
+        os.close(lock_fd)
+        raise
+    return lock_fd
+
+
+def _unlock(lock_fd):
+    if lock_fd is not None:
+        os.close(lock_fd)
+
+
+def _get_entry_path(key):
+    return (
+        pathlib.Path(config["directory"])
+        / hashlib.sha256(key.encode("utf-8")).hexdigest()
+    )
@@ -44,6 +44,30 @@ def get_tempdir():
 
     return created_temp_dir
 
+
+def get_available_memory():
+    # Physical memory, capped by the cgroup limit when running in a container. Returns None if unknown.
+    limits = []
+    try:
+        limits.append(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"))
+    except (ValueError, OSError, AttributeError):
+        pass
+
+    for cgroup_limit_path in (
+        "/sys/fs/cgroup/memory.max",  # cgroup v2
+        "/sys/fs/cgroup/memory/memory.limit_in_bytes",  # cgroup v1
+    ):
+        try:
+            with open(cgroup_limit_path) as f:
+                value = f.read().strip()
+            if value.isdigit():
+                limits.append(int(value))
+        except OSError:
+            pass
+
+    return min(limits) if limits else None
+
+
 def get_parquet_rows_per_group(data):
     import pandas as pd
     import pyarrow as pa
@@ -207,7 +231,9 @@ def convert_data_to_parquet(data):
 
 
 def raise_api_error(response_json=None, response_text=None, response=None):
-    status_code = response.status_code if response else response_json.get("status")
+    status_code = (
+        response.status_code if response is not None else response_json.get("status")
+    )
     error = response_json.get("error") if response_json else "api_error"
     description = (
         response_json.get("error_description") if response_json else response_text
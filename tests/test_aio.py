@@ -0,0 +1,114 @@
+import asyncio
+import redivis
+import util
+
+
+def test_aio_table_get():
+    util.populate_test_data()
+    table = util.get_table()
+
+    async def main():
+        aio_table = redivis.aio.table(table.qualified_reference)
+        assert await aio_table.exists()
+        await aio_table.get()
+        variables = await aio_table.list_variables()
+        print(aio_table, aio_table.properties["numRows"], variables)
+
+    asyncio.run(main())
+
+
+def test_aio_concurrent_queries():
+    async def main():
+        queries = [redivis.aio.query(f"SELECT {i} AS val") for i in range(5)]
+        await asyncio.gather(*[query.wait_for_finish() for query in queries])
+        for query in queries:
+            print(query.to_sync().to_pandas_dataframe())
+
+    asyncio.run(main())
+
+
+def test_ipc_stream_decoder():
+    import io
+    import pyarrow
+    from redivis.common.fetch_rows_async import IpcStreamDecoder, TruncatedStreamError
+
+    # Dictionary-encoded columns are sent as dictionary batches before the record batches that use them
+    arrow_table = pyarrow.table(
+        {
+            "id": pyarrow.array(range(5000), pyarrow.int64()),
+            "state": pyarrow.array(
+                [f"s{i % 7}" for i in range(5000)]
+            ).dictionary_encode(),
+        }
+    )
+    sink = io.BytesIO()
+    with pyarrow.ipc.new_stream(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table, max_chunksize=300)
+    body = sink.getvalue()
+
+    # Messages are split across chunks at every kind of boundary
+    for chunk_size in [1, 7, 100, 4096, len(body)]:
+        decoder = IpcStreamDecoder()
+        batches = []
+        for i in range(0, len(body), chunk_size):
+            batches.extend(decoder.feed(body[i : i + chunk_size]))
+        decoder.close()
+        assert decoder.is_finished
+        assert pyarrow.Table.from_batches(batches).equals(arrow_table)
+
+    decoder = IpcStreamDecoder()
+    decoder.feed(body[: len(body) // 2])
+    try:
+        decoder.close()
+        assert False, "Expected a TruncatedStreamError"
+    except TruncatedStreamError:
+        pass
+
+
+def test_break_cancels_read(monkeypatch):
+    import io
+    import pyarrow
+    from redivis.common import fetch_rows_async
+
+    arrow_table = pyarrow.table({"id": pyarrow.array(range(10_000), pyarrow.int64())})
+    sink = io.BytesIO()
+    with pyarrow.ipc.new_stream(sink, arrow_table.schema) as writer:
+        writer.write_table(arrow_table, max_chunksize=100)
+    body = sink.getvalue()
+
+    class Response:
+        async def iter_content(self, chunk_size):
+            async def iter_chunks():
+                for i in range(0, len(body), 1000):
+                    await asyncio.sleep(0)
+                    yield body[i : i + 1000]
+
+            return iter_chunks()
+
+        async def close(self):
+            pass
+
+    async def make_request_async(method, path, **kwargs):
+        if path.endswith("/readSessions"):
+            return {"streams": [{"id": f"s{i}"} for i in range(4)]}
+        return Response()
+
+    monkeypatch.setattr(fetch_rows_async, "make_request_async", make_request_async)
+    monkeypatch.setattr(
+        "redivis.common.TabularReader.get_mapped_variables",
+        lambda reader, variables: ([{"name": "id", "type": "integer"}], None, False),
+    )
+
+    async def main():
+        batches = fetch_rows_async.AsyncArrowIterator(
+            redivis.table("test.test.test"), max_parallelization=2
+        )
+        async for batch in batches:
+            break
+        # The loop's generator is closed once it's dropped, which cancels the streams' tasks
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert len(batches.tasks) == 4
+        assert all(task.done() for task in batches.tasks)
+
+    asyncio.run(main())
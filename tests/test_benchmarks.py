@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import redivis
+import util
+from redivis.common import metadata_cache
+from redivis.common.api_request import make_request, close_session
+
+
+def test_request_latency():
+    util.populate_test_data()
+    table = util.get_table()
+    call_count = 50
+
+    # Before: a fresh connection (TCP + TLS handshake) for every call
+    started_at = time.perf_counter()
+    for _ in range(call_count):
+        close_session()
+        make_request(method="GET", path=table.uri)
+    unpooled_latency = (time.perf_counter() - started_at) / call_count
+
+    # After: connections are kept alive and reused by the pooled session
+    make_request(method="GET", path=table.uri)
+    started_at = time.perf_counter()
+    for _ in range(call_count):
+        make_request(method="GET", path=table.uri)
+    pooled_latency = (time.perf_counter() - started_at) / call_count
+
+    print(
+        f"Per-call latency: {unpooled_latency * 1000:.1f}ms unpooled, {pooled_latency * 1000:.1f}ms pooled"
+    )
+
+
+def test_metadata_cache_latency():
+    util.populate_test_data()
+    table = util.get_table()
+    call_count = 50
+
+    metadata_cache.configure(enabled=False)
+    started_at = time.perf_counter()
+    for _ in range(call_count):
+        table.get()
+    uncached_latency = (time.perf_counter() - started_at) / call_count
+
+    # Revalidated lookups only transfer a 304 when the table hasn't changed
+    metadata_cache.configure(enabled=True, ttl=0)
+    table.get()
+    started_at = time.perf_counter()
+    for _ in range(call_count):
+        table.get()
+    revalidated_latency = (time.perf_counter() - started_at) / call_count
+
+    metadata_cache.configure(ttl=60)
+    started_at = time.perf_counter()
+    for _ in range(call_count):
+        table.get()
+    cached_latency = (time.perf_counter() - started_at) / call_count
+    metadata_cache.configure(ttl=0)
+
+    print(
+        f"Table.get() latency: {uncached_latency * 1000:.1f}ms uncached, {revalidated_latency * 1000:.1f}ms revalidated, {cached_latency * 1000:.1f}ms cached"
+    )
+
+
+def test_import_time():
+    # Cold import in a fresh interpreter. Heavy dependencies should only be loaded once they're used.
+    budget = float(os.getenv("REDIVIS_IMPORT_TIME_BUDGET", 0.15))
+    heavy_modules = ["niquests", "requests", "tqdm", "pyarrow", "fsspec", "IPython"]
+    script = (
+        "import sys, json, time; started_at = time.perf_counter(); import redivis; "
+        "print(json.dumps([time.perf_counter() - started_at, "
+        f"[m for m in {heavy_modules!r} if m in sys.modules]]))"
+    )
+    import_times = []
+    for _ in range(5):
+        output = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, check=True, text=True
+        ).stdout
+        import_time, loaded_modules = json.loads(output.strip().splitlines()[-1])
+        assert not loaded_modules, f"import redivis loaded {loaded_modules}"
+        import_times.append(import_time)
+
+    print(f"import redivis: {min(import_times) * 1000:.1f}ms (budget {budget * 1000}ms)")
+    assert min(import_times) < budget
+
+
+def test_json_codec_throughput():
+    from redivis.common import json_codec
+
+    # Roughly the shape of a page of variables for a wide table
+    page = {
+        "results": [
+            {
+                "name": f"variable_{i}",
+                "type": "string",
+                "label": f"A label for variable {i}" * 4,
+                "valueLabels": [
+                    {"value": str(j), "label": f"Value {j}"} for j in range(20)
+                ],
+            }
+            for i in range(1000)
+        ],
+        "nextPageToken": "abc",
+    }
+    body = json_codec.dumps(page)
+    assert json_codec.loads(body) == page
+
+    call_count = 20
+    started_at = time.perf_counter()
+    for _ in range(call_count):
+        json.loads(json.dumps(page).encode("utf-8").decode("utf-8"))
+    stdlib_time = (time.perf_counter() - started_at) / call_count
+
+    started_at = time.perf_counter()
+    for _ in range(call_count):
+        json_codec.loads(json_codec.dumps(page))
+    codec_time = (time.perf_counter() - started_at) / call_count
+
+    print(
+        f"Round trip of {len(body) / 1e6:.1f}MB page: {stdlib_time * 1000:.1f}ms json, {codec_time * 1000:.1f}ms {json_codec.get_backend()}"
+    )
+
+
+def test_column_plan_wide_schema():
+    import pyarrow
+    from redivis.common.fetch_rows import ColumnPlanner
+
+    # A synthetic 8,000 column survey table, where the stream's columns are reversed relative to the
+    # variables, some are integers that need to be cast, and a few variables are missing from the stream
+    column_count = 8000
+    mapped_variables = [
+        {"name": f"Q{i}", "type": "integer" if i % 4 == 0 else "string"}
+        for i in range(column_count)
+    ]
+    reader_schema = pyarrow.schema(
+        [
+            pyarrow.field(
+                f"q{i}", pyarrow.int32() if i % 4 == 0 else pyarrow.string()
+            )
+            for i in reversed(range(column_count))
+            if i % 100 != 0
+        ]
+    )
+    batch = pyarrow.RecordBatch.from_arrays(
+        [pyarrow.nulls(1000, type=field.type) for field in reader_schema],
+        schema=reader_schema,
+    )
+
+    started_at = time.perf_counter()
+    planner = ColumnPlanner(mapped_variables, coerce_schema=True)
+    plan = planner.get_plan(reader_schema)
+    plan_time = time.perf_counter() - started_at
+
+    # Every other stream of the read reuses the plan
+    assert planner.get_plan(reader_schema) is plan
+
+    batch_count = 20
+    started_at = time.perf_counter()
+    for _ in range(batch_count):
+        output_batch = plan.apply(batch)
+    apply_time = (time.perf_counter() - started_at) / batch_count
+
+    assert output_batch.schema.names == [v["name"] for v in mapped_variables]
+    assert output_batch.schema.field("Q4").type == pyarrow.int64()
+    print(
+        f"{column_count} columns: {plan_time * 1000:.1f}ms to build the plan, {apply_time * 1000:.1f}ms per batch"
+    )
+
+
+
+def test_coercion_mixed_types(monkeypatch):
+    import pyarrow
+    import pyarrow.compute
+    from redivis.common import fetch_rows
+
+    # Batches from a dataset table whose stream types don't match its variables: integers stored as int32,
+    # floats as strings, and dates and times as strings, which is the slowest case
+    batch_size = 100_000
+    mapped_variables = [
+        {"name": "id", "type": "integer"},
+        {"name": "amount", "type": "float"},
+        {"name": "day", "type": "date"},
+        {"name": "at", "type": "time"},
+        {"name": "name", "type": "string"},
+    ]
+    batch = pyarrow.RecordBatch.from_pydict(
+        {
+            "id": pyarrow.array(range(batch_size), type=pyarrow.int32()),
+            "amount": [f"{i / 100}" for i in range(batch_size)],
+            "day": [f"2020-01-{i % 28 + 1:02d}" for i in range(batch_size)],
+            "at": [
+                f"{i % 24:02d}:{i % 60:02d}:{i % 60:02d}.{i % 1000000:06d}"
+                for i in range(batch_size)
+            ],
+            "name": [f"name_{i}" for i in range(batch_size)],
+        }
+    )
+    batches = [batch] * 20
+    plan = fetch_rows.ColumnPlanner(mapped_variables, coerce_schema=True).get_plan(
+        batch.schema
+    )
+
+    # Before: times are parsed as timestamps on an arbitrary date
+    def parse_as_timestamps(pyarrow_array):
+        return pyarrow.compute.cast(
+            pyarrow.compute.cast(
+                pyarrow.compute.utf8_replace_slice(
+                    pyarrow_array, start=0, stop=0, replacement="2020-01-01T"
+                ),
+                pyarrow.timestamp("us"),
+            ),
+            pyarrow.time64("us"),
+        )
+
+    with monkeypatch.context() as m:
+        m.setattr(fetch_rows, "parse_time_strings", lambda pyarrow_array: None)
+        started_at = time.perf_counter()
+        expected = [plan.apply(b) for b in batches]
+        timestamp_time = time.perf_counter() - started_at
+
+    # After: times are parsed directly from the strings' characters
+    started_at = time.perf_counter()
+    output = [plan.apply(b) for b in batches]
+    direct_time = time.perf_counter() - started_at
+
+    assert output == expected
+    assert output[0].column("at").type == pyarrow.time64("us")
+
+    # The time column alone
+    time_columns = [b.column("at") for b in batches]
+    started_at = time.perf_counter()
+    expected_times = [parse_as_timestamps(c) for c in time_columns]
+    timestamp_column_time = time.perf_counter() - started_at
+    started_at = time.perf_counter()
+    times = [fetch_rows.parse_time_strings(c) for c in time_columns]
+    direct_column_time = time.perf_counter() - started_at
+
+    assert times == expected_times
+    assert direct_column_time < timestamp_column_time
+    print(
+        f"Coercing {len(batches) * batch_size} rows: {timestamp_time * 1000:.1f}ms parsing times as timestamps, "
+        f"{direct_time * 1000:.1f}ms parsing them directly. The time column alone: "
+        f"{timestamp_column_time * 1000:.1f}ms as timestamps, {direct_column_time * 1000:.1f}ms directly"
+    )
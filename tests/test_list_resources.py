@@ -9,4 +9,10 @@ def test_organization_list_datasets():
 def test_user_list_datasets():
     datasets = redivis.user("imathews").list_datasets()
     print(datasets)
-    assert True
\ No newline at end of file
+    assert True
+
+
+def test_organization_iter_datasets():
+    for dataset in redivis.organization("Demo").iter_datasets(max_results=250):
+        print(dataset)
+    assert True
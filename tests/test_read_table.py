@@ -96,6 +96,67 @@ def test_to_arrow_batch_iterator():
     assert row_count == 1e6  # table.properties.get("numRows")
 
 
+def test_to_arrow_batch_iterator_unordered():
+    table = redivis.table("demo.ghcn_daily_weather_data.daily_observations")
+    row_count = 0
+    for batch in table.to_arrow_batch_iterator(
+        1e6, max_parallelization=8, ordered=False
+    ):
+        row_count += batch.num_rows
+
+    assert row_count == 1e6
+
+
+def test_abandoned_batch_iterator(monkeypatch):
+    import gc
+    import io
+    import pyarrow
+    from redivis.common import fetch_rows
+
+    arrow_table = pyarrow.table({"id": pyarrow.array(range(10_000), pyarrow.int64())})
+
+    def make_request(method, path, **kwargs):
+        if path.endswith("/readSessions"):
+            return {
+                "numRows": arrow_table.num_rows * 4,
+                "streams": [{"id": f"s{i}"} for i in range(4)],
+            }
+        sink = io.BytesIO()
+        with pyarrow.ipc.new_stream(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table, max_chunksize=100)
+        response = io.BytesIO(sink.getvalue())
+        response.raw = response
+        return response
+
+    monkeypatch.setattr(fetch_rows, "make_request", make_request)
+
+    def read_batches(batches, count):
+        for i, batch in enumerate(batches):
+            if i == count:
+                break
+        return batches.workers.executor._threads
+
+    def get_batch_iterator():
+        return fetch_rows.make_rows_request(
+            uri="/tables/test",
+            output_type="arrow_iterator",
+            mapped_variables=[{"name": "id", "type": "integer"}],
+            progress=False,
+            max_parallelization=4,
+        )
+
+    # The workers are stopped once an abandoned iterator is garbage collected, or when the with block exits
+    threads = read_batches(get_batch_iterator(), 3)
+    gc.collect()
+    with get_batch_iterator() as batches:
+        threads |= read_batches(batches, 3)
+
+    for thread in threads:
+        thread.join(timeout=5)
+    assert len(threads) == 8
+    assert not any(thread.is_alive() for thread in threads)
+
+
 def test_selected_variables():
     util.populate_test_data()
     table = util.get_table()
@@ -109,3 +170,471 @@ def test_geo_dataframe():
     df = table.to_dataframe(max_results=100)
     print(df.dtypes)
     print(df)
+
+
+def test_instrumentation(tmp_path):
+    import json
+    from redivis.common import instrumentation
+
+    util.populate_test_data()
+    table = util.get_table()
+    exporter = instrumentation.add_hook(
+        instrumentation.JSONLExporter(tmp_path / "trace.jsonl")
+    )
+    try:
+        arrow_table = table.to_arrow_table(max_parallelization=4)
+    finally:
+        instrumentation.remove_hook(exporter)
+        exporter.close()
+
+    with open(tmp_path / "trace.jsonl") as f:
+        events = [json.loads(line) for line in f]
+    stream_spans = [
+        e
+        for e in events
+        if e["event"] == "span_end" and e["name"] == "redivis.read_stream"
+    ]
+    assert stream_spans
+    assert (
+        sum(e["attributes"].get("rows", 0) for e in stream_spans)
+        == arrow_table.num_rows
+    )
+    print(stream_spans)
+
+
+def test_read_with_memory_budget(monkeypatch):
+    util.populate_test_data()
+    table = util.get_table()
+    in_memory_table = table.to_arrow_table(max_parallelization=4)
+
+    # With a tiny budget, every stream spills to disk
+    monkeypatch.setenv("REDIVIS_READ_MEMORY_BUDGET", "1")
+    spilled_table = table.to_arrow_table(max_parallelization=4)
+    assert spilled_table.num_rows == in_memory_table.num_rows
+    assert spilled_table.schema == in_memory_table.schema
+
+
+def test_read_with_filter():
+    import pyarrow.compute
+
+    util.populate_test_data()
+    table = util.get_table()
+    arrow_table = table.to_arrow_table()
+    expected_rows = arrow_table.filter(pyarrow.compute.field("id") > 100).num_rows
+
+    filtered_table = table.to_arrow_table(filter=pyarrow.compute.field("id") > 100)
+    assert filtered_table.num_rows == expected_rows
+    assert filtered_table.schema == arrow_table.schema
+
+    row_count = 0
+    for batch in table.to_arrow_batch_iterator(filter=[("id", ">", 100)]):
+        row_count += batch.num_rows
+    assert row_count == expected_rows
+
+
+def test_table_cache(tmp_path):
+    from redivis.common import table_cache
+
+    table_cache.configure(directory=tmp_path)
+    try:
+        version = redivis.dataset("demo.ghcn_daily_weather_data").list_versions(
+            max_results=1
+        )[0]
+        table = redivis.dataset(
+            "demo.ghcn_daily_weather_data", version=version.tag
+        ).table("daily_observations")
+
+        arrow_table = table.to_arrow_table(max_results=1000)
+        assert len(list(tmp_path.iterdir())) == 1
+
+        # Served from disk, and shared across output types
+        assert table.to_arrow_table(max_results=1000).equals(arrow_table)
+        assert table.to_arrow_dataset(max_results=1000).count_rows() == 1000
+        assert len(list(tmp_path.iterdir())) == 1
+    finally:
+        table_cache.configure(directory="")
+
+
+def test_table_cache_eviction(tmp_path):
+    import gc
+    import pyarrow
+    from redivis.common import table_cache
+
+    # Users with different access to a table don't share entries
+    assert table_cache.get_key(
+        qualified_reference="a.b:v1_0.c", auth_token="sample"
+    ) != table_cache.get_key(qualified_reference="a.b:v1_0.c", auth_token="full")
+
+    arrow_table = pyarrow.table({"id": pyarrow.array(range(10_000), pyarrow.int64())})
+    table_cache.configure(directory=tmp_path)
+    try:
+        dataset = table_cache.read(
+            table_cache.put_table("a", arrow_table), "arrow_dataset"
+        )
+        cached_table = table_cache.read(
+            table_cache.put_table("b", arrow_table), "arrow_table"
+        )
+
+        # The dataset reads its files lazily, so its entry is pinned and isn't evicted. The table was read
+        # into memory, so its entry can be.
+        table_cache.configure(max_bytes=1)
+        table_cache.evict()
+        assert table_cache.get("a") is not None
+        assert table_cache.get("b") is None
+        assert dataset.to_table().equals(arrow_table)
+        assert cached_table.equals(arrow_table)
+
+        # The pin is released once the dataset is garbage collected
+        del dataset
+        gc.collect()
+        table_cache.evict()
+        assert table_cache.get("a") is None
+    finally:
+        table_cache.configure(directory="", max_bytes=10 * 1024**3)
+
+
+def test_read_with_spill_compression(monkeypatch):
+    util.populate_test_data()
+    table = util.get_table()
+    in_memory_table = table.to_arrow_table(max_parallelization=4)
+
+    monkeypatch.setenv("REDIVIS_READ_MEMORY_BUDGET", "1")
+    for compression in ["lz4", "zstd"]:
+        monkeypatch.setenv("REDIVIS_SPILL_COMPRESSION", compression)
+        spilled_table = table.to_arrow_table(max_parallelization=4)
+        # Row order can differ between in-memory and spilled streams
+        assert spilled_table.num_rows == in_memory_table.num_rows
+        assert spilled_table.schema == in_memory_table.schema
+        assert table.to_arrow_dataset().to_table().num_rows == in_memory_table.num_rows
+
+
+def test_to_dask_dataframe():
+    util.populate_test_data()
+    table = util.get_table()
+    arrow_table = table.to_arrow_table()
+
+    # One lazy partition per read stream; nothing is fetched until it's computed
+    ddf = table.to_dask_dataframe(max_parallelization=4)
+    assert list(ddf.columns) == arrow_table.schema.names
+    assert len(ddf.compute()) == arrow_table.num_rows
+
+
+def test_polars_lazyframe_pushdown():
+    import polars
+
+    util.populate_test_data()
+    table = util.get_table()
+    lf = table.to_polars_lazyframe()
+
+    # Only the projected variables and the first rows are read when the query is collected
+    df = lf.select("id").head(5).collect()
+    assert df.shape == (5, 1)
+
+    df = lf.filter(polars.col("id") > 100).select("id").collect()
+    assert (df["id"] > 100).all()
+
+
+def test_to_arrow_dataset_resume(tmp_path):
+    util.populate_test_data()
+    table = util.get_table()
+    path = tmp_path / "dataset"
+
+    num_rows = table.to_arrow_dataset(path=path).count_rows()
+    assert (path / "_redivis_read.json").exists()
+
+    # All streams were completed, so resuming doesn't read anything
+    assert table.to_arrow_dataset(path=path, resume=True).count_rows() == num_rows
+
+
+def test_read_with_stream_splitting(monkeypatch):
+    from redivis.common import read_planner
+
+    util.populate_test_data()
+    table = util.get_table()
+    arrow_table = table.to_arrow_table(max_parallelization=1)
+
+    # Idle workers split the remaining streams, and every row is still read exactly once
+    monkeypatch.setattr(read_planner, "MIN_SPLIT_ROWS", 10)
+    split_table = table.to_arrow_table(max_parallelization=8)
+    assert split_table.num_rows == arrow_table.num_rows
+    assert sorted(split_table.column("id").to_pylist()) == sorted(
+        arrow_table.column("id").to_pylist()
+    )
+
+
+def test_read_with_stream_splitting_order(monkeypatch):
+    import io
+    import time
+    import pyarrow
+    from redivis.common import fetch_rows, read_planner
+
+    # Ordered results (e.g. of a query with ORDER BY) come in a single stream, which is split across workers
+    arrow_table = pyarrow.table({"id": pyarrow.array(range(20_000), pyarrow.int64())})
+    split_offsets = []
+
+    class SlowResponse(io.BytesIO):
+        def __init__(self, offset):
+            sink = io.BytesIO()
+            with pyarrow.ipc.new_stream(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table.slice(offset), max_chunksize=500)
+            super().__init__(sink.getvalue())
+            self.raw = self
+
+        def read(self, *args):
+            time.sleep(0.002)
+            return super().read(*args)
+
+    def make_request(method, path, **kwargs):
+        if path.endswith("/readSessions"):
+            return {
+                "numRows": arrow_table.num_rows,
+                "streams": [{"id": "s1", "estimatedRows": arrow_table.num_rows}],
+            }
+        offset = int(path.split("?offset=")[1])
+        if offset:
+            split_offsets.append(offset)
+        return SlowResponse(offset)
+
+    monkeypatch.setattr(fetch_rows, "make_request", make_request)
+    monkeypatch.setattr(read_planner, "MIN_SPLIT_ROWS", 1000)
+    for memory_budget in [None, "1"]:
+        if memory_budget is not None:
+            # Spilled ranges are read back in order too
+            monkeypatch.setenv("REDIVIS_READ_MEMORY_BUDGET", memory_budget)
+        split_offsets.clear()
+        table = fetch_rows.make_rows_request(
+            uri="/tables/test",
+            output_type="arrow_table",
+            mapped_variables=[{"name": "id", "type": "integer"}],
+            progress=False,
+            max_parallelization=4,
+        )
+        assert split_offsets
+        assert table.column("id").to_pylist() == list(range(20_000))
+
+
+def test_arrow_c_stream():
+    import pyarrow
+    import polars
+
+    util.populate_test_data()
+    table = util.get_table()
+    arrow_table = table.to_arrow_table()
+
+    # Consumed batch by batch through the Arrow PyCapsule interface, without calling to_arrow_table() first
+    assert pyarrow.table(table).num_rows == arrow_table.num_rows
+    assert pyarrow.table(table.select("id").limit(10)).shape == (10, 1)
+    assert polars.DataFrame(table.limit(5)).shape == (5, arrow_table.num_columns)
+
+
+def test_to_duckdb():
+    import pyarrow.compute
+
+    util.populate_test_data()
+    table = util.get_table()
+    arrow_table = table.to_arrow_table()
+
+    # Only the referenced variables are read, and the filter is applied as batches arrive
+    con = table.to_duckdb(name="test_table")
+    assert con.sql("SELECT COUNT(*) FROM test_table").fetchone()[0] == arrow_table.num_rows
+    assert len(con.sql("SELECT id FROM test_table LIMIT 5").fetchall()) == 5
+
+    con = redivis.duckdb(t=table)
+    rows = con.sql("SELECT id FROM t WHERE id > 100").fetchall()
+    assert len(rows) == arrow_table.filter(pyarrow.compute.field("id") > 100).num_rows
+
+
+def test_read_with_compact_types():
+    util.populate_test_data()
+    table = util.get_table()
+    arrow_table = table.to_arrow_table()
+
+    compact_table = table.to_arrow_table(compact_types="auto")
+    assert compact_table.num_rows == arrow_table.num_rows
+    assert compact_table.nbytes <= arrow_table.nbytes
+    assert sorted(compact_table.column("id").to_pylist()) == sorted(
+        arrow_table.column("id").to_pylist()
+    )
+    print(compact_table.schema)
+
+    df = table.to_pandas_dataframe(compact_types="auto", dtype_backend="numpy_nullable")
+    assert len(df) == arrow_table.num_rows
+
+
+def test_to_arrow_batch_iterator_async():
+    import asyncio
+
+    util.populate_test_data()
+    table = util.get_table()
+    arrow_table = table.to_arrow_table()
+
+    async def count_rows(batch_iterator):
+        row_count = 0
+        async with batch_iterator:
+            async for batch in batch_iterator:
+                row_count += batch.num_rows
+        return row_count
+
+    async def read():
+        # Both reads share the event loop, and neither blocks it
+        return await asyncio.gather(
+            count_rows(table.to_arrow_batch_iterator_async(max_parallelization=4)),
+            count_rows(
+                redivis.aio.table(table.qualified_reference).to_arrow_batch_iterator(
+                    ordered=False
+                )
+            ),
+        )
+
+    assert asyncio.run(read()) == [arrow_table.num_rows, arrow_table.num_rows]
+
+
+def test_read_with_target_batch_size(monkeypatch):
+    util.populate_test_data()
+    table = util.get_table()
+    arrow_table = table.to_arrow_table()
+
+    # Small batches are concatenated and large ones split; only the last batch of each stream may be smaller
+    batches = list(table.to_arrow_batch_iterator(target_batch_rows=100))
+    assert sum(b.num_rows for b in batches) == arrow_table.num_rows
+    assert all(b.num_rows < 200 for b in batches)
+
+    batch_sizes = []
+
+    def batch_preprocessor(batch):
+        batch_sizes.append(batch.num_rows)
+        return batch
+
+    monkeypatch.setenv("REDIVIS_TARGET_BATCH_ROWS", "100")
+    coalesced_table = table.to_arrow_table(batch_preprocessor=batch_preprocessor)
+    assert coalesced_table.num_rows == arrow_table.num_rows
+    assert max(batch_sizes) < 200
+
+
+def test_read_with_dropped_connection(monkeypatch):
+    import asyncio
+    import io
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    import pyarrow
+    from redivis.common import fetch_rows
+
+    arrow_table = pyarrow.table({"id": pyarrow.array(range(10_000), pyarrow.int64())})
+    read_sessions = []
+    dropped_streams = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            read_sessions.append(self.path)
+            stream_id = f"s{len(read_sessions)}"
+            body = json.dumps(
+                {"numRows": arrow_table.num_rows, "streams": [{"id": stream_id}]}
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            stream_id, offset = self.path.split("/")[-1].split("?offset=")
+            offset = int(offset)
+            sink = io.BytesIO()
+            with pyarrow.ipc.new_stream(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table.slice(offset), max_chunksize=1000)
+            body = sink.getvalue()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if stream_id not in dropped_streams:
+                # The connection drops partway through the body; the read resumes from its offset
+                dropped_streams.add(stream_id)
+                self.wfile.write(body[: len(body) // 2])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv(
+        "REDIVIS_API_ENDPOINT", f"http://127.0.0.1:{server.server_port}/api/v1"
+    )
+    monkeypatch.setenv("REDIVIS_API_TOKEN", "test")
+    mapped_variables = [{"name": "id", "type": "integer"}]
+    try:
+        table = fetch_rows.make_rows_request(
+            uri="/tables/test",
+            output_type="arrow_table",
+            mapped_variables=mapped_variables,
+            progress=False,
+        )
+        assert table.column("id").to_pylist() == list(range(10_000))
+
+        batches = fetch_rows.make_rows_request(
+            uri="/tables/test",
+            output_type="arrow_iterator",
+            mapped_variables=mapped_variables,
+            progress=False,
+        )
+        assert sum(b.num_rows for b in batches) == 10_000
+
+        async def read_async():
+            from redivis.common.fetch_rows_async import AsyncArrowIterator
+
+            table = redivis.table("test.test.test")
+            monkeypatch.setattr(
+                "redivis.common.TabularReader.get_mapped_variables",
+                lambda reader, variables: (mapped_variables, None, False),
+            )
+            monkeypatch.setattr(table, "uri", "/tables/async_test", raising=False)
+            row_count = 0
+            async with AsyncArrowIterator(table) as batches:
+                async for batch in batches:
+                    row_count += batch.num_rows
+            return row_count
+
+        assert asyncio.run(read_async()) == 10_000
+        assert len(dropped_streams) == 3
+    finally:
+        server.shutdown()
+
+
+def test_retry_budget_exhausted():
+    import time
+    from redivis.common.retry_policy import RetryBudget, RetryPolicy
+
+    # Once the budget is used up, retries are paced at its refill rate
+    policy = RetryPolicy(
+        initial_delay=0.01,
+        max_delay=0.85,
+        jitter=False,
+        budget=RetryBudget(capacity=1, refill_rate=10, timeout=0.2),
+    )
+    assert policy.start().get_next_delay() == 0.01
+    delays = [policy.start().get_next_delay() for _ in range(8)]
+    assert [round(delay, 1) for delay in delays] == [i / 10 for i in range(1, 9)]
+
+    # Retries never wait longer than the max delay for a token
+    assert policy.start().get_next_delay() == 0.85
+
+    # An operation whose deadline is shorter than the wait still gives up
+    policy.deadline = 0.5
+    assert policy.start().get_next_delay() is None
+    policy.deadline = None
+
+    # Once the budget has been used up for longer than its timeout, retries give up
+    time.sleep(0.3)
+    assert policy.start().get_next_delay() is None
+
+    # and they're allowed again once it has refilled
+    time.sleep(0.7)
+    assert policy.start().get_next_delay() == 0.01